@@ -1,16 +1,19 @@
 import sys
 import os
+import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.schemas.batch_control import ChatRequest, ChatResponse
 from app.services.chat_handler import process_user_query
 from app.crud.batch_control import batch_crud
+from app.services.metrics import record_request
 
 router = APIRouter(prefix="/api/v1", tags=["batch-control"])
 
@@ -19,18 +22,20 @@ async def health_check():
     return {"status": "healthy", "service": "batch-control-chatbot"}
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat_endpoint(request: ChatRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Main chatbot endpoint – processes natural language queries about batch tracking
     using the NLU + CRUD logic (not RAG).
     """
+    start = time.perf_counter()
     try:
         response_text, intent, entities = await process_user_query(request.message, db)
+        record_request("/api/v1/chat", intent.value, True, time.perf_counter() - start)
         return ChatResponse(
             success=True,
             message=response_text,
-            intent="intent",         # Optional: You can return intent from process_user_query if needed
-            entities={},           # Optional: You can enhance process_user_query to return entities too
+            intent=intent.value,
+            entities=entities,
             data=None
         )
     except Exception as e:
@@ -40,14 +45,16 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
         )
 
 @router.get("/batch/{batch_code}")
-async def get_batch_info(batch_code: str, db: Session = Depends(get_db)):
+async def get_batch_info(batch_code: str, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve current tracking info for a specific batch by code.
     """
     try:
-        batch_info = batch_crud.get_current_batch_location(db, batch_code)
+        batch_info = await db.run_sync(batch_crud.get_current_batch_location, batch_code)
         if not batch_info:
             raise HTTPException(status_code=404, detail="Batch not found")
         return batch_info
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
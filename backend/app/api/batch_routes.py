@@ -1,11 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database import get_db
 from app.crud.batch_control import batch_crud
+from app.services.pagination import InvalidCursor
+from app.services.statistics import batch_statistics
+from app.services.expiry_calendar import expiry_calendar
+from app.services.charts import naive_utc, rollup_chart
+from app.services.streaming import ndjson_lines, NDJSON_MEDIA_TYPE
 
 router = APIRouter(prefix="/batches", tags=["Batches"])
 
+# ✅ Listings are keyset-paginated JSON ({"items", "next_cursor"}) or, with
+# ?format=ndjson, the whole result streamed one row per line via yield_per.
+PAGE_LIMIT = Query(settings.API_PAGE_SIZE, ge=1, le=settings.API_MAX_PAGE_SIZE)
+LISTING_FORMAT = Query("json", pattern="^(json|ndjson)$")
+
+
+def ndjson_response(rows):
+    return StreamingResponse(ndjson_lines(rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/statistics")
+def get_batch_statistics(expiring_within_days: Optional[int] = Query(None, ge=1, le=365),
+                         db: Session = Depends(get_db)):
+    return batch_statistics.get(db, expiring_within_days)
+
+@router.get("/chart")
+def get_rollup_chart(metric: str = Query("events", pattern="^(events|level)$"), status: Optional[str] = None,
+                     start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     granularity: Optional[str] = Query(None, pattern="^(hour|day)$"),
+                     location: Optional[str] = None, by_location: bool = False,
+                     max_points: int = Query(settings.CHART_MAX_POINTS, ge=2, le=5000),
+                     db: Session = Depends(get_db)):
+    try:
+        return rollup_chart(db, metric, status, start, end, granularity, location, by_location, max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/expiring")
+def get_expiring_batches(days: int = Query(settings.STATS_EXPIRING_WITHIN_DAYS, ge=0, le=3650),
+                         start: Optional[date] = None, location: Optional[str] = None,
+                         status: Optional[str] = None, limit: int = PAGE_LIMIT,
+                         db: Session = Depends(get_db)):
+    # Expiry between start (default today) and `days` later, at the batches' current location / status
+    start = start or date.today()
+    try:
+        return expiry_calendar.expiring(db, start, start + timedelta(days=days), location, status, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/{batch_code}/current-location")
 def get_current_location(batch_code: str, db: Session = Depends(get_db)):
     result = batch_crud.get_current_batch_location(db, batch_code)
@@ -13,7 +62,33 @@ def get_current_location(batch_code: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Batch not found or no tracking info.")
     return result
 
+@router.get("/{batch_code}/history")
+def get_batch_history(batch_code: str, limit: int = PAGE_LIMIT, cursor: Optional[str] = None,
+                      format: str = LISTING_FORMAT, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None, db: Session = Depends(get_db)):
+    # start / end (naive UTC) bound the scan to the months they cover
+    start, end = naive_utc(start), naive_utc(end)
+    batch = batch_crud.get_batch_by_code(db, batch_code)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    if format == "ndjson":
+        return ndjson_response(
+            batch_crud.tracking_item(record)
+            for record in batch_crud.iter_batch_tracking(db, batch.id, start=start, end=end)
+        )
+    try:
+        records, next_cursor = batch_crud.get_batch_tracking_page(db, batch.id, limit, cursor, start, end)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": [batch_crud.tracking_item(record) for record in records], "next_cursor": next_cursor}
+
 @router.get("/status/{status}")
-def get_batches_by_status(status: str, db: Session = Depends(get_db)):
-    result = batch_crud.get_batches_by_status(db, status)
-    return result
+def get_batches_by_status(status: str, limit: int = PAGE_LIMIT, cursor: Optional[str] = None,
+                          format: str = LISTING_FORMAT, db: Session = Depends(get_db)):
+    if format == "ndjson":
+        return ndjson_response(batch_crud.iter_batches_by_status(db, status))
+    try:
+        items, next_cursor = batch_crud.get_batches_by_status_page(db, status, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
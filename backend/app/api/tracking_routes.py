@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.schemas.batch_control import BulkTrackingRequest, BulkTrackingResponse, TrackingEventIn
+from app.services.ingest import ingest_tracking_events
+from app.services.write_behind import IngestUnavailable, tracking_write_behind
+
+router = APIRouter(prefix="/tracking", tags=["Tracking"])
+
+
+@router.post("/bulk", response_model=BulkTrackingResponse)
+def ingest_tracking(request: BulkTrackingRequest, db: Session = Depends(get_db)):
+    """
+    Record up to INGEST_MAX_EVENTS tracking events in one call. Bad rows are
+    reported in ``errors`` (by index) and do not stop the rest of the load.
+    """
+    return ingest_tracking_events(db, request.events)
+
+
+@router.post("/events", status_code=202)
+async def record_tracking_event(event: TrackingEventIn, idempotency_key: Optional[str] = Header(None)):
+    """
+    Acknowledge one scanner event; it is written with others in a group
+    commit shortly after. Resending with the same ``Idempotency-Key`` header
+    is answered "duplicate" and not recorded twice. 503 while the queue is
+    full: retry after the ``Retry-After`` delay.
+    """
+    try:
+        status = tracking_write_behind.submit(event, idempotency_key)
+    except IngestUnavailable as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": "1"})
+    return {"status": status}
@@ -1,13 +1,106 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict  # ✅ Required for Pydantic v2
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # derived from DATABASE_URL when unset
+
+    # Read replicas (comma-separated URLs). Read-only CRUD and agent SQL go to one that is
+    # at most DB_REPLICA_MAX_LAG_SECONDS behind (checked every DB_REPLICA_CHECK_SECONDS),
+    # otherwise to the primary; writes always go to the primary.
+    DATABASE_REPLICA_URLS: Optional[str] = None
+    ASYNC_DATABASE_REPLICA_URLS: Optional[str] = None  # derived from DATABASE_REPLICA_URLS when unset
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5
+    DB_REPLICA_CHECK_SECONDS: float = 5
+
+    # Connection pools, per engine (primary, async, each replica) and per worker process:
+    # up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections, waiting DB_POOL_TIMEOUT seconds for
+    # one before failing. DB_STATEMENT_TIMEOUT_MS is applied server-side on PostgreSQL.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = 30000
     GEMINI_API_KEY: str
     GENAI_MODEL: str = "gemini-pro"
     REDIS_URL: str = "redis://localhost:6379"
 
+    # NLU memoization (0 disables the cache; TTL in seconds, None = no expiry)
+    NLU_CACHE_SIZE: int = 2048
+    NLU_CACHE_TTL_SECONDS: Optional[float] = 3600
+
+    # Fuzzy batch-code resolution
+    BATCH_CODE_MAX_EDIT_DISTANCE: int = 2
+    BATCH_CODE_INDEX_REFRESH_SECONDS: float = 60
+
+    # Local intent model consulted when the regex rules return UNKNOWN
+    INTENT_MODEL_ENABLED: bool = True
+    INTENT_MODEL_DIR: Optional[str] = None  # defaults to app/data/intent_model
+    INTENT_MODEL_THRESHOLD: float = 0.5
+
+    # Semantic cache for LLM fallback responses (0 entries disables it)
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    LLM_CACHE_TTL_SECONDS: Optional[float] = 3600
+    LLM_CACHE_SIMILARITY: float = 0.92
+
+    # LLM gateway: admission control around every Gemini call
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_QUEUE: int = 32
+    LLM_TIMEOUT_SECONDS: float = 20
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30
+
+    # Run pending Alembic migrations on startup (disable when deploys migrate separately)
+    DB_AUTO_MIGRATE: bool = True
+
+    # /chat/batch: queries accepted per request
+    CHAT_BATCH_MAX_QUERIES: int = 500
+
+    # Keyset pagination: rows per page in chat answers / listing endpoints
+    CHAT_PAGE_SIZE: int = 50
+    API_PAGE_SIZE: int = 100
+    API_MAX_PAGE_SIZE: int = 1000
+
+    # Batch statistics: cache lifetime (also invalidated on writes) and "expiring soon" window
+    STATS_CACHE_TTL_SECONDS: Optional[float] = 300
+    STATS_EXPIRING_WITHIN_DAYS: int = 30
+
+    # Expiry calendar: days either side of today held in memory (longer ranges query the
+    # database), how often changed batches are picked up, how often it is rebuilt outright
+    EXPIRY_CALENDAR_HORIZON_DAYS: int = 365
+    EXPIRY_CALENDAR_REFRESH_SECONDS: float = 5
+    EXPIRY_CALENDAR_REBUILD_SECONDS: float = 3600
+
+    # Rollup charts: default range when none is given, most points per series before downsampling
+    CHART_DEFAULT_DAYS: int = 30
+    CHART_MAX_POINTS: int = 500
+
+    # Monthly batch_tracking partitions (PostgreSQL): how often upcoming months are created
+    TRACKING_PARTITION_CHECK_SECONDS: float = 86400
+
+    # /tracking/bulk: events accepted per call, rows per INSERT statement
+    INGEST_MAX_EVENTS: int = 10_000
+    INGEST_CHUNK_SIZE: int = 1000
+
+    # /tracking/events write-behind queue: backpressure limit, group commit size / window,
+    # how long idempotency keys are remembered, how long shutdown waits for the queue to drain
+    WRITE_BEHIND_MAX_QUEUE: int = 10_000
+    WRITE_BEHIND_GROUP_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_SECONDS: float = 0.05
+    WRITE_BEHIND_IDEMPOTENCY_TTL_SECONDS: Optional[float] = 600
+    WRITE_BEHIND_DRAIN_SECONDS: float = 10
+
+    # Local vector index grounding LLM fallback answers in ERP records
+    RETRIEVAL_ENABLED: bool = True
+    RETRIEVAL_INDEX_DIR: Optional[str] = None  # defaults to app/data/retrieval_index
+    RETRIEVAL_N_FEATURES: int = 2 ** 11
+    RETRIEVAL_TOP_K: int = 5
+    RETRIEVAL_MIN_SCORE: float = 0.1
+
     # ✅ Replaces old `Config` class
     model_config = ConfigDict(env_file=".env")  # Automatically loads from .env
 
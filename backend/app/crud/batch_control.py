@@ -1,84 +1,429 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from typing import Optional, List
+from sqlalchemy import and_, case, func, or_, tuple_
+from sqlalchemy.orm import joinedload
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, Optional, List, Tuple
 
-from app.models.batch_control import Batch, BatchTracking, Product, TrackingInfo
+from app.database import read_only
+from app.models.batch_control import Batch, BatchCurrentState, BatchStatus, BatchTracking, Product, TrackingRollup
 from app.models.common import Employee
-
-# # ✅ ADDED — If you're using enums for status
-# from app.models.enums import BatchStatusEnum  # 🔁 ADD THIS LINE if you're using enum type
+from app.services.metrics import timed
+from app.services.pagination import decode_cursor, encode_cursor, split_page
 
 class BatchCRUD:
+    # Codes per IN (...) statement in the bulk lookups
+    IN_CHUNK = 1000
+
     @staticmethod
+    @timed("crud.get_batch_by_code")
+    @read_only
     def get_batch_by_code(db: Session, batch_code: str) -> Optional[Batch]:
         return db.query(Batch).filter(Batch.batch_code == batch_code).first()
 
     @staticmethod
-    def get_batch_tracking(db: Session, batch_id: int) -> List[TrackingInfo]:
-        return db.query(TrackingInfo).filter(TrackingInfo.batch_id == batch_id).order_by(TrackingInfo.timestamp).all()
+    @timed("crud.get_batch_tracking")
+    @read_only
+    def get_batch_tracking(db: Session, batch_id: int, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None) -> List[BatchTracking]:
+        undated = BatchCRUD._undated_rows(db, batch_id).all() if start is None and end is None else []
+        return undated + BatchCRUD._tracking_rows(db, batch_id, start=start, end=end).all()
 
     @staticmethod
+    @timed("crud.get_current_batch_location")
+    @read_only
     def get_current_batch_location(db: Session, batch_code: str) -> Optional[dict]:
-        batch = BatchCRUD.get_batch_by_code(db, batch_code)
-        if not batch:
-            return None
+        # One round trip: batch, its current state (primary-key join) and the handler's name
+        row = db.query(Batch.batch_code, BatchCurrentState.location, BatchCurrentState.status,
+                       BatchCurrentState.timestamp, Employee.name) \
+            .join(BatchCurrentState, BatchCurrentState.batch_id == Batch.id) \
+            .outerjoin(Employee, Employee.id == BatchCurrentState.handled_by) \
+            .filter(Batch.batch_code == batch_code) \
+            .first()
 
-        latest_tracking = db.query(BatchTracking) \
-            .filter(BatchTracking.batch_id == batch.id) \
-            .order_by(BatchTracking.timestamp.desc()) \
+        return BatchCRUD._location(*row) if row else None
+
+    @staticmethod
+    @timed("crud.get_batch_overview")
+    @read_only
+    def get_batch_overview(db: Session, batch_code: str) -> Optional[Tuple[Batch, Optional[dict]]]:
+        """The batch (product loaded) and its current location, in one statement."""
+        row = db.query(Batch, BatchCurrentState.location, BatchCurrentState.status,
+                       BatchCurrentState.timestamp, Employee.name) \
+            .options(joinedload(Batch.product)) \
+            .outerjoin(BatchCurrentState, BatchCurrentState.batch_id == Batch.id) \
+            .outerjoin(Employee, Employee.id == BatchCurrentState.handled_by) \
+            .filter(Batch.batch_code == batch_code) \
             .first()
 
-        if not latest_tracking:
+        if not row:
             return None
+        batch, location, status, timestamp, handler = row
+        current = BatchCRUD._location(batch.batch_code, location, status, timestamp, handler) if status else None
+        return batch, current
 
+    @staticmethod
+    def _location(batch_code: str, location: str, status: BatchStatus, timestamp, handler: Optional[str]) -> dict:
         return {
-            "batch_code": batch.batch_code,
-            "location": latest_tracking.location,
-            "status": latest_tracking.status.value,
-            "timestamp": latest_tracking.timestamp,
-            "handler": latest_tracking.handler.name if latest_tracking.handler else None
+            "batch_code": batch_code,
+            "location": location,
+            "status": status.value,
+            "timestamp": timestamp,
+            "handler": handler
         }
 
     @staticmethod
+    @timed("crud.get_batches_by_status")
+    @read_only
     def get_batches_by_status(db: Session, status: str) -> List[dict]:
-        subquery = db.query(BatchTracking.batch_id, func.max(BatchTracking.timestamp).label('max_time')) \
-            .group_by(BatchTracking.batch_id).subquery()
-
-        results = db.query(Batch, BatchTracking) \
-            .join(BatchTracking, Batch.id == BatchTracking.batch_id) \
-            .join(subquery, and_(
-                BatchTracking.batch_id == subquery.c.batch_id,
-                BatchTracking.timestamp == subquery.c.max_time
-            )) \
-            .filter(BatchTracking.status == status) \
+        return list(BatchCRUD.iter_batches_by_status(db, status))
+
+    @staticmethod
+    @read_only
+    def iter_batches_by_status(db: Session, status: str, chunk_size: int = 1000) -> Iterator[dict]:
+        """
+        Batches whose latest tracking event has ``status``, read from the
+        indexed ``batch_current_state`` table. Only the listed columns are
+        selected (product and handler names joined in, no ORM entities or
+        lazy loads) and rows are fetched ``chunk_size`` at a time.
+        """
+        rows = BatchCRUD._status_rows(db, status)
+        if rows is None:
+            return
+        for row in rows.yield_per(chunk_size):
+            yield BatchCRUD._status_item(row)
+
+    @staticmethod
+    @timed("crud.get_batches_by_status_page")
+    @read_only
+    def get_batches_by_status_page(db: Session, status: str, limit: int,
+                                   cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """One keyset page (by batch id) of a status listing, plus the cursor of the next page."""
+        parsed = BatchStatus.parse(status)
+        kind = f"status:{parsed.name if parsed else status}"
+        after = decode_cursor(cursor, kind)
+        rows = BatchCRUD._status_rows(db, status, after[0] if after else None)
+        if rows is None:
+            return [], None
+        page, more = split_page(rows.limit(limit + 1), limit)
+        next_cursor = encode_cursor(kind, page[-1].batch_id) if more else None
+        return [BatchCRUD._status_item(row) for row in page], next_cursor
+
+    @staticmethod
+    def _status_rows(db: Session, status: str, after_batch_id: Optional[int] = None):
+        # NLU hands over labels like "delivered"; the column stores enum members
+        status = BatchStatus.parse(status)
+        if status is None:
+            return None
+
+        rows = db.query(BatchCurrentState.batch_id, Batch.batch_code, Product.name.label("product_name"),
+                        BatchCurrentState.location, BatchCurrentState.status, Employee.name.label("handler")) \
+            .select_from(BatchCurrentState) \
+            .join(Batch, Batch.id == BatchCurrentState.batch_id) \
+            .outerjoin(Product, Product.id == Batch.product_id) \
+            .outerjoin(Employee, Employee.id == BatchCurrentState.handled_by) \
+            .filter(BatchCurrentState.status == status)
+        if after_batch_id is not None:
+            rows = rows.filter(BatchCurrentState.batch_id > after_batch_id)
+        return rows.order_by(BatchCurrentState.batch_id)
+
+    @staticmethod
+    def _status_item(row) -> dict:
+        return {
+            "batch_code": row.batch_code,
+            "product_name": row.product_name,
+            "location": row.location,
+            "status": row.status.value,
+            "handler": row.handler
+        }
+
+    # ✅ Tracking history, keyset-paginated by (timestamp, id). ``start`` / ``end``
+    # bound the time range, so on PostgreSQL only those months' partitions are read.
+    @staticmethod
+    @read_only
+    def iter_batch_tracking(db: Session, batch_id: int, chunk_size: int = 1000, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None) -> Iterator[BatchTracking]:
+        if start is None and end is None:
+            yield from BatchCRUD._undated_rows(db, batch_id).yield_per(chunk_size)
+        yield from BatchCRUD._tracking_rows(db, batch_id, start=start, end=end).yield_per(chunk_size)
+
+    @staticmethod
+    @timed("crud.get_batch_tracking_page")
+    @read_only
+    def get_batch_tracking_page(db: Session, batch_id: int, limit: int, cursor: Optional[str] = None,
+                                start: Optional[datetime] = None,
+                                end: Optional[datetime] = None) -> Tuple[List[BatchTracking], Optional[str]]:
+        after = decode_cursor(cursor, f"history:{batch_id}")
+        page = []
+        if start is None and end is None and (after is None or after[0] is None):
+            page, more = split_page(BatchCRUD._undated_rows(db, batch_id, after and after[1]).limit(limit + 1), limit)
+            if more:
+                return page, BatchCRUD.history_cursor(page[-1])
+            after = None
+        rest = limit - len(page)
+        dated, more = split_page(BatchCRUD._tracking_rows(db, batch_id, after, start, end).limit(rest + 1), rest)
+        page += dated
+        return page, BatchCRUD.history_cursor(page[-1]) if more else None
+
+    @staticmethod
+    def tracking_item(record: BatchTracking) -> dict:
+        return {
+            "location": record.location,
+            "status": record.status.value,
+            "timestamp": record.timestamp,
+            "handler": record.handler.name if record.handler else None
+        }
+
+    @staticmethod
+    def event_time(timestamp: Optional[datetime]) -> str:
+        """How answers show a tracking event's time; events may be undated."""
+        return timestamp.strftime("%Y-%m-%d %H:%M") if timestamp is not None else "undated"
+
+    @staticmethod
+    def history_cursor(record: BatchTracking) -> str:
+        return encode_cursor(f"history:{record.batch_id}", record.timestamp, record.id)
+
+    # Undated events come first (current_state treats them as oldest), then the dated ones.
+    # Each part is its own query on the plain timestamp so both are range scans of
+    # (batch_id, timestamp DESC); a coalesce over the column could not use that index.
+    @staticmethod
+    def _undated_rows(db: Session, batch_id: int, after_id: Optional[int] = None):
+        rows = db.query(BatchTracking).options(joinedload(BatchTracking.handler)) \
+            .filter(BatchTracking.batch_id == batch_id, BatchTracking.timestamp.is_(None))
+        if after_id is not None:
+            rows = rows.filter(BatchTracking.id > after_id)
+        return rows.order_by(BatchTracking.id)
+
+    @staticmethod
+    def _tracking_rows(db: Session, batch_id: int, after: Optional[tuple] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None):
+        rows = db.query(BatchTracking).options(joinedload(BatchTracking.handler)) \
+            .filter(BatchTracking.batch_id == batch_id, BatchTracking.timestamp.isnot(None))
+        if start is not None:
+            rows = rows.filter(BatchTracking.timestamp >= start)
+        if end is not None:
+            rows = rows.filter(BatchTracking.timestamp < end)
+        if after is not None:
+            rows = rows.filter(tuple_(BatchTracking.timestamp, BatchTracking.id) > tuple_(*after))
+        return rows.order_by(BatchTracking.timestamp, BatchTracking.id)
+
+    # ✅ Bulk lookups for /chat/batch: one statement per group instead of per query
+    @staticmethod
+    @timed("crud.get_batches_by_codes")
+    @read_only
+    def get_batches_by_codes(db: Session, batch_codes: Iterable[str]) -> Dict[str, Batch]:
+        codes = sorted(set(batch_codes))
+        batches: Dict[str, Batch] = {}
+        for start in range(0, len(codes), BatchCRUD.IN_CHUNK):
+            chunk = codes[start:start + BatchCRUD.IN_CHUNK]
+            for batch in db.query(Batch).options(joinedload(Batch.product)).filter(Batch.batch_code.in_(chunk)):
+                batches[batch.batch_code] = batch
+        return batches
+
+    @staticmethod
+    @timed("crud.get_current_locations")
+    @read_only
+    def get_current_locations(db: Session, batch_codes: Iterable[str]) -> Dict[str, dict]:
+        """Latest tracking event per batch code, shaped like ``get_current_batch_location``."""
+        codes = sorted(set(batch_codes))
+        locations: Dict[str, dict] = {}
+        # One statement per IN_CHUNK codes keeps bound parameters under driver limits
+        for start in range(0, len(codes), BatchCRUD.IN_CHUNK):
+            chunk = codes[start:start + BatchCRUD.IN_CHUNK]
+            rows = db.query(Batch.batch_code, BatchCurrentState.location, BatchCurrentState.status,
+                            BatchCurrentState.timestamp, Employee.name) \
+                .join(BatchCurrentState, BatchCurrentState.batch_id == Batch.id) \
+                .outerjoin(Employee, Employee.id == BatchCurrentState.handled_by) \
+                .filter(Batch.batch_code.in_(chunk)) \
+                .all()
+            locations.update((row[0], BatchCRUD._location(*row)) for row in rows)
+        return locations
+
+    @staticmethod
+    @timed("crud.get_batch_ids_by_codes")
+    def get_batch_ids_by_codes(db: Session, batch_codes: Iterable[str]) -> Dict[str, int]:
+        codes = sorted(set(batch_codes))
+        ids: Dict[str, int] = {}
+        for start in range(0, len(codes), BatchCRUD.IN_CHUNK):
+            ids.update(db.query(Batch.batch_code, Batch.id)
+                       .filter(Batch.batch_code.in_(codes[start:start + BatchCRUD.IN_CHUNK])))
+        return ids
+
+    @staticmethod
+    @timed("crud.get_tracking_histories")
+    @read_only
+    def get_tracking_histories(db: Session, batch_ids: Iterable[int]) -> Dict[int, List[BatchTracking]]:
+        ids = set(batch_ids)
+        histories: Dict[int, List[BatchTracking]] = {batch_id: [] for batch_id in ids}
+        if not ids:
+            return histories
+        for record in db.query(BatchTracking).options(joinedload(BatchTracking.handler)) \
+                .filter(BatchTracking.batch_id.in_(ids)) \
+                .order_by(BatchTracking.timestamp, BatchTracking.id):
+            histories[record.batch_id].append(record)
+        return histories
+
+    @staticmethod
+    @timed("crud.get_rollup_series")
+    @read_only
+    def get_rollup_series(db: Session, granularity: str, start: datetime, end: datetime,
+                          status: Optional[BatchStatus] = None, location: Optional[str] = None,
+                          by_location: bool = False, column: str = "events") -> List[tuple]:
+        """``(bucket, location or None, sum of column)`` per rollup bucket in [start, end)."""
+        groups = [TrackingRollup.bucket] + ([TrackingRollup.location] if by_location else [])
+        query = db.query(*groups, func.sum(getattr(TrackingRollup, column))) \
+            .filter(TrackingRollup.granularity == granularity,
+                    TrackingRollup.bucket >= start, TrackingRollup.bucket < end)
+        if status is not None:
+            query = query.filter(TrackingRollup.status == status)
+        if location is not None:
+            query = query.filter(TrackingRollup.location == location)
+        rows = query.group_by(*groups).order_by(TrackingRollup.bucket).all()
+        return [(row[0], row[1] if by_location else None, row[-1]) for row in rows]
+
+    @staticmethod
+    @timed("crud.get_rollup_levels")
+    @read_only
+    def get_rollup_levels(db: Session, at: datetime, status: Optional[BatchStatus] = None,
+                          location: Optional[str] = None, by_location: bool = False) -> Dict[Optional[str], int]:
+        """
+        Batches in ``status`` (per location) just before ``at``, an hour
+        boundary: daily net changes up to that day plus its hourly ones.
+        """
+        day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+        groups = [TrackingRollup.location] if by_location else []
+        query = db.query(*groups, func.coalesce(func.sum(TrackingRollup.net), 0)) \
+            .filter(or_(and_(TrackingRollup.granularity == "day", TrackingRollup.bucket < day),
+                        and_(TrackingRollup.granularity == "hour", TrackingRollup.bucket >= day,
+                             TrackingRollup.bucket < at)))
+        if status is not None:
+            query = query.filter(TrackingRollup.status == status)
+        if location is not None:
+            query = query.filter(TrackingRollup.location == location)
+        if by_location:
+            return {name: int(total) for name, total in query.group_by(*groups)}
+        return {None: int(query.scalar())}
+
+    # Not @read_only: app.services.statistics caches the result until the next
+    # commit, and a lagging replica would refill the cache with stale figures.
+    @staticmethod
+    @timed("crud.get_batch_statistics")
+    def get_batch_statistics(db: Session, expiring_within_days: int = 30, today: Optional[date] = None) -> dict:
+        """
+        Batch counts by current status, quantities per product and expiry
+        counts, from one aggregated statement over batches and their current
+        state (grouped by product and status, folded together here).
+        """
+        today = today or date.today()
+        horizon = today + timedelta(days=expiring_within_days)
+        expired = case((Batch.expiry_date < today, 1), else_=0)
+        expiring = case((Batch.expiry_date.between(today, horizon), 1), else_=0)
+        rows = db.query(Batch.product_id, Product.name, BatchCurrentState.status,
+                        func.count(Batch.id), func.coalesce(func.sum(Batch.quantity), 0),
+                        func.coalesce(func.sum(expired), 0), func.coalesce(func.sum(expiring), 0)) \
+            .outerjoin(Product, Product.id == Batch.product_id) \
+            .outerjoin(BatchCurrentState, BatchCurrentState.batch_id == Batch.id) \
+            .group_by(Batch.product_id, Product.name, BatchCurrentState.status) \
             .all()
 
+        status_counts = {status.value: 0 for status in BatchStatus}
+        status_counts["Untracked"] = 0
+        products: Dict[Optional[int], dict] = {}
+        totals = {"total_batches": 0, "total_quantity": 0, "expired": 0, "expiring_soon": 0}
+        for product_id, product_name, status, count, quantity, expired_count, expiring_count in rows:
+            status_counts[status.value if status else "Untracked"] += count
+            product = products.setdefault(product_id, {
+                "product_id": product_id,
+                "product_name": product_name or "Unassigned",
+                "batches": 0,
+                "quantity": 0,
+            })
+            product["batches"] += count
+            product["quantity"] += int(quantity)
+            totals["total_batches"] += count
+            totals["total_quantity"] += int(quantity)
+            totals["expired"] += int(expired_count)
+            totals["expiring_soon"] += int(expiring_count)
+
+        return {
+            **totals,
+            # Tracked and not yet delivered
+            "active_batches": status_counts[BatchStatus.MANUFACTURED.value] + status_counts[BatchStatus.IN_TRANSIT.value],
+            "status_counts": status_counts,
+            "products": sorted(products.values(), key=lambda p: (-p["quantity"], p["product_name"])),
+            "expiring_within_days": expiring_within_days,
+            "as_of": today,
+        }
+
+    # ✅ Expiry: batches by expiry date (ix_batches_expiry_date) with their current status and location
+    @staticmethod
+    @timed("crud.get_expiring_batches")
+    @read_only
+    def get_expiring_batches(db: Session, start: date, end: date, location: Optional[str] = None,
+                             status: Optional[BatchStatus] = None) -> List[dict]:
+        """Batches expiring between ``start`` and ``end`` (inclusive), soonest first."""
+        rows = BatchCRUD._expiry_rows(db).filter(Batch.expiry_date.between(start, end))
+        if location is not None:
+            rows = rows.filter(func.lower(BatchCurrentState.location) == location.lower())
+        if status is not None:
+            rows = rows.filter(BatchCurrentState.status == status)
+        return [BatchCRUD._expiry_item(row) for row in rows.order_by(Batch.expiry_date, Batch.batch_code)]
+
+    # Not @read_only: app.services.expiry_calendar keeps these rows until the
+    # batches change again, and a lagging replica would hand it stale ones.
+    @staticmethod
+    @timed("crud.get_expiry_entries")
+    def get_expiry_entries(db: Session, start: date, end: date,
+                           batch_ids: Optional[Iterable[int]] = None) -> List[dict]:
+        """``get_expiring_batches`` rows for the expiry calendar, optionally only ``batch_ids``."""
+        rows = BatchCRUD._expiry_rows(db).filter(Batch.expiry_date.between(start, end))
+        if batch_ids is None:
+            return [BatchCRUD._expiry_item(row) for row in rows]
+        ids = sorted(set(batch_ids))
         return [
-            {
-                "batch_code": batch.batch_code,
-                "product_name": batch.product.name,
-                "location": tracking.location,
-                "status": tracking.status.value,
-                "handler": tracking.handler.name if tracking.handler else None
-            }
-            for batch, tracking in results
+            BatchCRUD._expiry_item(row)
+            for offset in range(0, len(ids), BatchCRUD.IN_CHUNK)
+            for row in rows.filter(Batch.id.in_(ids[offset:offset + BatchCRUD.IN_CHUNK]))
         ]
-    
-    
-    # ✅ ADDED — New function for test_database.py
+
     @staticmethod
-    def get_batch_statistics(db: Session) -> dict:
-        total_batches = db.query(func.count(Batch.id)).scalar()
+    def get_high_water_marks(db: Session) -> Tuple[int, int]:
+        """Highest batch and tracking event ids so far."""
+        return db.query(func.max(Batch.id)).scalar() or 0, db.query(func.max(BatchTracking.id)).scalar() or 0
 
-        # 🔁 If your BatchTracking.status is an enum, use the enum:
-        active_batches = db.query(BatchTracking) \
-            .join(Batch, Batch.id == BatchTracking.batch_id) \
-            .filter(BatchTracking.status == BatchStatusEnum.ACTIVE).count()
+    @staticmethod
+    @timed("crud.get_changed_batch_ids")
+    def get_changed_batch_ids(db: Session, after_batch_id: int, after_tracking_id: int) -> Tuple[set, int, int]:
+        """
+        Batches created after ``after_batch_id`` or tracked after
+        ``after_tracking_id`` (both primary-key range scans), plus the new
+        high-water marks.
+        """
+        last_batch_id, last_tracking_id = BatchCRUD.get_high_water_marks(db)
+        changed = {row[0] for row in db.query(Batch.id).filter(Batch.id > after_batch_id, Batch.id <= last_batch_id)}
+        changed.update(
+            row[0] for row in db.query(BatchTracking.batch_id).distinct()
+            .filter(BatchTracking.id > after_tracking_id, BatchTracking.id <= last_tracking_id,
+                    BatchTracking.batch_id.isnot(None))
+        )
+        return changed, max(last_batch_id, after_batch_id), max(last_tracking_id, after_tracking_id)
 
+    @staticmethod
+    def _expiry_rows(db: Session):
+        return db.query(Batch.id, Batch.batch_code, Product.name.label("product_name"), Batch.quantity,
+                        Batch.expiry_date, BatchCurrentState.status, BatchCurrentState.location) \
+            .outerjoin(Product, Product.id == Batch.product_id) \
+            .outerjoin(BatchCurrentState, BatchCurrentState.batch_id == Batch.id)
+
+    @staticmethod
+    def _expiry_item(row) -> dict:
         return {
-            "total_batches": total_batches,
-            "active_batches": active_batches
+            "batch_id": row.id,
+            "batch_code": row.batch_code,
+            "product_name": row.product_name,
+            "quantity": row.quantity or 0,
+            "expiry_date": row.expiry_date,
+            "status": row.status.value if row.status else None,
+            "location": row.location
         }
 
-
 batch_crud = BatchCRUD()
\ No newline at end of file
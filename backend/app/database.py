@@ -6,17 +6,353 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import declarative_base
+import functools
+import inspect
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
+from app.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Sync driver -> async driver used by the async engine
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# ✅ Engine factory: every engine in the process is built here, with pool settings from Settings
+
+DB_POOL_WAIT_SECONDS = registry.histogram(
+    "chatbot_db_pool_wait_seconds", "Time to check a connection out of the pool, including waiting and connecting.", ("pool",)
+)
+DB_POOL_TIMEOUTS = registry.counter(
+    "chatbot_db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT_SECONDS.", ("pool",)
+)
+
+# name -> engine, for the pool gauges
+_engines: Dict[str, Engine] = {}
+
+
+class _TimedCheckout:
+    """Pool mixin timing checkouts; the pool name is its logging name, which survives ``recreate``."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc(pool=self._orig_logging_name or "")
+            raise
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start, pool=self._orig_logging_name or "")
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_memory(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, asynchronous: bool = False) -> Dict:
+    """``create_engine`` keyword arguments for ``url`` from the DB_POOL_* / DB_STATEMENT_TIMEOUT_MS settings."""
+    parsed = make_url(url)
+    options: Dict = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if not _is_memory(parsed):
+        # In-memory SQLite keeps its single shared connection
+        options.update(
+            poolclass=TimedAsyncQueuePool if asynchronous else TimedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        )
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if timeout and parsed.get_backend_name() == "postgresql":
+        if parsed.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def make_engine(url: str, name: str, **overrides) -> Engine:
+    """Shared sync engine for ``url``, registered under ``name`` in the pool metrics."""
+    engine = create_engine(url, **{**engine_options(url), "pool_logging_name": name, **overrides})
+    _engines[name] = engine
+    return engine
+
+
+def make_async_engine(url: str, name: str, **overrides) -> AsyncEngine:
+    """Async counterpart of ``make_engine`` (asyncpg / aiosqlite)."""
+    engine = create_async_engine(url, **{**engine_options(url, asynchronous=True), "pool_logging_name": name,
+                                         **overrides})
+    _engines[name] = engine.sync_engine
+    return engine
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Checked-out / idle / overflow connections per named pool (queue pools only)."""
+    stats = {}
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            stats[name] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                # Negative while the pool is still filling up to pool_size
+                "overflow": max(pool.overflow(), 0),
+                "max_connections": pool.size() + pool._max_overflow,
+            }
+    return stats
+
+
+registry.gauge_callback(
+    "chatbot_db_pool_connections", "Connection pool usage per engine.", ("pool", "stat"),
+    lambda: {(name, stat): value for name, stats in pool_stats().items() for stat, value in stats.items()}
+)
+
+
+# ✅ Read replicas: reads marked @read_only go to a replica within the lag bound
+
+# Seconds the replica is behind the primary; 0 once it has replayed everything it received
+REPLICA_LAG_SQL = {
+    "postgresql": "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                  "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END",
+}
+
+DB_ROUTED_READS = registry.counter(
+    "chatbot_db_routed_reads_total", "Read-only statements by the database they were sent to.", ("target",)
+)
+
+
+def replica_lag(connection) -> float:
+    """Replication lag in seconds (0 for dialects without replication, e.g. SQLite stand-ins)."""
+    sql = REPLICA_LAG_SQL.get(connection.dialect.name)
+    return float(connection.execute(text(sql)).scalar() or 0) if sql else 0.0
+
 
+class ReplicaRouter:
+    """
+    Picks a read replica, round-robin among those whose replication lag is
+    within ``max_lag`` seconds. Lag is probed every ``check_interval``
+    seconds on a background thread, so picking never waits on the network;
+    a replica that fails its probe, or has not been probed yet, is skipped.
+    ``pick`` returns None when no replica qualifies: the caller reads from
+    the primary.
+    """
 
+    def __init__(self, replicas: Sequence[Engine] = (), async_replicas: Sequence[AsyncEngine] = (),
+                 max_lag: float = 5.0, check_interval: float = 5.0,
+                 lag_probe: Callable[[Engine], float] = None, clock: Callable[[], float] = time.monotonic):
+        self.replicas = list(replicas)
+        self.async_replicas = list(async_replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lag_probe = lag_probe or self._probe
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._lags: List[Optional[float]] = [None] * len(self.replicas)
+        self._checked_at: Optional[float] = None
+        self._refreshing = False
+        self._turn = itertools.count()
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    @staticmethod
+    def _probe(engine: Engine) -> float:
+        with engine.connect() as connection:
+            return replica_lag(connection)
+
+    def refresh(self) -> List[Optional[float]]:
+        """Probe every replica now; None marks one that could not be reached."""
+        lags: List[Optional[float]] = []
+        for engine in self.replicas:
+            try:
+                lags.append(self._lag_probe(engine))
+            except Exception as e:
+                logger.warning("Lag check failed for %s: %s", engine.url.render_as_string(), e)
+                lags.append(None)
+        with self._lock:
+            self._lags, self._checked_at, self._refreshing = lags, self._clock(), False
+        return lags
+
+    def pick(self, asynchronous: bool = False) -> Optional[Engine]:
+        """A replica engine within the lag bound (the sync side of the async one if asked), or None."""
+        if not self.replicas:
+            return None
+        with self._lock:
+            stale = self._checked_at is None or self._clock() - self._checked_at >= self.check_interval
+            if stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self.refresh, name="replica-lag", daemon=True).start()
+            healthy = [i for i, lag in enumerate(self._lags) if lag is not None and lag <= self.max_lag]
+        if not healthy:
+            return None
+        index = healthy[next(self._turn) % len(healthy)]
+        return self.async_replicas[index].sync_engine if asynchronous else self.replicas[index]
+
+    def stats(self) -> Dict[str, float]:
+        lags = self._lags
+        return {
+            "replicas": len(self.replicas),
+            "healthy": sum(1 for lag in lags if lag is not None and lag <= self.max_lag),
+            "max_lag_seconds": max((lag for lag in lags if lag is not None), default=None),
+        }
+
+
+_READ_ONLY = "read_only_depth"
+_WROTE = "wrote_in_transaction"
+_REPLICA = "replica_in_transaction"
+
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECTs issued inside ``@read_only`` calls to a
+    replica from ``router``; everything else (writes, flushes, session-level
+    connections) goes to the session's own bind, the primary. Once the
+    current transaction has written, it reads from the primary too, so a
+    caller always sees its own writes. One replica serves a whole
+    transaction.
+    """
+
+    asynchronous = False
+
+    def __init__(self, *args, router: Optional[ReplicaRouter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (self.router and self.info.get(_READ_ONLY) and not self._flushing and not self.info.get(_WROTE)
+                and getattr(clause, "is_select", False)):
+            replica = self.info.get(_REPLICA) or self.router.pick(self.asynchronous)
+            if replica is not None:
+                self.info[_REPLICA] = replica
+                DB_ROUTED_READS.inc(target="replica")
+                return replica
+            DB_ROUTED_READS.inc(target="primary")
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+class AsyncRoutingSession(RoutingSession):
+    """Sync side of an AsyncSession: picks the replica's async engine."""
+
+    asynchronous = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _pin_after_flush(session, flush_context) -> None:
+    session.info[_WROTE] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _pin_after_write(state) -> None:
+    if not state.is_select:
+        state.session.info[_WROTE] = True
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _unpin(session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_WROTE, None)
+        session.info.pop(_REPLICA, None)
+
+
+def read_only(fn: Callable) -> Callable:
+    """
+    Mark a CRUD method (session first argument) as safe to serve from a
+    replica. Generators keep the mark while they are iterated.
+    """
+    def enter(db) -> None:
+        db.info[_READ_ONLY] = db.info.get(_READ_ONLY, 0) + 1
+
+    def leave(db) -> None:
+        db.info[_READ_ONLY] -= 1
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator(db, *args, **kwargs):
+            enter(db)
+            try:
+                yield from fn(db, *args, **kwargs)
+            finally:
+                leave(db)
+        return generator
+
+    @functools.wraps(fn)
+    def wrapper(db, *args, **kwargs):
+        enter(db)
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            leave(db)
+    return wrapper
+
+
+def _urls(value: Optional[str]) -> List[str]:
+    return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+
+replica_urls = _urls(settings.DATABASE_REPLICA_URLS)
+replica_router = ReplicaRouter(
+    [make_engine(url, f"replica{i}") for i, url in enumerate(replica_urls)],
+    [make_async_engine(url, f"async_replica{i}") for i, url in enumerate(
+        _urls(settings.ASYNC_DATABASE_REPLICA_URLS) or [async_database_url(url) for url in replica_urls])],
+    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DB_REPLICA_CHECK_SECONDS
+)
+
+# ✅ Primary: every write, and reads when no replica qualifies
+engine = make_engine(settings.DATABASE_URL, "primary")
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession,
+                            router=replica_router)
 Base = declarative_base()
 
+# ✅ Async engine for the chat endpoints (asyncpg / aiosqlite)
+async_engine = make_async_engine(settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL), "async")
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False,
+                                       sync_session_class=AsyncRoutingSession, router=replica_router)
+
+# ✅ Versioned schema: Alembic migrations in backend/migrations
+def upgrade_schema(url: str = None, revision: str = "head"):
+    """Apply pending migrations (same as ``alembic upgrade head`` from backend/)."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(parent_dir, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(parent_dir, "migrations"))
+    config.set_main_option("sqlalchemy.url", (url or settings.DATABASE_URL).replace("%", "%%"))
+    # Keep the application's logging configuration
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -24,6 +360,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 
 
 # ✅ Add these for test script support
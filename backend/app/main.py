@@ -1,5 +1,8 @@
 import sys
 import os
+import asyncio
+import logging
+import time
 from dotenv import load_dotenv
 load_dotenv()
 # Add parent directory to sys.path
@@ -7,19 +10,34 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy import create_engine
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 from app.config import settings
-from app.database import Base, get_db
+from app.database import get_db, get_async_db, SessionLocal, replica_router, upgrade_schema
 from app.api.batch_control import router as batch_router
+from app.api.batch_routes import router as batches_router
+from app.api.tracking_routes import router as tracking_router
 from app.services.rag_pipeline import rag_pipeline  # ✅ Updated import
+from app.services.batch_code_index import batch_code_index
+from app.services.nlu import nlu_service
+from app.services.intent_model import load_or_train
+from app.services import retrieval
+from app.models.current_state import ensure_current_state
+from app.models.rollups import ensure_rollups
+from app.models.event_store import ensure_upcoming_partitions
+from app.services.streaming import event_stream, SSE_HEADERS
+from app.services.pagination import InvalidCursor
+from app.services.statistics import batch_statistics
+from app.services.expiry_calendar import expiry_calendar
+from app.services.write_behind import tracking_write_behind
+from app.services.metrics import registry, record_request, PROMETHEUS_CONTENT_TYPE
 
-# ✅ Create DB engine and tables
-engine = create_engine(settings.DATABASE_URL)
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 # ✅ Initialize FastAPI app
 app = FastAPI(
@@ -37,15 +55,184 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ✅ Bring the schema up to date before anything reads it (Alembic, backend/migrations)
+@app.on_event("startup")
+async def migrate_database():
+    if not settings.DB_AUTO_MIGRATE:
+        return
+    try:
+        await run_in_threadpool(upgrade_schema)
+    except Exception:
+        logger.exception("Schema upgrade failed")
+
+# ✅ Monthly batch_tracking partitions (PostgreSQL) for this month and the next few
+def create_upcoming_partitions():
+    with SessionLocal() as db:
+        created = ensure_upcoming_partitions(db.connection())
+        db.commit()
+    return created
+
+
+async def check_tracking_partitions():
+    try:
+        created = await run_in_threadpool(create_upcoming_partitions)
+        if created:
+            logger.info("Created tracking partitions %s", ", ".join(created))
+    except Exception:
+        logger.exception("Could not create upcoming tracking partitions")
+
+
+async def check_tracking_partitions_periodically():
+    # Long-running processes keep MONTHS_AHEAD months ready, so live events never
+    # land in the default partition (and no restart has to move them out of it)
+    while True:
+        await asyncio.sleep(settings.TRACKING_PARTITION_CHECK_SECONDS)
+        await check_tracking_partitions()
+
+
+@app.on_event("startup")
+async def load_tracking_partitions():
+    await check_tracking_partitions()
+    app.state.partition_checker = asyncio.create_task(check_tracking_partitions_periodically())
+
+
+@app.on_event("shutdown")
+async def stop_tracking_partitions():
+    checker = getattr(app.state, "partition_checker", None)
+    if checker:
+        checker.cancel()
+
+# ✅ Keep the in-memory batch-code index in step with the batches table
+def refresh_batch_code_index():
+    try:
+        with SessionLocal() as db:
+            batch_code_index.refresh(db)
+    except Exception:
+        logger.exception("Batch code index refresh failed")
+
+
+def refresh_retrieval_index():
+    index = rag_pipeline.retrieval
+    if index is None:
+        return
+    try:
+        with SessionLocal() as db:
+            if index.refresh(db):
+                index.save(settings.RETRIEVAL_INDEX_DIR or retrieval.DEFAULT_INDEX_DIR)
+    except Exception:
+        logger.exception("Retrieval index refresh failed")
+
+
+def refresh_expiry_calendar():
+    try:
+        with SessionLocal() as db:
+            expiry_calendar.refresh(db)
+    except Exception:
+        logger.exception("Expiry calendar refresh failed")
+
+
+async def refresh_batch_code_index_periodically():
+    while True:
+        await asyncio.sleep(settings.BATCH_CODE_INDEX_REFRESH_SECONDS)
+        await run_in_threadpool(refresh_batch_code_index)
+        await run_in_threadpool(refresh_retrieval_index)
+        await run_in_threadpool(refresh_expiry_calendar)
+
+
+@app.on_event("startup")
+async def load_batch_code_index():
+    await run_in_threadpool(refresh_batch_code_index)
+    # Loaded up front too: NLU matches locations in expiry questions against it
+    await run_in_threadpool(refresh_expiry_calendar)
+    app.state.batch_code_refresher = asyncio.create_task(refresh_batch_code_index_periodically())
+
+
+@app.on_event("shutdown")
+async def stop_batch_code_index():
+    refresher = getattr(app.state, "batch_code_refresher", None)
+    if refresher:
+        refresher.cancel()
+
+# ✅ Backfill batch_current_state the first time it is deployed against existing data
+def backfill_current_state():
+    with SessionLocal() as db:
+        return ensure_current_state(db)
+
+
+def backfill_rollups():
+    with SessionLocal() as db:
+        return ensure_rollups(db)
+
+
+@app.on_event("startup")
+async def load_current_state():
+    try:
+        rows = await run_in_threadpool(backfill_current_state)
+        if rows:
+            logger.info("Backfilled current state of %d batches", rows)
+    except Exception:
+        logger.exception("Current state backfill failed")
+    # Rollups need the current state: their hooks read it for in-order events
+    try:
+        rows = await run_in_threadpool(backfill_rollups)
+        if rows:
+            logger.info("Backfilled %d rollup rows", rows)
+    except Exception:
+        logger.exception("Rollup backfill failed")
+
+# ✅ Group-commit writer behind /tracking/events; drain what is queued on shutdown
+@app.on_event("startup")
+async def start_write_behind():
+    tracking_write_behind.start()
+
+
+@app.on_event("shutdown")
+async def drain_write_behind():
+    await run_in_threadpool(tracking_write_behind.drain, settings.WRITE_BEHIND_DRAIN_SECONDS)
+
+# ✅ Load (or train from the shipped corpus) the local intent model
+@app.on_event("startup")
+async def load_intent_model():
+    if not settings.INTENT_MODEL_ENABLED:
+        return
+    try:
+        model = await run_in_threadpool(load_or_train, settings.INTENT_MODEL_DIR)
+        nlu_service.set_intent_model(model)
+    except Exception:
+        logger.exception("Intent model unavailable, falling back to rules only")
+
+# ✅ Load (or build from the database) the retrieval index used to ground LLM answers
+def build_retrieval_index():
+    with SessionLocal() as db:
+        return retrieval.load_or_build(db, settings.RETRIEVAL_INDEX_DIR)
+
+
+@app.on_event("startup")
+async def load_retrieval_index():
+    if not settings.RETRIEVAL_ENABLED:
+        return
+    try:
+        rag_pipeline.set_retrieval_index(await run_in_threadpool(build_retrieval_index))
+    except Exception:
+        logger.exception("Retrieval index unavailable, LLM fallback runs without context")
+
 # ✅ Define request model
 class ChatRequest(BaseModel):
     query: str
+    # next_cursor from a previous answer, to page through a long listing
+    cursor: Optional[str] = None
+
+
+class ChatBatchRequest(BaseModel):
+    queries: List[str] = Field(..., max_length=settings.CHAT_BATCH_MAX_QUERIES)
 
 # ✅ /chat endpoint using RAGPipeline
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat_endpoint(request: ChatRequest, db: AsyncSession = Depends(get_async_db)):
+    start = time.perf_counter()
     try:
-        result = rag_pipeline.process_query(request.query, db)
+        result = await rag_pipeline.aprocess_query(request.query, db, request.cursor)
+        record_request("/chat", result["intent"], result["success"], time.perf_counter() - start)
 
         return {
             "success": result["success"],
@@ -55,11 +242,93 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
             "data": result.get("data")
         }
 
+    except InvalidCursor as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"detail": f"Error: {str(e)}"})
+
+# ✅ /chat/batch – many queries, grouped DB lookups, results in input order
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: ChatBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    start = time.perf_counter()
+    try:
+        results = await rag_pipeline.aprocess_queries(request.queries, db)
+        record_request("/chat/batch", "batch", all(r["success"] for r in results), time.perf_counter() - start)
+
+        return {
+            "results": [
+                {
+                    "query": query,
+                    "success": result["success"],
+                    "message": result["message"],
+                    "intent": result["intent"],
+                    "entities": result["entities"],
+                    "data": result.get("data")
+                }
+                for query, result in zip(request.queries, results)
+            ]
+        }
+
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": f"Error: {str(e)}"})
 
+async def timed_stream(endpoint: str, events):
+    start = time.perf_counter()
+    intent, success = "none", False
+    async for event, payload in events:
+        if event == "meta":
+            intent = payload["intent"]
+        elif event == "message":
+            success = payload["success"]
+        yield event, payload
+    record_request(endpoint, intent, success, time.perf_counter() - start)
+
+# ✅ /chat/stream – same pipeline, delivered as Server-Sent Events
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, db: AsyncSession = Depends(get_async_db)):
+    return StreamingResponse(
+        event_stream(timed_stream("/chat/stream", rag_pipeline.astream_query(request.query, db, request.cursor))),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+# ✅ Prometheus scrape endpoint
+def component_stats():
+    components = {
+        "nlu_cache": nlu_service.cache.stats(),
+        "llm_response_cache": rag_pipeline.response_cache.stats(),
+        "retrieval_singleflight": rag_pipeline.retrieval_flight.stats(),
+        "llm_singleflight": rag_pipeline.llm_flight.stats(),
+        "llm_gateway": rag_pipeline.gateway.stats(),
+        "batch_code_index": {"size": len(batch_code_index)},
+        "batch_statistics": batch_statistics.stats(),
+        "tracking_write_behind": tracking_write_behind.stats(),
+        "db_replicas": replica_router.stats(),
+        "expiry_calendar": expiry_calendar.stats(),
+    }
+    if rag_pipeline.retrieval is not None:
+        components["retrieval_index"] = {"documents": len(rag_pipeline.retrieval)}
+    return {
+        (component, stat): value
+        for component, stats in components.items()
+        for stat, value in stats.items()
+        if value is not None
+    }
+
+
+registry.gauge_callback(
+    "chatbot_component_stat", "Cache, single-flight and index counters.", ("component", "stat"), component_stats
+)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # ✅ Include batch control endpoints
 app.include_router(batch_router)
+app.include_router(batches_router)
+app.include_router(tracking_router)
 
 # ✅ Health check root endpoint
 @app.get("/")
@@ -1,6 +1,5 @@
-from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, ForeignKey, Enum, UUID
+from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, ForeignKey, Enum, Uuid, Index, desc
 from sqlalchemy.orm import relationship
-from datetime import datetime
 from app.database import Base
 import enum
 
@@ -9,6 +8,17 @@ class BatchStatus(enum.Enum):
     IN_TRANSIT = "In Transit"
     DELIVERED = "Delivered"
 
+    @classmethod
+    def parse(cls, value) -> "BatchStatus | None":
+        """Accept a member, its name or its label in any case ("delivered", "IN_TRANSIT", "In Transit")."""
+        if isinstance(value, cls) or value is None:
+            return value
+        key = str(value).strip().replace("_", " ").lower()
+        for member in cls:
+            if key in (member.value.lower(), member.name.replace("_", " ").lower()):
+                return member
+        return None
+
 class Product(Base):
     __tablename__ = "products"
     
@@ -21,6 +31,10 @@ class Product(Base):
 
 class Batch(Base):
     __tablename__ = "batches"
+    # Expiry range scans ("expiring in the next 30 days", see app.services.expiry_calendar)
+    __table_args__ = (
+        Index("ix_batches_expiry_date", "expiry_date"),
+    )
     
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.id"))
@@ -28,33 +42,71 @@ class Batch(Base):
     quantity = Column(Integer)
     manufactured_date = Column(Date)
     expiry_date = Column(Date)
-    created_by = Column(UUID(as_uuid=True), ForeignKey("employees.id"))
+    created_by = Column(Uuid(as_uuid=True), ForeignKey("employees.id"))
     
     product = relationship("Product", back_populates="batches")
     creator = relationship("Employee")
     tracking_records = relationship("BatchTracking", back_populates="batch")
-    tracking_history = relationship("TrackingInfo", back_populates="batch", cascade="all, delete-orphan")
 
 class BatchTracking(Base):
+    """
+    The tracking event store: one append-only row per scan, read for current
+    state, history, charts and rollups alike. On PostgreSQL the table is
+    range-partitioned by month on ``timestamp`` (see
+    ``app.models.event_store``), so time-bounded reads only touch the months
+    they cover; elsewhere ``ix_batch_tracking_timestamp`` bounds the scan.
+    """
     __tablename__ = "batch_tracking"
+    # Schema changes ship as Alembic migrations (backend/migrations); keep these in step
+    __table_args__ = (
+        Index("ix_batch_tracking_batch_id_timestamp", "batch_id", desc("timestamp")),
+        Index("ix_batch_tracking_status", "status"),
+        Index("ix_batch_tracking_timestamp", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True)
     batch_id = Column(Integer, ForeignKey("batches.id"))
     location = Column(String)
     status = Column(Enum(BatchStatus))
     timestamp = Column(DateTime)
-    handled_by = Column(UUID(as_uuid=True), ForeignKey("employees.id"))
+    handled_by = Column(Uuid(as_uuid=True), ForeignKey("employees.id"))
     
     batch = relationship("Batch", back_populates="tracking_records")
     handler = relationship("Employee")
 
-class TrackingInfo(Base):
-    __tablename__ = "tracking_info"
+class BatchCurrentState(Base):
+    """
+    Latest tracking event per batch, kept in step with ``batch_tracking``
+    inside the writing transaction (see ``app.models.current_state``), so
+    current-location and status questions are point lookups.
+    """
+    __tablename__ = "batch_current_state"
 
-    id = Column(Integer, primary_key=True)
-    batch_id = Column(Integer, ForeignKey("batches.id"))
-    status = Column(Enum(BatchStatus), nullable=False)
-    location = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    batch_id = Column(Integer, ForeignKey("batches.id", ondelete="CASCADE"), primary_key=True)
+    tracking_id = Column(Integer, nullable=False)
+    location = Column(String)
+    status = Column(Enum(BatchStatus), index=True)
+    timestamp = Column(DateTime)
+    handled_by = Column(Uuid(as_uuid=True), ForeignKey("employees.id"))
+
+class TrackingRollup(Base):
+    """
+    Tracking events per hour / day, status and location, kept in step with
+    ``batch_tracking`` inside the writing transaction (see
+    ``app.models.rollups``), so charts never scan raw events.
+
+    ``events`` counts events recorded in the bucket. ``net`` is batches
+    entering (+1) minus leaving (-1) that status and location in the bucket;
+    its running sum is how many batches are in that state at the time.
+    """
+    __tablename__ = "tracking_rollups"
+
+    granularity = Column(String(8), primary_key=True)  # "hour" or "day"
+    bucket = Column(DateTime, primary_key=True)
+    status = Column(Enum(BatchStatus), primary_key=True)
+    location = Column(String, primary_key=True, default="")
+    events = Column(Integer, nullable=False, default=0)
+    net = Column(Integer, nullable=False, default=0)
 
-    batch = relationship("Batch", back_populates="tracking_history")
\ No newline at end of file
+# Registers the session hooks that maintain batch_current_state and tracking_rollups
+from app.models import current_state, rollups  # noqa: E402,F401
@@ -3,7 +3,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 
-from sqlalchemy import Column, String, Date, UUID, ForeignKey
+from sqlalchemy import Column, String, Date, Uuid, ForeignKey
 from sqlalchemy.orm import relationship
 from app.database import Base
 import uuid
@@ -12,9 +12,9 @@ import uuid
 class Department(Base):
     __tablename__ = "departments"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
-    head_id = Column(UUID(as_uuid=True), ForeignKey("employees.id"))
+    head_id = Column(Uuid(as_uuid=True), ForeignKey("employees.id"))
 
     # Relationships
     employees = relationship("Employee", back_populates="department", foreign_keys="[Employee.department_id]")
@@ -24,10 +24,10 @@ class Department(Base):
 class Employee(Base):
     __tablename__ = "employees"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False)
-    department_id = Column(UUID(as_uuid=True), ForeignKey("departments.id"))
+    department_id = Column(Uuid(as_uuid=True), ForeignKey("departments.id"))
     designation = Column(String)
     date_joined = Column(Date)
 
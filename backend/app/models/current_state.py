@@ -0,0 +1,159 @@
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.batch_control import BatchCurrentState, BatchTracking
+
+# Batch ids per refresh statement (keeps bound parameters under driver limits)
+CHUNK = 1000
+
+STATE_COLUMNS = ("batch_id", "tracking_id", "location", "status", "timestamp", "handled_by")
+
+
+def _ranked_events(batch_ids: Optional[List[int]] = None):
+    """Latest event per batch: newest timestamp first, the event recorded last on ties."""
+    rank = func.row_number().over(
+        partition_by=BatchTracking.batch_id,
+        order_by=(BatchTracking.timestamp.desc().nulls_last(), BatchTracking.id.desc())
+    ).label("rank")
+    ranked = select(
+        BatchTracking.batch_id, BatchTracking.id.label("tracking_id"), BatchTracking.location,
+        BatchTracking.status, BatchTracking.timestamp, BatchTracking.handled_by, rank
+    ).where(BatchTracking.batch_id.isnot(None))
+    if batch_ids is not None:
+        ranked = ranked.where(BatchTracking.batch_id.in_(batch_ids))
+    ranked = ranked.subquery()
+    return select(*(ranked.c[name] for name in STATE_COLUMNS)).where(ranked.c.rank == 1)
+
+
+def refresh_current_state(connection, batch_ids: Iterable[int]) -> None:
+    """Recompute the current state of ``batch_ids`` from their tracking events."""
+    ids = sorted({batch_id for batch_id in batch_ids if batch_id is not None})
+    table = BatchCurrentState.__table__
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        connection.execute(delete(table).where(table.c.batch_id.in_(chunk)))
+        connection.execute(insert(table).from_select(STATE_COLUMNS, _ranked_events(chunk)))
+
+
+def rebuild_current_state(db: Session) -> int:
+    """Backfill: recompute every batch's current state. Returns the row count."""
+    table = BatchCurrentState.__table__
+    db.execute(delete(table))
+    db.execute(insert(table).from_select(STATE_COLUMNS, _ranked_events()))
+    db.commit()
+    return db.query(func.count(BatchCurrentState.batch_id)).scalar()
+
+
+def ensure_current_state(db: Session) -> int:
+    """Backfill once if tracking events exist but no current state does (e.g. a fresh table)."""
+    if db.query(BatchCurrentState.batch_id).first() is not None:
+        return 0
+    if db.query(BatchTracking.id).filter(BatchTracking.batch_id.isnot(None)).first() is None:
+        return 0
+    return rebuild_current_state(db)
+
+
+def _upsert_statement(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    table = BatchCurrentState.__table__
+    # Executed with one parameter set per row: compiled once and cached, unlike multi-row VALUES
+    statement = dialect_insert(table)
+    incoming = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.batch_id],
+        set_={name: incoming[name] for name in STATE_COLUMNS if name != "batch_id"},
+        # Only move forward: an event older than the stored one never wins
+        where=or_(
+            table.c.timestamp.is_(None),
+            incoming.timestamp > table.c.timestamp,
+            and_(incoming.timestamp == table.c.timestamp, incoming.tracking_id > table.c.tracking_id)
+        )
+    )
+
+
+def record_new_events(connection, events: Iterable[BatchTracking]) -> None:
+    """Fold freshly inserted tracking rows into the current state with one upsert."""
+    latest: Dict[int, dict] = {}
+    for event_row in events:
+        if event_row.batch_id is None:
+            continue
+        row = {
+            "batch_id": event_row.batch_id, "tracking_id": event_row.id, "location": event_row.location,
+            "status": event_row.status, "timestamp": event_row.timestamp, "handled_by": event_row.handled_by,
+        }
+        current = latest.get(event_row.batch_id)
+        if current is None or _newer(row, current):
+            latest[event_row.batch_id] = row
+    if not latest:
+        return
+    rows = list(latest.values())
+    undated = {row["batch_id"] for row in rows if row["timestamp"] is None}
+    statement = _upsert_statement(connection.dialect.name)
+    if statement is None:
+        refresh_current_state(connection, latest)
+        return
+    if len(undated) < len(rows):
+        connection.execute(statement, [row for row in rows if row["timestamp"] is not None])
+    if undated:
+        refresh_current_state(connection, undated)
+
+
+def _newer(row: dict, current: dict) -> bool:
+    if current["timestamp"] is None or row["timestamp"] is None:
+        return row["timestamp"] is not None or row["tracking_id"] > current["tracking_id"]
+    return (row["timestamp"], row["tracking_id"]) > (current["timestamp"], current["tracking_id"])
+
+
+# ✅ Session hooks: every flush that writes tracking events also updates batch_current_state
+
+@event.listens_for(Session, "after_flush")
+def _sync_flushed_events(session: Session, flush_context) -> None:
+    new_events = [obj for obj in session.new if isinstance(obj, BatchTracking)]
+    touched = set()
+    for obj in session.dirty:
+        if isinstance(obj, BatchTracking) and session.is_modified(obj):
+            touched.add(obj.batch_id)
+            # A re-parented event changes its old batch's state too
+            touched.update(inspect(obj).attrs.batch_id.history.deleted)
+    touched.update(obj.batch_id for obj in session.deleted if isinstance(obj, BatchTracking))
+    if not new_events and not touched:
+        return
+    connection = session.connection()
+    if new_events:
+        record_new_events(connection, new_events)
+    if touched:
+        refresh_current_state(connection, touched)
+
+
+# What an ORM bulk insert returns so its rows can be folded in like flushed ones
+_RETURNED = (BatchTracking.id, BatchTracking.batch_id, BatchTracking.location, BatchTracking.status,
+             BatchTracking.timestamp, BatchTracking.handled_by)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _sync_bulk_inserts(state) -> None:
+    # ORM bulk inserts (session.execute(insert(BatchTracking), rows)) bypass
+    # the unit of work. Their rows come back through RETURNING and go through
+    # the same forward-only upsert as flushed events, so the cost follows the
+    # rows inserted rather than each batch's history; undated rows, and
+    # drivers without multi-row RETURNING, fall back to a full refresh.
+    if not state.is_insert or state.bind_mapper is None or state.bind_mapper.class_ is not BatchTracking:
+        return
+    connection = state.session.connection()
+    statement = state.statement
+    if statement._returning or not connection.dialect.insert_executemany_returning:
+        parameters = state.parameters
+        rows = parameters if isinstance(parameters, list) else [parameters or {}]
+        result = state.invoke_statement()
+        refresh_current_state(connection, (row.get("batch_id") for row in rows))
+        return result
+    inserted = state.invoke_statement(statement=statement.returning(*_RETURNED)).freeze()
+    record_new_events(connection, inserted().all())
+    return inserted()
@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import column, exists, func, inspect, insert, select, table, text
+from sqlalchemy.orm import Session
+
+from app.models.batch_control import BatchTracking
+from app.models.current_state import rebuild_current_state
+from app.models.rollups import rebuild_rollups
+
+# batch_tracking is range-partitioned by month on PostgreSQL (migration 0004).
+# Rows outside every monthly partition, or without a timestamp, land in the
+# default partition; creating their month later moves them out of it.
+TABLE = "batch_tracking"
+DEFAULT_PARTITION = f"{TABLE}_default"
+COLUMNS = "id, batch_id, location, status, timestamp, handled_by"
+
+# Months created ahead of the current one, so live events never hit the default partition
+MONTHS_AHEAD = 3
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def month_ranges(start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """[month start, next month start) for every month from ``start`` through ``end``."""
+    month, ranges = month_start(start), []
+    while month <= end:
+        ranges.append((month, add_months(month, 1)))
+        month = add_months(month, 1)
+    return ranges
+
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table)"
+    ), {"table": TABLE}).scalar())
+
+
+def existing_partitions(connection) -> Set[str]:
+    return set(connection.execute(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = :table"
+    ), {"table": TABLE}).scalars())
+
+
+def ensure_partitions(connection, start: datetime, end: Optional[datetime] = None) -> List[str]:
+    """
+    Create the monthly partitions covering ``start`` through ``end`` that
+    are missing, moving any of their rows out of the default partition.
+    Returns the partitions created; a no-op unless batch_tracking is a
+    partitioned PostgreSQL table.
+    """
+    if not is_partitioned(connection):
+        return []
+    existing = existing_partitions(connection)
+    created = []
+    for low, high in month_ranges(start, end or start):
+        name = partition_name(low)
+        if name in existing:
+            continue
+        bounds = {"low": low, "high": high}
+        in_default = DEFAULT_PARTITION in existing and connection.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :low AND timestamp < :high)"
+        ), bounds).scalar()
+        if in_default:
+            # The default partition may not hold rows of a new partition: park it while they move
+            connection.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+        connection.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{low.isoformat(' ')}') TO ('{high.isoformat(' ')}')"
+        ))
+        if in_default:
+            connection.execute(text(
+                f"INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {DEFAULT_PARTITION} "
+                f"WHERE timestamp >= :low AND timestamp < :high"
+            ), bounds)
+            connection.execute(text(
+                f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :low AND timestamp < :high"
+            ), bounds)
+            connection.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        created.append(name)
+    return created
+
+
+def ensure_upcoming_partitions(connection, now: Optional[datetime] = None) -> List[str]:
+    """This month's partition and the next ``MONTHS_AHEAD``."""
+    month = month_start(now or datetime.utcnow())
+    return ensure_partitions(connection, month, add_months(month, MONTHS_AHEAD))
+
+
+# ✅ One-off backfill: fold the legacy tracking_info table into batch_tracking
+
+LEGACY_TABLE = "tracking_info"
+# Legacy ids per INSERT ... SELECT
+MERGE_CHUNK = 10_000
+
+
+def merge_legacy_tracking(db: Session, drop: bool = True) -> int:
+    """
+    Copy ``tracking_info`` rows that batch_tracking does not already hold
+    (same batch, status, location and timestamp) into it, rebuild the
+    current state and rollups, then drop the legacy table. Returns the
+    number of rows copied; 0 if there is no legacy table.
+    """
+    connection = db.connection()
+    if LEGACY_TABLE not in inspect(connection).get_table_names():
+        return 0
+    legacy = table(LEGACY_TABLE, column("id"), column("batch_id"), column("status"),
+                   column("location"), column("timestamp"))
+    low, high, first, last = connection.execute(
+        select(func.min(legacy.c.timestamp), func.max(legacy.c.timestamp), func.min(legacy.c.id), func.max(legacy.c.id))
+    ).one()
+    if low is not None:
+        ensure_partitions(connection, low, high)
+
+    events = BatchTracking.__table__
+    copied = 0
+    for start in range(first or 0, (last or -1) + 1, MERGE_CHUNK):
+        duplicate = exists().where(
+            events.c.batch_id == legacy.c.batch_id,
+            events.c.status == legacy.c.status,
+            events.c.location == legacy.c.location,
+            events.c.timestamp.is_not_distinct_from(legacy.c.timestamp),
+        )
+        copied += connection.execute(insert(events).from_select(
+            ["batch_id", "status", "location", "timestamp"],
+            select(legacy.c.batch_id, legacy.c.status, legacy.c.location, legacy.c.timestamp)
+            .where(legacy.c.id >= start, legacy.c.id < start + MERGE_CHUNK, ~duplicate)
+            .order_by(legacy.c.id)
+        )).rowcount
+    if drop:
+        connection.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    db.commit()
+    if copied:
+        rebuild_current_state(db)
+        rebuild_rollups(db)
+    return copied
@@ -0,0 +1,308 @@
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, event, func, inspect, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.batch_control import BatchCurrentState, BatchStatus, BatchTracking, TrackingRollup
+
+# Batch ids / rows / bucket ranges per statement (keeps bound parameters under driver limits)
+CHUNK = 1000
+
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+# Out-of-order bulk inserts whose buckets are recomputed at the next flush or commit
+_PENDING = "tracking_rollups_pending"
+
+# (timestamp, status, location) of one tracking event
+Event = Tuple[datetime, Optional[BatchStatus], Optional[str]]
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _contribute(deltas: Dict[tuple, List[int]], events: Iterable[Event], previous: Optional[tuple] = None,
+                buckets: Optional[Set[tuple]] = None) -> None:
+    """
+    Add one batch's ``events`` (oldest first) to ``deltas``, keyed by
+    (granularity, bucket, status, location). ``previous`` is the (status,
+    location) the batch was in before them; with ``buckets`` only those
+    (granularity, bucket) pairs are kept.
+    """
+    for timestamp, status, location in events:
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(timestamp, granularity)
+            if buckets is not None and (granularity, bucket) not in buckets:
+                continue
+            if status is not None:
+                _add(deltas, (granularity, bucket, status, location or ""), 1, 1)
+            if previous is not None and previous[0] is not None:
+                _add(deltas, (granularity, bucket, previous[0], previous[1] or ""), 0, -1)
+        previous = (status, location)
+
+
+def _add(deltas: Dict[tuple, List[int]], key: tuple, events: int, net: int) -> None:
+    entry = deltas.get(key)
+    if entry is None:
+        deltas[key] = [events, net]
+    else:
+        entry[0] += events
+        entry[1] += net
+
+
+def _rows(deltas: Dict[tuple, List[int]]) -> List[dict]:
+    return [
+        {"granularity": granularity, "bucket": bucket, "status": status, "location": location,
+         "events": events, "net": net}
+        for (granularity, bucket, status, location), (events, net) in deltas.items()
+        if events or net
+    ]
+
+
+def _increment_statement(dialect: str, rows: List[dict]):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    table = TrackingRollup.__table__
+    statement = dialect_insert(table).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[column for column in table.primary_key.columns],
+        set_={"events": table.c.events + statement.excluded.events, "net": table.c.net + statement.excluded.net}
+    )
+
+
+def apply_deltas(connection, deltas: Dict[tuple, List[int]]) -> None:
+    """Add ``deltas`` to the stored rollups (upsert where the dialect has one)."""
+    rows = _rows(deltas)
+    table = TrackingRollup.__table__
+    for start in range(0, len(rows), CHUNK):
+        chunk = rows[start:start + CHUNK]
+        statement = _increment_statement(connection.dialect.name, chunk)
+        if statement is not None:
+            connection.execute(statement)
+            continue
+        for row in chunk:
+            key = and_(*(table.c[name] == row[name] for name in ("granularity", "bucket", "status", "location")))
+            updated = connection.execute(
+                update(table).where(key).values(events=table.c.events + row["events"], net=table.c.net + row["net"])
+            )
+            if not updated.rowcount:
+                connection.execute(insert(table).values(row))
+
+
+def _histories(connection, batch_ids: Iterable[int]) -> Iterator[Tuple[int, List[Event]]]:
+    """Dated tracking events of ``batch_ids``, oldest first, one batch at a time."""
+    ids = sorted(set(batch_ids))
+    for start in range(0, len(ids), CHUNK):
+        rows = connection.execute(
+            select(BatchTracking.batch_id, BatchTracking.timestamp, BatchTracking.status, BatchTracking.location)
+            .where(BatchTracking.batch_id.in_(ids[start:start + CHUNK]), BatchTracking.timestamp.isnot(None))
+            .order_by(BatchTracking.batch_id, BatchTracking.timestamp, BatchTracking.id)
+        )
+        for batch_id, events in groupby(rows, key=lambda row: row[0]):
+            yield batch_id, [(timestamp, status, location) for _, timestamp, status, location in events]
+
+
+def _ranges(buckets: Set[tuple]) -> List[Tuple[datetime, datetime]]:
+    """Time spans covered by ``buckets``, adjacent ones merged."""
+    spans = sorted((bucket, bucket + GRANULARITIES[granularity]) for granularity, bucket in buckets)
+    merged: List[List[datetime]] = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def refresh_buckets(connection, buckets: Iterable[tuple]) -> None:
+    """Recompute the rollups of ``buckets`` ((granularity, bucket start) pairs) from batch_tracking."""
+    buckets = set(buckets)
+    if not buckets:
+        return
+    # Every batch with an event in these buckets; their full histories give each event's predecessor
+    ranges = _ranges(buckets)
+    batch_ids = set()
+    for start in range(0, len(ranges), CHUNK // 2):
+        batch_ids.update(row[0] for row in connection.execute(
+            select(BatchTracking.batch_id).distinct().where(
+                BatchTracking.batch_id.isnot(None),
+                or_(*(and_(BatchTracking.timestamp >= low, BatchTracking.timestamp < high)
+                      for low, high in ranges[start:start + CHUNK // 2]))
+            )
+        ))
+    deltas: Dict[tuple, List[int]] = {}
+    for _, events in _histories(connection, batch_ids):
+        _contribute(deltas, events, buckets=buckets)
+
+    table = TrackingRollup.__table__
+    for granularity in GRANULARITIES:
+        starts = sorted(bucket for g, bucket in buckets if g == granularity)
+        for start in range(0, len(starts), CHUNK):
+            connection.execute(delete(table).where(
+                table.c.granularity == granularity, table.c.bucket.in_(starts[start:start + CHUNK])
+            ))
+    apply_deltas(connection, deltas)
+
+
+def _refresh_batches(connection, stale: Dict[int, datetime], buckets: Set[tuple]) -> None:
+    """Recompute ``buckets`` plus every bucket holding an event of a stale batch at or after its stale time."""
+    ids = sorted(stale)
+    for start in range(0, len(ids), CHUNK):
+        for batch_id, timestamp in connection.execute(
+            select(BatchTracking.batch_id, BatchTracking.timestamp)
+            .where(BatchTracking.batch_id.in_(ids[start:start + CHUNK]), BatchTracking.timestamp.isnot(None))
+        ):
+            if timestamp >= stale[batch_id]:
+                _mark(stale, buckets, batch_id, timestamp)
+    refresh_buckets(connection, buckets)
+
+
+def _mark(stale: Dict[int, datetime], buckets: Set[tuple], batch_id: Optional[int],
+          timestamp: Optional[datetime]) -> None:
+    if batch_id is None or timestamp is None:
+        return
+    stale[batch_id] = min(stale.get(batch_id, timestamp), timestamp)
+    buckets.update((granularity, bucket_start(timestamp, granularity)) for granularity in GRANULARITIES)
+
+
+def fold_new_events(connection, events_by_batch: Dict[int, List[Event]]) -> Dict[int, datetime]:
+    """
+    Add events appended after each batch's current state straight to the
+    rollups. Must run before batch_current_state is updated. Returns the
+    batches with earlier events (back-dated inserts), mapped to their
+    earliest new timestamp, for the caller to recompute.
+    """
+    stale: Dict[int, datetime] = {}
+    ids = sorted(events_by_batch)
+    current: Dict[int, tuple] = {}
+    for start in range(0, len(ids), CHUNK):
+        current.update((row[0], row[1:]) for row in connection.execute(
+            select(BatchCurrentState.batch_id, BatchCurrentState.status, BatchCurrentState.location,
+                   BatchCurrentState.timestamp)
+            .where(BatchCurrentState.batch_id.in_(ids[start:start + CHUNK]))
+        ))
+    deltas: Dict[tuple, List[int]] = {}
+    for batch_id, events in events_by_batch.items():
+        state = current.get(batch_id)
+        earliest = min(timestamp for timestamp, _, _ in events)
+        if state is not None and (state[2] is None or earliest < state[2]):
+            stale[batch_id] = earliest
+            continue
+        _contribute(deltas, events, state[:2] if state is not None else None)
+    apply_deltas(connection, deltas)
+    return stale
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Backfill: recompute every rollup from batch_tracking. Returns the row count."""
+    db.execute(delete(TrackingRollup.__table__))
+    deltas: Dict[tuple, List[int]] = {}
+    rows = db.execute(
+        select(BatchTracking.batch_id, BatchTracking.timestamp, BatchTracking.status, BatchTracking.location)
+        .where(BatchTracking.batch_id.isnot(None), BatchTracking.timestamp.isnot(None))
+        .order_by(BatchTracking.batch_id, BatchTracking.timestamp, BatchTracking.id),
+        execution_options={"yield_per": 10_000}
+    )
+    for _, events in groupby(rows, key=lambda row: row[0]):
+        _contribute(deltas, ((timestamp, status, location) for _, timestamp, status, location in events))
+    apply_deltas(db.connection(), deltas)
+    db.commit()
+    return db.query(func.count()).select_from(TrackingRollup).scalar()
+
+
+def ensure_rollups(db: Session) -> int:
+    """Backfill once if dated tracking events exist but no rollups do (e.g. a fresh table)."""
+    if db.query(TrackingRollup.bucket).first() is not None:
+        return 0
+    if db.query(BatchTracking.id).filter(BatchTracking.batch_id.isnot(None),
+                                         BatchTracking.timestamp.isnot(None)).first() is None:
+        return 0
+    return rebuild_rollups(db)
+
+
+# ✅ Session hooks: every write to batch_tracking also updates tracking_rollups
+# (insert=True: they must see batch_current_state before its own hooks move it)
+
+def _apply_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        _refresh_batches(session.connection(), pending, set())
+
+
+@event.listens_for(Session, "after_flush", insert=True)
+def _roll_up_flushed_events(session: Session, flush_context) -> None:
+    _apply_pending(session)
+    stale: Dict[int, datetime] = {}
+    buckets: Set[tuple] = set()
+    for obj in session.dirty:
+        if isinstance(obj, BatchTracking) and session.is_modified(obj):
+            attrs = inspect(obj).attrs
+            for batch_id in {obj.batch_id, *attrs.batch_id.history.deleted}:
+                for timestamp in {obj.timestamp, *attrs.timestamp.history.deleted}:
+                    _mark(stale, buckets, batch_id, timestamp)
+    for obj in session.deleted:
+        if isinstance(obj, BatchTracking):
+            _mark(stale, buckets, obj.batch_id, obj.timestamp)
+
+    events_by_batch: Dict[int, List[Event]] = {}
+    new_events = sorted(
+        (obj for obj in session.new
+         if isinstance(obj, BatchTracking) and obj.batch_id is not None and obj.timestamp is not None),
+        key=lambda obj: (obj.timestamp, obj.id)
+    )
+    for obj in new_events:
+        if obj.batch_id in stale:
+            _mark(stale, buckets, obj.batch_id, obj.timestamp)
+        else:
+            events_by_batch.setdefault(obj.batch_id, []).append((obj.timestamp, obj.status, obj.location))
+
+    if not events_by_batch and not stale:
+        return
+    connection = session.connection()
+    if events_by_batch:
+        for batch_id, timestamp in fold_new_events(connection, events_by_batch).items():
+            _mark(stale, buckets, batch_id, timestamp)
+    if stale:
+        _refresh_batches(connection, stale, buckets)
+
+
+@event.listens_for(Session, "do_orm_execute", insert=True)
+def _roll_up_bulk_inserts(state) -> None:
+    # ORM bulk inserts bypass the unit of work. In-order rows are folded in
+    # before the statement runs; back-dated ones are recomputed afterwards
+    # (next flush or commit), once the rows exist.
+    if not state.is_insert or state.bind_mapper is None or state.bind_mapper.class_ is not BatchTracking:
+        return
+    parameters = state.parameters
+    rows = parameters if isinstance(parameters, list) else [parameters or {}]
+    events_by_batch: Dict[int, List[Event]] = {}
+    for row in sorted((row for row in rows if row.get("batch_id") is not None and row.get("timestamp") is not None),
+                      key=lambda row: row["timestamp"]):
+        events_by_batch.setdefault(row["batch_id"], []).append(
+            (row["timestamp"], BatchStatus.parse(row.get("status")), row.get("location"))
+        )
+    if not events_by_batch:
+        return
+    stale = fold_new_events(state.session.connection(), events_by_batch)
+    if stale:
+        pending = state.session.info.setdefault(_PENDING, {})
+        for batch_id, timestamp in stale.items():
+            pending[batch_id] = min(pending.get(batch_id, timestamp), timestamp)
+
+
+@event.listens_for(Session, "before_commit")
+def _roll_up_pending(session: Session) -> None:
+    _apply_pending(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING, None)
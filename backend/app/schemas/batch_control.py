@@ -1,6 +1,10 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timezone
+import uuid
+
+from app.config import settings
+from app.models.batch_control import BatchStatus
 
 class ChatRequest(BaseModel):
     message: str
@@ -19,4 +23,40 @@ class BatchLocationResponse(BaseModel):
     location: str
     status: str
     timestamp: datetime
-    handler: Optional[str]
\ No newline at end of file
+    handler: Optional[str]
+
+class TrackingEventIn(BaseModel):
+    batch_code: str
+    location: str
+    status: BatchStatus
+    timestamp: Optional[datetime] = None  # defaults to the time of ingestion
+    handled_by: Optional[uuid.UUID] = None
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def parse_status(cls, value):
+        # Accept "In Transit", "IN_TRANSIT", "in transit", ...
+        return BatchStatus.parse(value) or value
+
+    @field_validator("timestamp")
+    @classmethod
+    def naive_utc(cls, value):
+        # Tracking timestamps are stored as naive UTC
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+class BulkTrackingRequest(BaseModel):
+    # Rows are validated one by one during ingestion, so one bad row doesn't reject the call
+    events: List[Dict[str, Any]] = Field(..., max_length=settings.INGEST_MAX_EVENTS)
+
+class IngestError(BaseModel):
+    index: int
+    batch_code: Optional[str] = None
+    error: str
+
+class BulkTrackingResponse(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: List[IngestError]
@@ -0,0 +1,23 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.retrieval import DEFAULT_INDEX_DIR, RetrievalIndex
+
+
+def build_retrieval_index():
+    directory = settings.RETRIEVAL_INDEX_DIR or DEFAULT_INDEX_DIR
+    index = RetrievalIndex(n_features=settings.RETRIEVAL_N_FEATURES)
+    with SessionLocal() as db:
+        index.rebuild(db)
+    index.save(directory)
+
+    print("Retrieval index built successfully!")
+    print(f"- Documents: {len(index)}")
+    print(f"- Artifact: {directory}")
+
+
+if __name__ == "__main__":
+    build_retrieval_index()
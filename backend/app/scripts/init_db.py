@@ -2,21 +2,15 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from app.models.common import Department, Employee
 from app.models.batch_control import Product, Batch, BatchTracking, BatchStatus
-from app.database import Base
-from app.config import settings
+from app.database import SessionLocal, upgrade_schema
 from datetime import datetime, date
 import uuid
 
 
 def init_database():
-    engine = create_engine(settings.DATABASE_URL)
-    Base.metadata.create_all(bind=engine)
-
-    SessionLocal = sessionmaker(bind=engine)
+    upgrade_schema()
     db = SessionLocal()
 
     try:
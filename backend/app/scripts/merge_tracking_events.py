@@ -0,0 +1,21 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database import SessionLocal, upgrade_schema
+from app.models.event_store import merge_legacy_tracking
+
+
+def merge():
+    # 0006 drops tracking_info and refuses to while rows remain unmerged
+    upgrade_schema(revision="0005")
+    with SessionLocal() as db:
+        rows = merge_legacy_tracking(db)
+    upgrade_schema()
+
+    print("tracking_info merged into batch_tracking successfully!")
+    print(f"- Rows copied: {rows}")
+
+
+if __name__ == "__main__":
+    merge()
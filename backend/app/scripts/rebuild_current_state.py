@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database import SessionLocal, upgrade_schema
+from app.models.current_state import rebuild_current_state
+
+
+def rebuild():
+    upgrade_schema()
+    with SessionLocal() as db:
+        rows = rebuild_current_state(db)
+
+    print("Batch current state rebuilt successfully!")
+    print(f"- Batches: {rows}")
+
+
+if __name__ == "__main__":
+    rebuild()
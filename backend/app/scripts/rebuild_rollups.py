@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database import SessionLocal, upgrade_schema
+from app.models.rollups import rebuild_rollups
+
+
+def rebuild():
+    upgrade_schema()
+    with SessionLocal() as db:
+        rows = rebuild_rollups(db)
+
+    print("Tracking rollups rebuilt successfully!")
+    print(f"- Rows: {rows}")
+
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,23 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.config import settings
+from app.services.intent_model import (
+    CORPUS_PATH, DEFAULT_MODEL_DIR, IntentModel, corpus_checksum, load_corpus
+)
+
+
+def train_intent_model():
+    texts, labels = load_corpus()
+    model = IntentModel.train(texts, labels, checksum=corpus_checksum())
+    directory = settings.INTENT_MODEL_DIR or DEFAULT_MODEL_DIR
+    model.save(directory)
+
+    print("Intent model trained successfully!")
+    print(f"- Corpus: {CORPUS_PATH} ({len(texts)} examples, {len(model.labels)} intents)")
+    print(f"- Artifact: {directory}")
+
+
+if __name__ == "__main__":
+    train_intent_model()
@@ -0,0 +1,193 @@
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+
+
+def normalize_batch_code(code: str) -> str:
+    """'vdt-052025-a', 'VDT052025A' and 'VDT 052025 A' all normalize to 'VDT052025A'."""
+    return _NON_ALNUM.sub('', code.upper())
+
+
+def _pattern_masks(pattern: str) -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def _bit_parallel_distance(masks: Dict[str, int], length: int, text: str) -> int:
+    """Myers/Hyyrö bit-vector Levenshtein distance between a pattern and ``text``."""
+    if not length:
+        return len(text)
+    full = (1 << length) - 1
+    high = 1 << (length - 1)
+    positive, negative, score = full, 0, length
+    for char in text:
+        eq = masks.get(char, 0)
+        xv = eq | negative
+        xh = (((eq & positive) + positive) ^ positive) | eq
+        ph = (negative | ~(xh | positive)) & full
+        mh = positive & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        positive = (mh | ~(xv | ph)) & full
+        negative = ph & xv
+    return score
+
+
+def edit_distance(a: str, b: str) -> int:
+    return _bit_parallel_distance(_pattern_masks(a), len(a), b)
+
+
+class EditDistanceIndex:
+    """
+    Pigeonhole (segment) index for bounded edit-distance search.
+
+    Each key of length ``l`` is cut into ``max_distance + 1`` segments. A query
+    within ``max_distance`` edits must reproduce at least one of them exactly,
+    shifted by at most ``max_distance`` characters, so a search is a few dozen
+    dict lookups plus a bit-parallel distance check on the few candidates.
+    """
+
+    def __init__(self, max_distance: int = 2):
+        self.max_distance = max_distance
+        self._segments: Dict[Tuple[int, int, str], List[str]] = {}
+        self._short: List[str] = []  # keys too short to split
+        self._keys: set = set()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _layout(self, length: int) -> List[Tuple[int, int]]:
+        parts = self.max_distance + 1
+        base, extra = divmod(length, parts)
+        layout, position = [], 0
+        for i in range(parts):
+            size = base + (1 if i >= parts - extra else 0)
+            layout.append((position, size))
+            position += size
+        return layout
+
+    def add(self, key: str) -> None:
+        if key in self._keys:
+            return
+        self._keys.add(key)
+        if len(key) <= self.max_distance:
+            self._short.append(key)
+            return
+        for i, (position, size) in enumerate(self._layout(len(key))):
+            self._segments.setdefault((len(key), i, key[position:position + size]), []).append(key)
+
+    def search(self, key: str, max_distance: Optional[int] = None) -> List[Tuple[int, str]]:
+        """Return ``(distance, key)`` pairs within ``max_distance``, closest first."""
+        bound = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        k = self.max_distance
+        candidates = set(self._short)
+        length = len(key)
+        for other in range(max(k + 1, length - bound), length + bound + 1):
+            # A segment shifted by ``s`` costs at least |s| edits before it and
+            # |delta - s| after it, which bounds the shifts worth probing.
+            delta = length - other
+            low, high = -((bound - delta) // 2), (bound + delta) // 2
+            for i, (position, size) in enumerate(self._layout(other)):
+                for start in range(max(0, position + low), min(position + high, length - size) + 1):
+                    found = self._segments.get((other, i, key[start:start + size]))
+                    if found:
+                        candidates.update(found)
+
+        masks = _pattern_masks(key)
+        results = []
+        for candidate in candidates:
+            if abs(len(candidate) - length) > bound:
+                continue
+            distance = _bit_parallel_distance(masks, length, candidate)
+            if distance <= bound:
+                results.append((distance, candidate))
+        results.sort()
+        return results
+
+
+class BatchCodeIndex:
+    """
+    In-memory index of known ``Batch.batch_code`` values.
+
+    Resolves user-typed codes to the canonical code without touching the
+    database: first by normalized exact match, then by the unique closest
+    code within ``max_distance`` edits. ``refresh`` only loads batches added
+    since the previous call.
+    """
+
+    def __init__(self, max_distance: int = 2):
+        self.max_distance = max_distance
+        self._codes: Dict[str, str] = {}  # normalized -> canonical
+        self._tree = EditDistanceIndex(max_distance)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __contains__(self, code: str) -> bool:
+        return normalize_batch_code(code) in self._codes
+
+    def add(self, code: str) -> None:
+        normalized = normalize_batch_code(code)
+        if not normalized:
+            return
+        with self._lock:
+            self._codes[normalized] = code
+            self._tree.add(normalized)
+
+    def discard(self, code: str) -> None:
+        # The segment index is append-only; dropping the mapping is enough
+        # because every search result is checked against it.
+        with self._lock:
+            self._codes.pop(normalize_batch_code(code), None)
+
+    def refresh(self, db: Session) -> int:
+        """Load batches created since the last refresh; return how many were added."""
+        from app.models.batch_control import Batch
+
+        rows = db.query(Batch.id, Batch.batch_code) \
+            .filter(Batch.id > self._last_id) \
+            .order_by(Batch.id) \
+            .all()
+        for batch_id, batch_code in rows:
+            self.add(batch_code)
+            self._last_id = batch_id
+        self.loaded = True
+        return len(rows)
+
+    def resolve(self, candidate: str) -> Optional[str]:
+        normalized = normalize_batch_code(candidate)
+        if not normalized:
+            return None
+        with self._lock:
+            exact = self._codes.get(normalized)
+            if exact is not None:
+                return exact
+            matches = [
+                (distance, word) for distance, word in self._tree.search(normalized, self.max_distance)
+                if word in self._codes
+            ]
+        if not matches:
+            return None
+        # Refuse to guess between equally close codes.
+        if len(matches) > 1 and matches[0][0] == matches[1][0]:
+            return None
+        return self._codes[matches[0][1]]
+
+
+# ✅ Exported singleton, loaded at startup by app.main
+batch_code_index = BatchCodeIndex(max_distance=settings.BATCH_CODE_MAX_EDIT_DISTANCE)
@@ -0,0 +1,242 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.vectorizer import HashingVectorizer
+
+_TOKEN = re.compile(r'[\w-]+')
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional time-to-live.
+
+    Entries are evicted least-recently-used first once ``maxsize`` is reached,
+    and treated as missing once older than ``ttl`` seconds. Hit, miss,
+    eviction and expiration counters are kept for monitoring.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SemanticResponseCache:
+    """
+    Cache for LLM responses, keyed on the exact prompt and on a similarity
+    signature of the user's text.
+
+    A lookup first tries the exact prompt, then the closest cached signature
+    (hashed char n-gram vectors, cosine similarity) above ``threshold``, so
+    rephrasings of the same question skip the model round trip. A similar
+    entry only counts when it was cached for the same ``context`` (the
+    grounding the prompt carries besides the user's text) and its text has
+    the same identifiers: batch codes and numbers differ by a character or
+    two, which the similarity barely notices. Entries expire after ``ttl``
+    seconds and are evicted least-recently-used first once either
+    ``max_entries`` or ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 ttl: Optional[float] = 3600, threshold: float = 0.92, n_features: int = 2 ** 11,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.threshold = threshold
+        self._clock = clock
+        self._vectorizer = HashingVectorizer(n_features=n_features)
+        # prompt -> (response, slot, size, expires_at, guard), in LRU order
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._signatures = np.zeros((max(max_entries, 1), n_features), dtype=np.float32)
+        self._slot_prompts: Dict[int, str] = {}
+        self._guard_slots: Dict[tuple, Set[int]] = {}  # guard -> slots similar prompts may match
+        self._free_slots = list(range(max(max_entries, 1) - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        vector = np.zeros(self._vectorizer.n_features, dtype=np.float32)
+        indices, values = self._vectorizer.transform_sparse(text)
+        vector[indices] = values
+        return vector
+
+    @staticmethod
+    def guard(text: str, context: str = "") -> Tuple[Tuple[str, ...], bytes]:
+        """What a similar entry must share exactly: identifier tokens of ``text`` and a fingerprint of ``context``."""
+        identifiers = tuple(sorted(
+            token for token in _TOKEN.findall(text.lower())
+            if len(token) == 1 or "-" in token or "_" in token or any(c.isdigit() for c in token)
+        ))
+        return identifiers, hashlib.blake2b(context.encode(), digest_size=16).digest()
+
+    def get(self, prompt: str, text: Optional[str] = None, context: str = "") -> Optional[str]:
+        """Cached response for ``prompt``, or for a prompt with the same ``context`` whose ``text`` is similar enough."""
+        text = text if text is not None else prompt
+        signature = self.signature(text)
+        guard = self.guard(text, context)
+        with self._lock:
+            now = self._clock()
+            entry = self._entries.get(prompt)
+            if entry is not None and not self._expired(prompt, entry, now):
+                self._entries.move_to_end(prompt)
+                self.hits += 1
+                return entry[0]
+
+            candidates = self._guard_slots.get(guard)
+            if candidates:
+                slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                scores = self._signatures[slots] @ signature
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    match = self._slot_prompts[int(slots[best])]
+                    entry = self._entries[match]
+                    if not self._expired(match, entry, now):
+                        self._entries.move_to_end(match)
+                        self.semantic_hits += 1
+                        return entry[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, prompt: str, response: str, text: Optional[str] = None, context: str = "") -> None:
+        if self.max_entries <= 0:
+            return
+        text = text if text is not None else prompt
+        signature = self.signature(text)
+        guard = self.guard(text, context)
+        size = len(prompt.encode()) + len(response.encode()) + signature.nbytes
+        if size > self.max_bytes:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            if prompt in self._entries:
+                self._remove(prompt)
+            while self._entries and (len(self._entries) >= self.max_entries
+                                     or self.bytes + size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            slot = self._free_slots.pop()
+            self._signatures[slot] = signature
+            self._slot_prompts[slot] = prompt
+            self._guard_slots.setdefault(guard, set()).add(slot)
+            self._entries[prompt] = (response, slot, size, expires_at, guard)
+            self.bytes += size
+
+    def clear(self) -> None:
+        with self._lock:
+            for prompt in list(self._entries):
+                self._remove(prompt)
+
+    def _expired(self, prompt: str, entry: tuple, now: float) -> bool:
+        expires_at = entry[3]
+        if expires_at is not None and expires_at <= now:
+            self._remove(prompt)
+            self.expirations += 1
+            return True
+        return False
+
+    def _remove(self, prompt: str) -> None:
+        _, slot, size, _, guard = self._entries.pop(prompt)
+        del self._slot_prompts[slot]
+        slots = self._guard_slots[guard]
+        slots.discard(slot)
+        if not slots:
+            del self._guard_slots[guard]
+        self._free_slots.append(slot)
+        self.bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# ✅ Shared cache for LLM fallback answers (RAG pipeline and chat handler)
+llm_response_cache = SemanticResponseCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LLM_CACHE_MAX_BYTES,
+    ttl=settings.LLM_CACHE_TTL_SECONDS,
+    threshold=settings.LLM_CACHE_SIMILARITY
+)
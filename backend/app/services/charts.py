@@ -0,0 +1,119 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.batch_control import batch_crud
+from app.models.batch_control import BatchStatus
+from app.models.rollups import GRANULARITIES, bucket_start
+
+# events: tracking events recorded per bucket
+# level:  batches in the status at the end of each bucket
+METRICS = ("events", "level")
+
+
+def period_start(period: Optional[str], now: datetime) -> Optional[datetime]:
+    """Start of the calendar ``period`` ("this week", ...) containing ``now``."""
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "today":
+        return midnight
+    if period == "week":
+        return midnight - timedelta(days=midnight.weekday())
+    if period == "month":
+        return midnight.replace(day=1)
+    if period == "quarter":
+        return midnight.replace(month=3 * ((midnight.month - 1) // 3) + 1, day=1)
+    if period == "year":
+        return midnight.replace(month=1, day=1)
+    return None
+
+
+def downsample(values: List[int], factor: int, metric: str) -> List[int]:
+    """Merge every ``factor`` buckets: events add up, a level keeps its closing value."""
+    if factor <= 1:
+        return values
+    windows = (values[i:i + factor] for i in range(0, len(values), factor))
+    return [sum(window) if metric == "events" else window[-1] for window in windows]
+
+
+def rollup_chart(db: Session, metric: str = "events", status: Optional[str] = None,
+                 start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 granularity: Optional[str] = None, location: Optional[str] = None,
+                 by_location: bool = False, max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Chart series from ``tracking_rollups``: one series, or one per location.
+
+    Without ``granularity`` hourly buckets are used when the range fits in
+    ``max_points`` of them, daily ones otherwise. Series longer than
+    ``max_points`` are downsampled on the server. Raises ``ValueError`` for
+    bad arguments.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    parsed = BatchStatus.parse(status)
+    if status and parsed is None:
+        raise ValueError(f"Unknown status: {status}")
+    max_points = max_points or settings.CHART_MAX_POINTS
+    end = naive_utc(end) or datetime.utcnow()
+    start = naive_utc(start) or end - timedelta(days=settings.CHART_DEFAULT_DAYS)
+    if start >= end:
+        raise ValueError("start must be before end")
+    if granularity is None:
+        granularity = "hour" if end - start <= GRANULARITIES["hour"] * max_points else "day"
+    elif granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    step = GRANULARITIES[granularity]
+    first = bucket_start(start, granularity)
+    count = math.ceil((end - first) / step)
+    rows = batch_crud.get_rollup_series(db, granularity, first, end, parsed, location, by_location,
+                                        "events" if metric == "events" else "net")
+    values: Dict[Optional[str], List[int]] = {}
+    for bucket, name, total in rows:
+        values.setdefault(name, [0] * count)[(bucket - first) // step] += int(total)
+
+    if metric == "level":
+        opening = batch_crud.get_rollup_levels(db, first, parsed, location, by_location)
+        for name, level in opening.items():
+            values.setdefault(name, [0] * count)
+        for name, series in values.items():
+            level = opening.get(name, 0)
+            for i, change in enumerate(series):
+                level += change
+                series[i] = level
+    if not by_location and None not in values:
+        values[None] = [0] * count
+
+    factor = max(1, math.ceil(count / max_points))
+    labels = [(first + i * factor * step).strftime("%Y-%m-%d %H:%M") for i in range(math.ceil(count / factor))]
+    return {
+        "metric": metric,
+        "status": parsed.value if parsed else None,
+        "granularity": granularity,
+        "bucket_seconds": int((step * factor).total_seconds()),
+        "downsampled": factor > 1,
+        "start": first,
+        "end": end,
+        "series": [
+            {"name": _series_name(name, by_location),
+             "points": [{"x": x, "y": y} for x, y in zip(labels, downsample(series, factor, metric))]}
+            for name, series in sorted(values.items(), key=lambda item: item[0] or "")
+            # Locations that never held a batch in this status over the range add nothing
+            if not by_location or any(series)
+        ],
+    }
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Tracking timestamps are stored as naive UTC
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _series_name(name: Optional[str], by_location: bool) -> str:
+    if not by_location:
+        return "All"
+    return name or "Unknown"
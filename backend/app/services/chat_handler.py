@@ -1,14 +1,19 @@
+import logging
+import time
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud.batch_control import batch_crud
-from app.services.nlu import NLUService, QueryIntent
+from app.services.nlu import nlu_service, normalize_query, QueryIntent
+from app.services.cache import llm_response_cache
+from app.services.llm_gateway import llm_gateway, LLMUnavailable, LLM_UNAVAILABLE_MESSAGE
+from app.services.metrics import current_intent, track, STAGE_SECONDS
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage
 from app.config import settings  # ✅ Load env vars
-from typing import Tuple, Dict  # ✅ Needed for return typing
+from typing import Tuple, Dict, Optional  # ✅ Needed for return typing
 
+logger = logging.getLogger(__name__)
 
-# Initialize services
-nlu_service = NLUService()
 
 # ✅ Gemini LLM setup
 llm = ChatGoogleGenerativeAI(
@@ -18,10 +23,35 @@ llm = ChatGoogleGenerativeAI(
 )
 
 # ✅ Core chatbot logic
-async def process_user_query(query: str, db: Session) -> str:
+async def process_user_query(query: str, db: AsyncSession) -> Tuple[str, QueryIntent, Dict]:
+    start = time.perf_counter()
     parsed = nlu_service.process_query(query)
     intent = parsed["intent"]
     entities = parsed["entities"]
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="nlu", intent=intent.value)
+    current_intent.set(intent.value)
+
+    # DB-backed answers run as sync ORM code over the async connection
+    answer = await db.run_sync(lambda session: answer_from_database(intent, entities, session))
+    if answer is not None:
+        return answer, intent, entities
+
+    # ✅ Fallback to Gemini for unknown intents (near-duplicates served from cache)
+    text = normalize_query(query)
+    cached = llm_response_cache.get(query, text)
+    if cached is not None:
+        return cached, intent, entities
+    try:
+        with track("llm"):
+            gemini_response = (await llm_gateway.ainvoke(llm, [HumanMessage(content=query)])).content.strip()
+    except LLMUnavailable as e:
+        logger.warning("LLM call failed: %s", e)
+        return LLM_UNAVAILABLE_MESSAGE, intent, entities
+    llm_response_cache.set(query, gemini_response, text)
+    return gemini_response, intent, entities
+
+
+def answer_from_database(intent: QueryIntent, entities: Dict, db: Session) -> Optional[str]:
     batch_code = entities.get("batch_code")
     status = entities.get("status")
 
@@ -33,7 +63,7 @@ async def process_user_query(query: str, db: Session) -> str:
             return f"No tracking info found for batch {batch_code}."
         return (
             f"Batch {batch_code} is currently at {data['location']} with status '{data['status']}'. "
-            f"It was last handled by {data['handler']} on {data['timestamp']}."
+            f"It was last handled by {data['handler']} on {batch_crud.event_time(data['timestamp'])}."
         )
 
     elif intent == QueryIntent.BATCH_HISTORY:
@@ -46,7 +76,7 @@ async def process_user_query(query: str, db: Session) -> str:
         if not history:
             return f"No tracking history found for batch {batch_code}."
         return f"Tracking history for batch {batch_code}:\n" + "\n".join(
-            f"- {entry.timestamp.strftime('%Y-%m-%d %H:%M')} at {entry.location} (status: {entry.status.value})"
+            f"- {batch_crud.event_time(entry.timestamp)} at {entry.location} (status: {entry.status.value})"
             for entry in history
         )
 
@@ -61,6 +91,4 @@ async def process_user_query(query: str, db: Session) -> str:
             for r in results
         )
 
-    # ✅ Fallback to Gemini for unknown intents
-    gemini_response = llm.invoke([HumanMessage(content=query)])
-    return gemini_response.content.strip(), intent, entities
+    return None
@@ -0,0 +1,420 @@
+import bisect
+import re
+import threading
+import time
+from calendar import monthrange
+from datetime import date, timedelta
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.batch_control import batch_crud
+from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+
+# Session.info keys: batches changed by the transaction / a bulk write that needs a rebuild
+_CHANGED = "expiry_calendar_changed"
+_REBUILD = "expiry_calendar_rebuild"
+
+_NON_WORD = re.compile(r'[^\w\s-]+')
+
+# (status label or None when untracked, location key)
+BucketKey = Tuple[Optional[str], str]
+
+
+def location_key(location: Optional[str]) -> str:
+    """Case- and punctuation-insensitive form of a location, as NLU sees it ("Warehouse B" -> "warehouse b")."""
+    return " ".join(_NON_WORD.sub(" ", (location or "").lower()).split())
+
+
+def period_end(period: Optional[str], today: date) -> Optional[date]:
+    """Last day of the calendar ``period`` ("this month", ...) containing ``today``."""
+    if period == "today":
+        return today
+    if period == "week":
+        return today + timedelta(days=6 - today.weekday())
+    if period in ("month", "quarter", "year"):
+        month = {"month": today.month, "quarter": 3 * ((today.month - 1) // 3) + 3, "year": 12}[period]
+        return date(today.year, month, monthrange(today.year, month)[1])
+    return None
+
+
+class _Bucket:
+    __slots__ = ("items", "quantity")
+
+    def __init__(self):
+        self.items: Dict[int, dict] = {}
+        self.quantity = 0
+
+
+class _Calendar:
+    """Expiry entries by batch id and by day / (status, location), with per-bucket totals."""
+
+    def __init__(self):
+        self.entries: Dict[int, dict] = {}
+        self.days: Dict[date, Dict[BucketKey, _Bucket]] = {}
+        self.dates: List[date] = []  # days with batches, sorted
+        self.locations: Dict[str, List[Any]] = {}  # key -> [display name, batches]
+
+    def add(self, row: dict) -> None:
+        day = row["expiry_date"]
+        key = (row["status"], location_key(row["location"]))
+        buckets = self.days.get(day)
+        if buckets is None:
+            buckets = self.days[day] = {}
+            bisect.insort(self.dates, day)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _Bucket()
+        bucket.items[row["batch_id"]] = row
+        bucket.quantity += row["quantity"]
+        self.entries[row["batch_id"]] = row
+        if key[1]:
+            self.locations.setdefault(key[1], [row["location"], 0])[1] += 1
+
+    def remove(self, batch_id: int) -> None:
+        row = self.entries.pop(batch_id, None)
+        if row is None:
+            return
+        day = row["expiry_date"]
+        key = (row["status"], location_key(row["location"]))
+        buckets = self.days[day]
+        bucket = buckets[key]
+        del bucket.items[batch_id]
+        bucket.quantity -= row["quantity"]
+        if not bucket.items:
+            del buckets[key]
+            if not buckets:
+                del self.days[day]
+                self.dates.pop(bisect.bisect_left(self.dates, day))
+        if key[1]:
+            location = self.locations[key[1]]
+            location[1] -= 1
+            if not location[1]:
+                del self.locations[key[1]]
+
+
+class ExpiryCalendar:
+    """
+    Batches expiring within ``horizon_days`` either side of today, bucketed
+    by expiry day and then by current (status, location), with batch and
+    unit totals kept per bucket. An "expiring soon" question sums the
+    buckets of the days in its range and lists batches until ``limit``:
+    its cost depends on the days asked about, not on how many batches
+    there are.
+
+    * Loaded with one range scan over ``ix_batches_expiry_date`` and
+      rebuilt when the day changes, every ``rebuild_interval`` seconds,
+      and after bulk updates or deletes, by the background refresher
+      (``refresh``); readers never wait for a rebuild.
+    * In between, at most every ``refresh_interval`` seconds, only batches
+      that changed are reloaded: batches created or tracked since the last
+      look (found by primary-key high-water marks) and batches this process
+      committed changes to, which are picked up on the next read.
+    * Ranges reaching past the horizon, and questions asked before the
+      calendar is loaded or while a bulk write awaits its rebuild, are
+      answered by the indexed query (``BatchCRUD.get_expiring_batches``).
+    """
+
+    def __init__(self, horizon_days: int = 365, refresh_interval: float = 5, rebuild_interval: float = 3600,
+                 expiring_within_days: int = 30, clock: Callable[[], float] = time.monotonic):
+        self.horizon_days = horizon_days
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.expiring_within_days = expiring_within_days
+        self._clock = clock
+        self._lock = threading.Lock()  # guards the calendar and the pending changes
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+        self._calendar = _Calendar()
+        self._dirty: Set[int] = set()
+        self._check = False
+        self._stale = False
+        self._batch_mark = 0
+        self._tracking_mark = 0
+        self._loaded_on: Optional[date] = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self.loaded = False
+        self.rebuilds = 0
+        self.updates = 0
+
+    def __len__(self) -> int:
+        return len(self._calendar.entries)
+
+    def window(self, today: Optional[date] = None) -> Tuple[date, date]:
+        """Expiry dates held in memory, both ends inclusive."""
+        today = today or date.today()
+        return today - timedelta(days=self.horizon_days), today + timedelta(days=self.horizon_days)
+
+    # ---- changes -----------------------------------------------------------
+
+    def mark_dirty(self, batch_ids: Iterable[int]) -> None:
+        """Reload ``batch_ids`` (and look for new ones) on the next read."""
+        with self._lock:
+            self._dirty.update(batch_ids)
+            self._check = True
+
+    def invalidate(self) -> None:
+        """Rebuild on the next read."""
+        with self._lock:
+            self._stale = True
+
+    def refresh_if_due(self, db: Session) -> bool:
+        """
+        Read path: apply pending changes unless a refresh is already running,
+        in which case the current calendar is served. Loads and rebuilds are
+        left to ``refresh`` (the background refresher). Returns whether the
+        calendar can answer: not before it is loaded, nor after a bulk write
+        until it is rebuilt.
+        """
+        if not self.loaded or self._stale:
+            return False
+        if self._check or self._clock() - self._checked_at >= self.refresh_interval:
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    if not self._stale:
+                        self._update(db, self._loaded_on, self._clock())
+                finally:
+                    self._refresh_lock.release()
+        return not self._stale
+
+    def refresh(self, db: Session, rebuild: bool = False) -> int:
+        """Bring the calendar up to date; returns the batches (re)loaded."""
+        with self._refresh_lock:
+            now = self._clock()
+            today = date.today()
+            if (rebuild or not self.loaded or self._stale or self._loaded_on != today
+                    or now - self._built_at >= self.rebuild_interval):
+                return self._rebuild(db, today, now)
+            return self._update(db, today, now)
+
+    def _rebuild(self, db: Session, today: date, now: float) -> int:
+        with self._lock:
+            self._dirty.clear()
+            self._check = self._stale = False
+        try:
+            # Marks first: anything written while the rows load is reloaded next time
+            batch_mark, tracking_mark = batch_crud.get_high_water_marks(db)
+            rows = batch_crud.get_expiry_entries(db, *self.window(today))
+        except Exception:
+            self.invalidate()
+            raise
+        # Filled outside the lock: readers keep using the old calendar meanwhile
+        calendar = _Calendar()
+        for row in rows:
+            calendar.add(row)
+        with self._lock:
+            self._calendar = calendar
+            self._batch_mark, self._tracking_mark = batch_mark, tracking_mark
+            self._loaded_on, self._built_at, self._checked_at = today, now, now
+            self.loaded = True
+            self.rebuilds += 1
+        return len(rows)
+
+    def _update(self, db: Session, today: date, now: float) -> int:
+        with self._lock:
+            batch_ids, self._dirty = self._dirty, set()
+            self._check = False
+        try:
+            changed, batch_mark, tracking_mark = batch_crud.get_changed_batch_ids(
+                db, self._batch_mark, self._tracking_mark
+            )
+            batch_ids |= changed
+            rows = batch_crud.get_expiry_entries(db, *self.window(today), batch_ids) if batch_ids else []
+        except Exception:
+            self.mark_dirty(batch_ids)
+            raise
+        with self._lock:
+            for batch_id in batch_ids:
+                self._calendar.remove(batch_id)
+            for row in rows:
+                self._calendar.add(row)
+            self._batch_mark, self._tracking_mark = batch_mark, tracking_mark
+            self._checked_at = now
+            self.updates += 1
+        return len(batch_ids)
+
+    # ---- queries -----------------------------------------------------------
+
+    def expiring(self, db: Session, start: Optional[date] = None, end: Optional[date] = None,
+                 location: Optional[str] = None, status: Optional[str] = None,
+                 limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Batches expiring between ``start`` (default today) and ``end``
+        (default ``expiring_within_days`` later), both inclusive, optionally
+        only those currently at ``location`` and / or in ``status``: totals,
+        batches and units per expiry day, and the batches themselves,
+        soonest first, up to ``limit``. Raises ``ValueError`` for bad
+        arguments.
+        """
+        parsed = BatchStatus.parse(status)
+        if status and parsed is None:
+            raise ValueError(f"Unknown status: {status}")
+        start = start or date.today()
+        end = end or start + timedelta(days=self.expiring_within_days)
+        if start > end:
+            raise ValueError("start must not be after end")
+
+        # The window loaded, which may lag a day behind until the next rebuild
+        low, high = self.window(self._loaded_on)
+        if low <= start and end <= high and self.refresh_if_due(db):
+            result = self._from_calendar(start, end, location, parsed, limit)
+        else:
+            result = self._from_rows(batch_crud.get_expiring_batches(db, start, end, location, parsed), limit)
+        return {
+            "start": start,
+            "end": end,
+            "location": self._location_name(location),
+            "status": parsed.value if parsed else None,
+            **result,
+        }
+
+    def _from_calendar(self, start: date, end: date, location: Optional[str], status: Optional[BatchStatus],
+                       limit: Optional[int]) -> Dict[str, Any]:
+        wanted_location = location_key(location) if location is not None else None
+        wanted_status = status.value if status else None
+        days, batches = [], []
+        total_batches = total_quantity = 0
+        with self._lock:
+            calendar = self._calendar
+            first = bisect.bisect_left(calendar.dates, start)
+            last = bisect.bisect_right(calendar.dates, end)
+            for day in calendar.dates[first:last]:
+                matched = [
+                    bucket for (bucket_status, bucket_location), bucket in calendar.days[day].items()
+                    if (wanted_status is None or bucket_status == wanted_status)
+                    and (wanted_location is None or bucket_location == wanted_location)
+                ]
+                count = sum(len(bucket.items) for bucket in matched)
+                if not count:
+                    continue
+                quantity = sum(bucket.quantity for bucket in matched)
+                days.append({"date": day, "batches": count, "quantity": quantity})
+                total_batches += count
+                total_quantity += quantity
+                if limit is None or len(batches) < limit:
+                    items = sorted((row for bucket in matched for row in bucket.items.values()),
+                                   key=lambda row: row["batch_code"])
+                    batches.extend(self._public(row) for row in items)
+        listed = batches if limit is None else batches[:limit]
+        return {
+            "total_batches": total_batches,
+            "total_quantity": total_quantity,
+            "days": days,
+            "batches": listed,
+            "more": total_batches - len(listed),
+            "source": "calendar",
+        }
+
+    def _from_rows(self, rows: List[dict], limit: Optional[int]) -> Dict[str, Any]:
+        days: Dict[date, dict] = {}
+        for row in rows:
+            day = days.setdefault(row["expiry_date"], {"date": row["expiry_date"], "batches": 0, "quantity": 0})
+            day["batches"] += 1
+            day["quantity"] += row["quantity"]
+        listed = rows if limit is None else rows[:limit]
+        return {
+            "total_batches": len(rows),
+            "total_quantity": sum(row["quantity"] for row in rows),
+            "days": list(days.values()),
+            "batches": [self._public(row) for row in listed],
+            "more": len(rows) - len(listed),
+            "source": "database",
+        }
+
+    @staticmethod
+    def _public(row: dict) -> dict:
+        return {name: value for name, value in row.items() if name != "batch_id"}
+
+    def _location_name(self, location: Optional[str]) -> Optional[str]:
+        if location is None:
+            return None
+        known = self._calendar.locations.get(location_key(location))
+        return known[0] if known else location
+
+    def match_location(self, text: str) -> Optional[str]:
+        """The longest known location named in ``text`` (whole words, any case), e.g. for NLU."""
+        padded = f" {location_key(text)} "
+        with self._lock:
+            names = [(key, entry[0]) for key, entry in self._calendar.locations.items()]
+        found = [(len(key), name) for key, name in names if f" {key} " in padded]
+        return max(found)[1] if found else None
+
+    # ---- monitoring --------------------------------------------------------
+
+    def stats(self) -> Dict[str, int]:
+        calendar = self._calendar
+        return {
+            "batches": len(calendar.entries),
+            "days": len(calendar.dates),
+            "locations": len(calendar.locations),
+            "pending": len(self._dirty),
+            "rebuilds": self.rebuilds,
+            "updates": self.updates,
+        }
+
+
+# ✅ Export singleton
+expiry_calendar = ExpiryCalendar(
+    horizon_days=settings.EXPIRY_CALENDAR_HORIZON_DAYS,
+    refresh_interval=settings.EXPIRY_CALENDAR_REFRESH_SECONDS,
+    rebuild_interval=settings.EXPIRY_CALENDAR_REBUILD_SECONDS,
+    expiring_within_days=settings.STATS_EXPIRING_WITHIN_DAYS
+)
+
+
+# ✅ Session hooks: note batches whose expiry entry may have changed, reload them once committed
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_batches(session: Session, flush_context) -> None:
+    changed: Set[int] = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Batch):
+            changed.add(obj.id)
+        elif isinstance(obj, BatchTracking):
+            changed.add(obj.batch_id)
+            # A re-parented event changes its old batch's current state too
+            changed.update(inspect(obj).attrs.batch_id.history.deleted)
+        elif isinstance(obj, Product) and obj in session.dirty:
+            session.info[_REBUILD] = True
+    changed.discard(None)
+    if changed:
+        session.info.setdefault(_CHANGED, set()).update(changed)
+
+
+# insert=True: runs ahead of hooks that execute the statement themselves
+@event.listens_for(Session, "do_orm_execute", insert=True)
+def _note_bulk_writes(state) -> None:
+    if state.is_select or state.bind_mapper is None:
+        return
+    model = state.bind_mapper.class_
+    if model not in (Batch, BatchTracking, Product):
+        return
+    if not state.is_insert or model is Product:
+        # Bulk updates / deletes do not say which batches they touched
+        state.session.info[_REBUILD] = True
+        return
+    parameters = state.parameters
+    rows = parameters if isinstance(parameters, list) else [parameters or {}]
+    column = "id" if model is Batch else "batch_id"
+    # Batches inserted without explicit ids are found by the high-water mark
+    state.session.info.setdefault(_CHANGED, set()).update(
+        row[column] for row in rows if row.get(column) is not None
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_on_commit(session: Session) -> None:
+    changed = session.info.pop(_CHANGED, None)
+    if session.info.pop(_REBUILD, False):
+        expiry_calendar.invalidate()
+    elif changed is not None:
+        expiry_calendar.mark_dirty(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_CHANGED, None)
+    session.info.pop(_REBUILD, None)
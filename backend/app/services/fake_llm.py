@@ -0,0 +1,51 @@
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain.schema import AIMessage
+from langchain.schema.messages import AIMessageChunk
+
+
+class FakeLLM:
+    """
+    Stand-in for the Gemini chat model with configurable latency and error rate.
+
+    Exposes the subset of the LangChain chat-model interface the app uses
+    (``invoke`` / ``ainvoke`` / ``astream``), so load tests and local runs can exercise the
+    real code paths without network calls or quota.
+    """
+
+    def __init__(self, latency: float = 0.5, response: str = "This is a canned answer.",
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.response = response
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _reply(self, messages: List[Any]) -> AIMessage:
+        self.calls += 1
+        self._maybe_fail()
+        return AIMessage(content=self.response)
+
+    def _maybe_fail(self) -> None:
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise RuntimeError("FakeLLM: simulated upstream error")
+
+    def invoke(self, messages: List[Any], **kwargs: Any) -> AIMessage:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def ainvoke(self, messages: List[Any], **kwargs: Any) -> AIMessage:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+    async def astream(self, messages: List[Any], **kwargs: Any) -> AsyncIterator[AIMessageChunk]:
+        # Spread the latency over the words, like a model emitting tokens
+        words = self.response.split(" ")
+        self.calls += 1
+        self._maybe_fail()
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            yield AIMessageChunk(content=word if i == 0 else f" {word}")
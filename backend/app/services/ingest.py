@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.batch_control import batch_crud
+from app.models.batch_control import BatchTracking
+from app.schemas.batch_control import TrackingEventIn
+from app.services.metrics import registry, track
+
+INGESTED_EVENTS = registry.counter(
+    "chatbot_ingested_events_total", "Tracking events received by bulk ingestion.", ("outcome",)
+)
+
+
+def ingest_tracking_events(db: Session, events: Sequence[Union[Dict[str, Any], TrackingEventIn]],
+                           chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Insert many tracking events and commit once.
+
+    Rows are validated individually, batch codes are resolved with one
+    ``IN (...)`` query, and valid rows go in as multi-row INSERTs of
+    ``chunk_size``, each inside a savepoint. If a chunk is rejected by the
+    database, its rows are retried one at a time so only the bad ones fail.
+    Returns counts plus ``errors`` (``index``, ``batch_code``, ``error``)
+    in input order.
+    """
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    errors: List[Dict[str, Any]] = []
+    valid: List[Tuple[int, TrackingEventIn]] = []
+    for index, raw in enumerate(events):
+        try:
+            valid.append((index, raw if isinstance(raw, TrackingEventIn) else TrackingEventIn.model_validate(raw)))
+        except ValidationError as e:
+            code = raw.get("batch_code") if isinstance(raw, dict) else None
+            errors.append(_error(index, str(code) if code is not None else None, _describe(e)))
+
+    with track("ingest.resolve", intent="ingest"):
+        batch_ids = batch_crud.get_batch_ids_by_codes(db, {event.batch_code for _, event in valid})
+    now = datetime.utcnow()
+    rows: List[Tuple[int, str, Dict[str, Any]]] = []
+    for index, event in valid:
+        batch_id = batch_ids.get(event.batch_code)
+        if batch_id is None:
+            errors.append(_error(index, event.batch_code, "Unknown batch code"))
+            continue
+        rows.append((index, event.batch_code, {
+            "batch_id": batch_id,
+            "location": event.location,
+            "status": event.status,
+            "timestamp": event.timestamp or now,
+            "handled_by": event.handled_by,
+        }))
+
+    inserted = 0
+    with track("ingest.insert", intent="ingest"):
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                with db.begin_nested():
+                    db.execute(insert(BatchTracking), [row for _, _, row in chunk])
+                inserted += len(chunk)
+                continue
+            except SQLAlchemyError:
+                pass
+            for index, batch_code, row in chunk:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(BatchTracking), [row])
+                    inserted += 1
+                except SQLAlchemyError as e:
+                    errors.append(_error(index, batch_code, str(getattr(e, "orig", None) or e)))
+        db.commit()
+
+    INGESTED_EVENTS.inc(inserted, outcome="inserted")
+    INGESTED_EVENTS.inc(len(errors), outcome="failed")
+    return {
+        "received": len(events),
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": sorted(errors, key=lambda error: error["index"]),
+    }
+
+
+def _error(index: int, batch_code: Optional[str], message: str) -> Dict[str, Any]:
+    return {"index": index, "batch_code": batch_code, "error": message}
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
@@ -0,0 +1,151 @@
+import json
+import logging
+import zlib
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.vectorizer import HashingVectorizer
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CORPUS_PATH = DATA_DIR / "intent_corpus.tsv"
+DEFAULT_MODEL_DIR = DATA_DIR / "intent_model"
+
+
+def load_corpus(path: Path = CORPUS_PATH) -> Tuple[List[str], List[str]]:
+    """Read ``intent<TAB>text`` lines; blank lines and ``#`` comments are skipped."""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            label, text = line.split("\t", 1)
+            labels.append(label)
+            texts.append(text)
+    return texts, labels
+
+
+def corpus_checksum(path: Path = CORPUS_PATH) -> int:
+    return zlib.crc32(Path(path).read_bytes())
+
+
+class IntentModel:
+    """
+    Char n-gram TF-IDF + multinomial logistic regression, in NumPy only.
+
+    The artifact is a directory holding ``weights.npy`` (one row per hashed
+    feature: the IDF weight followed by one coefficient per label) and a
+    small ``meta.json``. Weights are loaded memory-mapped, so a prediction
+    only pages in the rows for the n-grams present in the query.
+    """
+
+    WEIGHTS_FILE = "weights.npy"
+    META_FILE = "meta.json"
+
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray,
+                 vectorizer: HashingVectorizer, checksum: Optional[int] = None):
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+        self.vectorizer = vectorizer
+        self.checksum = checksum
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], n_features: int = 2 ** 13,
+              epochs: int = 200, learning_rate: float = 0.05, l2: float = 1e-4,
+              checksum: Optional[int] = None) -> "IntentModel":
+        vectorizer = HashingVectorizer(n_features=n_features)
+        idf = vectorizer.fit_idf(texts)
+        features = vectorizer.transform(texts, idf)
+
+        classes = sorted(set(labels))
+        targets = np.zeros((len(texts), len(classes)), dtype=np.float32)
+        targets[np.arange(len(texts)), [classes.index(label) for label in labels]] = 1.0
+
+        coef = np.zeros((n_features, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        # Adam on the full batch: the corpus is small enough to fit in memory.
+        moments = [np.zeros_like(coef), np.zeros_like(coef), np.zeros_like(bias), np.zeros_like(bias)]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            probabilities = _softmax(features @ coef + bias)
+            error = (probabilities - targets) / len(texts)
+            grads = (features.T @ error + l2 * coef, error.sum(axis=0))
+            for param, grad, first, second in ((coef, grads[0], moments[0], moments[1]),
+                                               (bias, grads[1], moments[2], moments[3])):
+                first *= beta1
+                first += (1 - beta1) * grad
+                second *= beta2
+                second += (1 - beta2) * grad * grad
+                corrected = learning_rate * np.sqrt(1 - beta2 ** step) / (1 - beta1 ** step)
+                param -= corrected * first / (np.sqrt(second) + eps)
+
+        weights = np.concatenate([idf[:, None], coef], axis=1).astype(np.float32)
+        return cls(classes, weights, bias, vectorizer, checksum)
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / self.WEIGHTS_FILE, np.ascontiguousarray(self.weights))
+        meta = {
+            "labels": self.labels,
+            "bias": [float(b) for b in self.bias],
+            "n_features": self.vectorizer.n_features,
+            "ngram_range": list(self.vectorizer.ngram_range),
+            "checksum": self.checksum,
+        }
+        (directory / self.META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path) -> "IntentModel":
+        directory = Path(directory)
+        meta = json.loads((directory / cls.META_FILE).read_text(encoding="utf-8"))
+        weights = np.load(directory / cls.WEIGHTS_FILE, mmap_mode="r")
+        vectorizer = HashingVectorizer(n_features=meta["n_features"], ngram_range=tuple(meta["ngram_range"]))
+        return cls(meta["labels"], weights, np.asarray(meta["bias"], dtype=np.float32), vectorizer,
+                   meta.get("checksum"))
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        indices, values = self.vectorizer.transform_sparse(text)
+        rows = np.asarray(self.weights[indices])
+        values = values * rows[:, 0]
+        norm = float(np.sqrt(values @ values))
+        if norm:
+            values /= norm
+        return _softmax(values @ rows[:, 1:] + self.bias)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely label and its probability."""
+        probabilities = self.predict_proba(text)
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    shifted = np.exp(scores - scores.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+def load_or_train(directory: Optional[Path] = None, corpus_path: Path = CORPUS_PATH) -> IntentModel:
+    """
+    Load the artifact in ``directory``, retraining from the shipped corpus
+    when it is missing or was built from a different corpus.
+    """
+    directory = Path(directory or DEFAULT_MODEL_DIR)
+    checksum = corpus_checksum(corpus_path)
+    if (directory / IntentModel.WEIGHTS_FILE).exists():
+        model = IntentModel.load(directory)
+        if model.checksum == checksum:
+            return model
+
+    texts, labels = load_corpus(corpus_path)
+    model = IntentModel.train(texts, labels, checksum=checksum)
+    try:
+        model.save(directory)
+    except OSError as e:
+        logger.warning("Could not save intent model to %s: %s", directory, e)
+    return model
@@ -0,0 +1,255 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from app.config import settings
+from app.services.metrics import registry
+
+# Deterministic answer for callers when the gateway refuses or abandons a call
+LLM_UNAVAILABLE_MESSAGE = "The assistant is busy right now. Please try again in a moment."
+
+GATEWAY_CALLS = registry.counter(
+    "chatbot_llm_gateway_calls_total", "LLM calls by gateway outcome.", ("outcome",)
+)
+
+
+class LLMUnavailable(Exception):
+    """Raised instead of calling the model: circuit open, overloaded, timed out or failed."""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"LLM unavailable ({reason}){': ' + detail if detail else ''}")
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. ``failure_threshold`` consecutive failures
+    open it; after ``reset_timeout`` seconds one probe call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """True while calls are being refused (open and not yet due for a probe)."""
+        with self._lock:
+            return self.state == self.OPEN and self._clock() - self.opened_at < self.reset_timeout
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+                self._probing = False
+
+    def release_probe(self) -> None:
+        """A half-open probe never reached the model (e.g. shed); let another try."""
+        with self._lock:
+            self._probing = False
+
+
+class LLMGateway:
+    """
+    Admission control shared by every LLM caller (RAG pipeline, chat handler,
+    agent tools):
+
+    * at most ``max_concurrency`` model calls run at once, across threads
+      and the event loop;
+    * at most ``max_queue`` callers wait for a slot, the rest are shed;
+    * each call has a deadline covering queueing and the model round trip;
+    * a circuit breaker fails fast while the model keeps failing.
+
+    Refusals and failures raise ``LLMUnavailable``; callers answer with
+    ``LLM_UNAVAILABLE_MESSAGE``. Models are passed per call, so tests can
+    swap in a fake.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, timeout: float = 20.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        # Event-loop callers park here while waiting for a slot (at most max_queue of them)
+        self._waiters = ThreadPoolExecutor(max_workers=max(max_queue, 1), thread_name_prefix="llm-wait")
+        self.in_flight = 0
+        self.waiting = 0
+
+    # ---- admission -------------------------------------------------------
+
+    def _admit(self) -> float:
+        """Check the breaker and queue depth; return the call's deadline."""
+        if not self.breaker.allow():
+            self._count("circuit_open")
+            raise LLMUnavailable("circuit_open")
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.breaker.release_probe()
+                self._count("shed")
+                raise LLMUnavailable("overloaded", f"{self.waiting} callers queued")
+            self.waiting += 1
+        return time.monotonic() + self.timeout
+
+    def _acquired(self, acquired: bool) -> None:
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+        if not acquired:
+            self.breaker.release_probe()
+            self._count("shed")
+            raise LLMUnavailable("overloaded", "no slot before the deadline")
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    async def _acquire_async(self, deadline: float) -> None:
+        if self._slots.acquire(blocking=False):
+            return self._acquired(True)
+        loop = asyncio.get_running_loop()
+        pending = loop.run_in_executor(self._waiters, self._slots.acquire, True, max(0.0, deadline - time.monotonic()))
+        try:
+            acquired = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # Hand the slot back if the wait completes after the caller went away
+            pending.add_done_callback(lambda f: f.result() and self._slots.release())
+            with self._lock:
+                self.waiting -= 1
+            raise
+        self._acquired(acquired)
+
+    # ---- outcomes --------------------------------------------------------
+
+    def _succeeded(self) -> None:
+        self.breaker.record_success()
+        self._count("ok")
+
+    def _failed(self, reason: str, error: BaseException) -> LLMUnavailable:
+        self.breaker.record_failure()
+        self._count(reason)
+        return LLMUnavailable(reason, str(error))
+
+    @staticmethod
+    def _count(outcome: str) -> None:
+        GATEWAY_CALLS.inc(outcome=outcome)
+
+    # ---- calls -----------------------------------------------------------
+
+    def invoke(self, llm: Any, messages: Any) -> Any:
+        deadline = self._admit()
+        self._acquired(self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())))
+        # The slot is held until the model call really finishes, even if the
+        # caller gives up at the deadline, so concurrency stays bounded.
+        future = self._executor.submit(llm.invoke, messages)
+        future.add_done_callback(lambda _: self._release())
+        try:
+            result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout as e:
+            raise self._failed("timeout", e) from e
+        except Exception as e:
+            raise self._failed("error", e) from e
+        self._succeeded()
+        return result
+
+    async def ainvoke(self, llm: Any, messages: Any) -> Any:
+        deadline = self._admit()
+        await self._acquire_async(deadline)
+        try:
+            result = await asyncio.wait_for(llm.ainvoke(messages), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError as e:
+            raise self._failed("timeout", e) from e
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            raise self._failed("error", e) from e
+        finally:
+            self._release()
+        self._succeeded()
+        return result
+
+    async def astream(self, llm: Any, messages: Any) -> AsyncIterator[Any]:
+        """Stream chunks; the deadline covers the whole stream."""
+        deadline = self._admit()
+        await self._acquire_async(deadline)
+        stream = llm.astream(messages).__aiter__()
+        settled = False
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), max(0.0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError as e:
+                    settled = True
+                    raise self._failed("timeout", e) from e
+                except Exception as e:
+                    settled = True
+                    raise self._failed("error", e) from e
+                yield chunk
+            settled = True
+            self._succeeded()
+        finally:
+            self._release()
+            if not settled:
+                # Consumer went away mid-stream: no verdict on the model
+                self.breaker.release_probe()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "circuit_open": int(self.breaker.is_open()),
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+# ✅ Export singleton
+llm_gateway = LLMGateway(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_queue=settings.LLM_MAX_QUEUE,
+    timeout=settings.LLM_TIMEOUT_SECONDS,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.LLM_BREAKER_FAILURES,
+        reset_timeout=settings.LLM_BREAKER_RESET_SECONDS
+    )
+)
@@ -1,7 +1,13 @@
 import re
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from enum import Enum
 
+from app.config import settings
+from app.services.cache import LRUCache
+from app.services.batch_code_index import BatchCodeIndex, batch_code_index
+from app.services.expiry_calendar import ExpiryCalendar, expiry_calendar
+from app.services.intent_model import IntentModel
+
 
 class QueryIntent(Enum):
     BATCH_LOCATION = "batch_location"
@@ -10,6 +16,8 @@ class QueryIntent(Enum):
     BATCHES_BY_STATUS = "batches_by_status"
     BATCH_INFO = "batch_info"
     BATCH_CHART = "batch_chart"
+    BATCH_STATS = "batch_stats"
+    EXPIRING_SOON = "expiring_soon"
     GREETING = "greeting"
     THANKS = "thanks"
     FAREWELL = "farewell"
@@ -19,11 +27,26 @@ class QueryIntent(Enum):
 class EntityExtractor:
     def __init__(self):
         self.batch_code_pattern = r'[A-Z]{3}-\d{6}-[A-Z]'  # Example: VDT-052025-A
+        self.numeric_code_pattern = r'\b\d{2,6}\b'
         self.status_patterns = {
             'manufactured': r'\b(manufactured|production|made)\b',
             'in_transit': r'\b(transit|shipping|transport|moving)\b',
             'delivered': r'\b(delivered|received|arrived|completed)\b'
         }
+        # Calendar period a chart covers ("this quarter")
+        self.period_patterns = {
+            'today': re.compile(r'\btoday\b'),
+            'week': re.compile(r'\b(this|current) week\b'),
+            'month': re.compile(r'\b(this|current) month\b'),
+            'quarter': re.compile(r'\b(this|current) quarter\b'),
+            'year': re.compile(r'\b(this|current) year\b')
+        }
+        # How far ahead an expiry question looks ("in the next 30 days", "within a week")
+        self.horizon_units = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+        self.horizon_pattern = re.compile(r'\b(\d{1,4}|a|an|one)\s+(day|week|month|year)s?\b')
+        self.next_horizon_pattern = re.compile(r'\bnext (day|week|month|year)\b')
+        self.expired_pattern = re.compile(r'\bexpired\b')
+        self.upcoming_pattern = re.compile(r'\b(expire|expires|expiring|expiry|expiration|soon|next|upcoming)\b')
 
     def extract_batch_code(self, text: str) -> Optional[str]:
         text = text.upper()
@@ -31,9 +54,35 @@ class EntityExtractor:
         if match:
             return match.group()
         # Fallback to numeric pattern like "1234"
-        fallback = re.search(r'\b\d{2,6}\b', text)
+        fallback = re.search(self.numeric_code_pattern, text)
         return fallback.group() if fallback else None
 
+    def extract_period(self, text: str) -> Optional[str]:
+        text = text.lower()
+        for period, pattern in self.period_patterns.items():
+            if pattern.search(text):
+                return period
+        return None
+
+    def extract_horizon(self, text: str) -> Optional[int]:
+        """Days ahead asked about: "next 30 days" -> 30, "within 2 weeks" -> 14, "tomorrow" -> 1."""
+        text = text.lower()
+        match = self.horizon_pattern.search(text)
+        if match:
+            count = int(match.group(1)) if match.group(1).isdigit() else 1
+            return count * self.horizon_units[match.group(2)]
+        match = self.next_horizon_pattern.search(text)
+        if match:
+            return self.horizon_units[match.group(1)]
+        if 'tomorrow' in text.split():
+            return 1
+        return None
+
+    def extract_expired(self, text: str) -> bool:
+        """Asking about batches already past expiry ("which batches have expired")."""
+        text = text.lower()
+        return bool(self.expired_pattern.search(text)) and not self.upcoming_pattern.search(text)
+
     def extract_status(self, text: str) -> Optional[str]:
         text = text.lower()
         for status, pattern in self.status_patterns.items():
@@ -54,6 +103,11 @@ class IntentClassifier:
             QueryIntent.FAREWELL: [
                 r'\b(bye|goodbye|see you|take care)\b'
             ],
+            # Ahead of location / stats / status listings: "how many batches at
+            # Warehouse B expire this month" is an expiry question
+            QueryIntent.EXPIRING_SOON: [
+                r'\b(expire|expires|expiring|expired|expiry|expiration|shelf life|best before|use by)\b'
+            ],
             QueryIntent.BATCH_LOCATION: [
                 r'\b(where|location|located|position|current place)\b'
             ],
@@ -63,14 +117,17 @@ class IntentClassifier:
             QueryIntent.BATCH_HISTORY: [
                 r'\b(history|tracking|timeline|complete record|how it went)\b'
             ],
+            QueryIntent.BATCH_CHART: [
+                r'\b(graph|chart|plot|visual|trend|line graph|draw)\b'
+            ],
+            QueryIntent.BATCH_STATS: [
+                r'\b(statistics|stats|how many|count|counts|totals|overview|dashboard|kpi|kpis)\b'
+            ],
             QueryIntent.BATCHES_BY_STATUS: [
                 r'\b(batches|all|list|show)\b.*\b(status|state|condition|delivered|manufactured|in transit|completed)\b'
             ],
             QueryIntent.BATCH_INFO: [
                 r'\b(info|information|details|about|summary)\b'
-            ],
-            QueryIntent.BATCH_CHART: [
-                r'\b(graph|chart|plot|visual|trend|line graph|draw)\b'
             ]
         }
 
@@ -83,21 +140,300 @@ class IntentClassifier:
         return QueryIntent.UNKNOWN
 
 
+class NLUEngine:
+    """
+    Compiled matcher that finds the intent and all entities in one scan.
+
+    Patterns of the form ``\\b(word|two words)\\b`` (optionally chained with
+    ``.*``) are compiled into a phrase table keyed by first word, so a query
+    is split into words once and every intent, status and batch code is
+    picked up in the same left-to-right pass. Any pattern that does not fit
+    that shape is kept as a compiled regex and searched as before.
+
+    Precedence is unchanged: the first intent (in ``intent_patterns`` order)
+    that matches anywhere wins, an exact batch code wins over the leftmost
+    numeric fallback, and the first status (in ``status_patterns`` order) wins.
+    """
+
+    _word_split = re.compile(r'(\W+)')
+    _literal_group = re.compile(r'\\b\(([a-z ]+(?:\|[a-z ]+)*)\)\\b')
+
+    def __init__(self, intent_classifier: IntentClassifier, entity_extractor: EntityExtractor):
+        # first word -> [(remaining words, term id)]
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], int]]] = {}
+        self._term_count = 0
+        # single-word-group rules resolve straight from the hit term
+        self._term_rank: Dict[int, Tuple[bool, int]] = {}
+
+        self._intent_rules = [
+            (intent, self._compile_rule(pattern))
+            for intent, patterns in intent_classifier.intent_patterns.items()
+            for pattern in patterns
+        ]
+        self._status_rules = [
+            (status.replace('_', ' ').title(), self._compile_rule(pattern))
+            for status, pattern in entity_extractor.status_patterns.items()
+        ]
+        self._complex_intent_rules = self._rank_rules(True, self._intent_rules)
+        self._complex_status_rules = self._rank_rules(False, self._status_rules)
+
+        # The scan below recognises exactly this code shape; make sure the
+        # extractor has not moved on without us.
+        if entity_extractor.batch_code_pattern != r'[A-Z]{3}-\d{6}-[A-Z]':
+            self._batch_code_regex = re.compile(entity_extractor.batch_code_pattern)
+        else:
+            self._batch_code_regex = None
+
+    def _compile_rule(self, pattern: str):
+        """Return a list of term ids for literal patterns, else a compiled regex."""
+        groups = []
+        for piece in pattern.split('.*'):
+            match = self._literal_group.fullmatch(piece)
+            if not match:
+                return re.compile(pattern, re.IGNORECASE)
+            phrases = [tuple(alt.split(' ')) for alt in match.group(1).split('|')]
+            if any('' in words for words in phrases):
+                return re.compile(pattern, re.IGNORECASE)
+            groups.append(phrases)
+
+        terms = []
+        for phrases in groups:
+            term = self._term_count
+            self._term_count += 1
+            for words in phrases:
+                self._phrases.setdefault(words[0], []).append((words[1:], term))
+            terms.append(term)
+        return terms
+
+    def _rank_rules(self, is_intent: bool, rules: list) -> list:
+        """Register single-term rules for direct lookup; return the rest in order."""
+        complex_rules = []
+        for rank, (_, rule) in enumerate(rules):
+            if isinstance(rule, list) and len(rule) == 1:
+                self._term_rank[rule[0]] = (is_intent, rank)
+            else:
+                complex_rules.append((rank, rule))
+        return complex_rules
+
+    @staticmethod
+    def _rule_matches(rule, hits: Dict[int, List[Tuple[int, int, int]]], text: str) -> bool:
+        if not isinstance(rule, list):
+            return rule.search(text) is not None
+
+        first = hits.get(rule[0])
+        if not first:
+            return False
+        for start, end, line in first:
+            for term in rule[1:]:
+                following = [h for h in hits.get(term, ()) if h[0] > end and h[2] == line]
+                if not following:
+                    break
+                end = following[0][1]
+            else:
+                return True
+        return False
+
+    def analyze(self, text: str) -> Tuple[QueryIntent, Dict[str, Optional[str]]]:
+        lowered = text.lower()
+        parts = self._word_split.split(lowered)
+        count = len(parts)
+        phrases = self._phrases
+        hits: Dict[int, List[Tuple[int, int, int]]] = {}
+        batch_code = None
+        number = None
+        line = 0
+
+        # parts alternates word, separator, word, ... (words at even indexes)
+        for i in range(0, count, 2):
+            if i and '\n' in parts[i - 1]:
+                line += parts[i - 1].count('\n')
+            word = parts[i]
+            if not word:
+                continue
+
+            for rest, term in phrases.get(word, ()):
+                end = i
+                for next_word in rest:
+                    if end + 2 >= count or parts[end + 1] != ' ' or parts[end + 2] != next_word:
+                        break
+                    end += 2
+                else:
+                    hits.setdefault(term, []).append((i, end, line))
+
+            if number is None and word.isdecimal() and 2 <= len(word) <= 6:
+                number = word
+
+            if (batch_code is None and i + 4 < count
+                    and parts[i + 1] == '-' and parts[i + 3] == '-'
+                    and len(parts[i + 2]) == 6 and parts[i + 2].isdecimal()
+                    and parts[i + 4][:1].isascii() and parts[i + 4][:1].isalpha()):
+                prefix = word[-3:]
+                if len(prefix) == 3 and prefix.isascii() and prefix.isalpha():
+                    batch_code = f"{prefix}-{parts[i + 2]}-{parts[i + 4][0]}".upper()
+
+        if self._batch_code_regex is not None:
+            match = self._batch_code_regex.search(text.upper())
+            batch_code = match.group() if match else None
+
+        intent_rank = len(self._intent_rules)
+        status_rank = len(self._status_rules)
+        term_rank = self._term_rank
+        for term in hits:
+            ranked = term_rank.get(term)
+            if ranked is None:
+                continue
+            is_intent, rank = ranked
+            if is_intent:
+                if rank < intent_rank:
+                    intent_rank = rank
+            elif rank < status_rank:
+                status_rank = rank
+
+        for rank, rule in self._complex_intent_rules:
+            if rank >= intent_rank:
+                break
+            if self._rule_matches(rule, hits, lowered):
+                intent_rank = rank
+                break
+
+        for rank, rule in self._complex_status_rules:
+            if rank >= status_rank:
+                break
+            if self._rule_matches(rule, hits, lowered):
+                status_rank = rank
+                break
+
+        intent = self._intent_rules[intent_rank][0] if intent_rank < len(self._intent_rules) else QueryIntent.UNKNOWN
+        status = self._status_rules[status_rank][0] if status_rank < len(self._status_rules) else None
+        return intent, {
+            "batch_code": batch_code or number,
+            "status": status
+        }
+
+
+_PUNCTUATION = re.compile(r'[^\w\s-]+')
+_WHITESPACE = re.compile(r'\s+')
+# Near-miss batch codes such as "vdt052025a" or "vdt-05225-a" (normalized text)
+_LOOSE_BATCH_CODE = re.compile(r'\b[a-z]{2,4}-?\d{4,7}-?[a-z]?\b')
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form used as the NLU cache key: lower-cased, punctuation other
+    than hyphens (which batch codes need) replaced by spaces, whitespace
+    collapsed.
+    """
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', query.lower())).strip()
+
+
 class NLUService:
-    def __init__(self):
+    def __init__(self, cache_size: int = 0, cache_ttl: Optional[float] = None,
+                 code_index: Optional[BatchCodeIndex] = None,
+                 location_index: Optional[ExpiryCalendar] = None,
+                 intent_model: Optional[IntentModel] = None, intent_threshold: float = 0.5):
         self.entity_extractor = EntityExtractor()
         self.intent_classifier = IntentClassifier()
+        self.engine = NLUEngine(self.intent_classifier, self.entity_extractor)
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self.code_index = code_index
+        self.location_index = location_index
+        self.intent_model = intent_model
+        self.intent_threshold = intent_threshold
+
+    def set_intent_model(self, model: Optional[IntentModel]) -> None:
+        self.intent_model = model
+        self.cache.clear()  # cached UNKNOWNs may now classify differently
+
+    def _classify(self, normalized: str) -> Tuple[QueryIntent, Dict]:
+        intent, entities = self.engine.analyze(normalized)
+        if intent == QueryIntent.UNKNOWN and self.intent_model is not None:
+            label, confidence = self.intent_model.predict(normalized)
+            if confidence >= self.intent_threshold:
+                try:
+                    intent = QueryIntent(label)
+                except ValueError:
+                    pass
+        if intent == QueryIntent.EXPIRING_SOON and entities["batch_code"] \
+                and re.fullmatch(self.entity_extractor.batch_code_pattern, entities["batch_code"]):
+            # "when does VDT-052025-A expire" is about one batch
+            intent = QueryIntent.BATCH_INFO
+        if intent == QueryIntent.BATCH_CHART:
+            entities["period"] = self.entity_extractor.extract_period(normalized)
+        if intent == QueryIntent.EXPIRING_SOON:
+            # A bare number here is the horizon ("next 30 days"), not a batch code
+            entities["batch_code"] = None
+            entities["period"] = self.entity_extractor.extract_period(normalized)
+            entities["days"] = self.entity_extractor.extract_horizon(normalized)
+            entities["expired"] = self.entity_extractor.extract_expired(normalized)
+        return intent, entities
+
+    def _analyze(self, query: str) -> Tuple[QueryIntent, Dict]:
+        # Queries are analyzed in normalized form so that every phrasing
+        # sharing a cache key is guaranteed to get the same answer.
+        key = normalize_query(query)
+        parsed = self.cache.get(key)
+        if parsed is None:
+            parsed = self._classify(key)
+            self.cache.set(key, parsed)
+        intent, entities = parsed
+        entities = dict(entities)
+        # Resolved after the cache so newly indexed codes are picked up at once.
+        entities["batch_code"] = self._resolve_batch_code(key, entities["batch_code"])
+        if intent == QueryIntent.EXPIRING_SOON:
+            entities["location"] = self._resolve_location(key)
+        return intent, entities
+
+    def _resolve_batch_code(self, normalized: str, batch_code: Optional[str]) -> Optional[str]:
+        index = self.code_index
+        if index is None or not index.loaded:
+            return batch_code
+        if batch_code and batch_code in index:
+            return index.resolve(batch_code)
+        for candidate in _LOOSE_BATCH_CODE.findall(normalized):
+            if re.fullmatch(self.entity_extractor.batch_code_pattern, candidate.upper()):
+                # Well-formed codes are taken as typed: a missing PCM-202501-B must not
+                # turn into its sibling PCM-202501-A, only typos are corrected
+                continue
+            resolved = index.resolve(candidate)
+            if resolved:
+                return resolved
+        return batch_code
+
+    def _resolve_location(self, normalized: str) -> Optional[str]:
+        index = self.location_index
+        if index is None or not index.loaded:
+            return None
+        return index.match_location(normalized)
 
     def process_query(self, query: str) -> Dict:
+        intent, entities = self._analyze(query)
         return {
-            "intent": self.intent_classifier.classify_intent(query),
-            "entities": {
-                "batch_code": self.entity_extractor.extract_batch_code(query),
-                "status": self.entity_extractor.extract_status(query)
-            },
+            "intent": intent,
+            "entities": entities,
             "original_query": query
         }
 
+    def process_queries(self, queries: List[str]) -> List[Dict]:
+        """Classify many queries at once; repeated queries are analyzed only once."""
+        parsed: Dict[str, Tuple[QueryIntent, Dict]] = {}
+        results = []
+        for query in queries:
+            if query not in parsed:
+                parsed[query] = self._analyze(query)
+            intent, entities = parsed[query]
+            results.append({
+                "intent": intent,
+                "entities": dict(entities),
+                "original_query": query
+            })
+        return results
+
 
 # ✅ Exported singleton instance
-nlu_service = NLUService()
+nlu_service = NLUService(
+    cache_size=settings.NLU_CACHE_SIZE,
+    cache_ttl=settings.NLU_CACHE_TTL_SECONDS,
+    code_index=batch_code_index,
+    location_index=expiry_calendar,
+    intent_threshold=settings.INTENT_MODEL_THRESHOLD
+)
@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    """The client sent a cursor we did not issue (or one from another listing)."""
+
+
+def encode_cursor(kind: str, *key: Any) -> str:
+    """
+    Opaque keyset cursor: the sort key of the last row served, tagged with
+    the listing it belongs to. Datetimes survive the round trip.
+    """
+    values = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in key]
+    payload = json.dumps([kind, values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], kind: str) -> Optional[Tuple[Any, ...]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_kind, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {cursor!r}") from e
+    if cursor_kind != kind:
+        raise InvalidCursor(f"Cursor belongs to a {cursor_kind} listing, not {kind}")
+    return tuple(
+        datetime.fromisoformat(value["dt"]) if isinstance(value, dict) and "dt" in value else value
+        for value in values
+    )
+
+
+def split_page(rows: Iterable[Any], limit: int) -> Tuple[List[Any], bool]:
+    """First ``limit`` rows and whether more follow (callers fetch ``limit + 1``)."""
+    page = []
+    for row in rows:
+        if len(page) == limit:
+            return page, True
+        page.append(row)
+    return page, False
+
@@ -1,18 +1,35 @@
 import sys
 import os
+import time
+import logging
 from dotenv import load_dotenv
 load_dotenv()
 
-from typing import Dict, Any
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from langchain.schema import HumanMessage
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from app.config import settings
-from app.services.nlu import nlu_service, QueryIntent
+from app.database import AsyncSessionLocal
+from app.services.nlu import nlu_service, normalize_query, QueryIntent
+from app.services.cache import llm_response_cache
+from app.services.singleflight import SingleFlight
+from app.services.retrieval import RetrievalIndex
+from app.services.llm_gateway import llm_gateway, LLMUnavailable, LLM_UNAVAILABLE_MESSAGE
+from app.services.metrics import current_intent, track, ERRORS_TOTAL, STAGE_SECONDS
+from app.services.pagination import InvalidCursor
+from app.services.statistics import batch_statistics
+from app.services.charts import period_start, rollup_chart
+from app.services.expiry_calendar import expiry_calendar, period_end
 from app.crud.batch_control import batch_crud
 
+logger = logging.getLogger(__name__)
+
 # Load Gemini
 if os.getenv("ENV") == "test":
     from unittest.mock import MagicMock
@@ -29,8 +46,25 @@ else:
 
 
 class RAGPipeline:
+    # Intents answered from the latest tracking event / from the batch row
+    LOCATION_INTENTS = (QueryIntent.BATCH_LOCATION, QueryIntent.BATCH_HANDLER, QueryIntent.BATCH_INFO)
+    BATCH_INTENTS = (QueryIntent.BATCH_INFO, QueryIntent.BATCH_HISTORY, QueryIntent.BATCH_CHART)
+
     def __init__(self):
         self.llm = LLM_INSTANCE
+        self.response_cache = llm_response_cache
+        # Identical concurrent lookups / LLM prompts share one execution
+        self.retrieval_flight = SingleFlight()
+        self.llm_flight = SingleFlight()
+        # Concurrency cap, deadline, load shedding and circuit breaker for Gemini
+        self.gateway = llm_gateway
+        # Vector index over ERP records; loaded at startup (see app.main)
+        self.retrieval: Optional[RetrievalIndex] = None
+        self.small_talk = {
+            QueryIntent.GREETING: "👋 Hello! How can I help you today?",
+            QueryIntent.THANKS: "😊 You're welcome! Let me know if you need anything else.",
+            QueryIntent.FAREWELL: "👋 Goodbye! Have a great day!"
+        }
         self.response_templates = {
             QueryIntent.BATCH_LOCATION: """
 Batch {batch_code} is currently at {location}.
@@ -54,61 +88,212 @@ Batch {batch_code} Info:
 • Product: {product_name}
 • Quantity: {quantity} units
 • Manufactured on: {manufactured_date}
+• Expires on: {expiry_date}
 • Current Status: {status}
 • Location: {location}
+""",
+            QueryIntent.BATCH_STATS: """
+Batch statistics (as of {as_of}):
+• Total batches: {total_batches} ({total_quantity} units)
+• By status: {status_counts}
+• Expiring within {expiring_within_days} days: {expiring_soon} (already expired: {expired})
+• Quantity by product:
+{products}
+""",
+            QueryIntent.EXPIRING_SOON: """
+Batches {verb} between {start} and {end}{filters}: {total_batches} ({total_quantity} units)
+{batch_list}
 """
         }
 
-    def process_query(self, query: str, db: Session) -> Dict[str, Any]:
-        print(f"[DEBUG] User Query: {query}")
-        nlu_result = nlu_service.process_query(query)
-        intent = nlu_result["intent"]
-        entities = nlu_result["entities"]
-        print(f"[DEBUG] Intent: {intent}, Entities: {entities}")
+    def process_query(self, query: str, db: Session, cursor: Optional[str] = None) -> Dict[str, Any]:
+        logger.debug("User query: %s", query)
+        intent, entities = self._understand(query)
+        logger.debug("Intent: %s, Entities: %s", intent, entities)
 
         # Friendly chatbot responses
-        if intent == QueryIntent.GREETING:
-            return {
-                "success": True,
-                "message": "👋 Hello! How can I help you today?",
-                "intent": intent.value,
-                "entities": entities
-            }
+        small_talk = self._small_talk_response(intent, entities)
+        if small_talk:
+            return small_talk
 
-        elif intent == QueryIntent.THANKS:
-            return {
-                "success": True,
-                "message": "😊 You're welcome! Let me know if you need anything else.",
-                "intent": intent.value,
-                "entities": entities
-            }
+        # Fallback for unknown
+        if intent == QueryIntent.UNKNOWN:
+            llm_response = self._ask_llm(self._fallback_prompt(query), query)
+            return self._llm_result(intent, entities, llm_response)
 
-        elif intent == QueryIntent.FAREWELL:
-            return {
-                "success": True,
-                "message": "👋 Goodbye! Have a great day!",
-                "intent": intent.value,
-                "entities": entities
-            }
+        # Structured queries
+        data = self.retrieval_flight.do(
+            self._retrieval_key(intent, entities, cursor),
+            lambda: self._retrieve_data(intent, entities, db, cursor)
+        )
+        return self._structured_result(intent, entities, data)
+
+    async def aprocess_query(self, query: str, db: AsyncSession, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async twin of ``process_query``: DB work runs on the async session and
+        the LLM is awaited, so a slow Gemini call never blocks the event loop.
+        ``cursor`` (the ``next_cursor`` of a previous answer) continues a listing.
+        """
+        intent, entities = self._understand(query)
+
+        small_talk = self._small_talk_response(intent, entities)
+        if small_talk:
+            return small_talk
 
-        # Fallback for unknown
         if intent == QueryIntent.UNKNOWN:
-            prompt = f"You are an ERP assistant. Try to respond clearly or casually.\n\nUser Query: {query}"
-            try:
-                llm_response = self.llm.invoke([HumanMessage(content=prompt)]).content
-            except Exception as e:
-                print(f"[LLM ERROR] {e}")
-                llm_response = "Sorry, I couldn't understand your question. Please try again."
+            llm_response = await self._aask_llm(self._fallback_prompt(query), query)
+            return self._llm_result(intent, entities, llm_response)
+
+        data = await self._aretrieve_data(intent, entities, db, cursor)
+        return self._structured_result(intent, entities, data)
+
+    async def aprocess_queries(self, queries: List[str], db: AsyncSession) -> List[Dict[str, Any]]:
+        """
+        Answer many queries in one go, results in input order. NLU runs once
+        per distinct query, all structured lookups share a single ``run_sync``
+        (see ``_retrieve_data_bulk``) and LLM fallbacks run concurrently
+        through the gateway.
+        """
+        start = time.perf_counter()
+        parsed = nlu_service.process_queries(queries)
+        nlu_seconds = (time.perf_counter() - start) / max(len(parsed), 1)
+        for item in parsed:
+            STAGE_SECONDS.observe(nlu_seconds, stage="nlu", intent=item["intent"].value)
+
+        results: List[Dict[str, Any] | None] = [None] * len(parsed)
+        structured, fallbacks = [], []
+        for position, item in enumerate(parsed):
+            intent, entities = item["intent"], item["entities"]
+            small_talk = self._small_talk_response(intent, entities)
+            if small_talk:
+                results[position] = small_talk
+            elif intent == QueryIntent.UNKNOWN:
+                fallbacks.append(position)
+            else:
+                structured.append(position)
+
+        if structured:
+            items = [(parsed[p]["intent"], parsed[p]["entities"]) for p in structured]
+            with track("retrieval.bulk", intent="batch"):
+                data = await db.run_sync(lambda session: self._retrieve_data_bulk(items, session))
+            for position, (intent, entities), item_data in zip(structured, items, data):
+                results[position] = self._structured_result(intent, entities, item_data)
+
+        if fallbacks:
+            current_intent.set(QueryIntent.UNKNOWN.value)
+            answers = await asyncio.gather(*(
+                self._aask_llm(self._fallback_prompt(queries[p]), queries[p]) for p in fallbacks
+            ))
+            for position, answer in zip(fallbacks, answers):
+                results[position] = self._llm_result(QueryIntent.UNKNOWN, parsed[position]["entities"], answer)
+
+        return results
+
+    async def astream_query(self, query: str, db: AsyncSession,
+                            cursor: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming variant of ``aprocess_query`` yielding ``(event, payload)``:
+        ``meta`` (intent/entities) straight after NLU, ``data`` for structured
+        results, ``token`` chunks while the LLM generates, and a final ``message``.
+        """
+        intent, entities = self._understand(query)
+        yield "meta", {"intent": intent.value, "entities": entities}
+
+        small_talk = self._small_talk_response(intent, entities)
+        if small_talk:
+            yield "message", {"success": True, "message": small_talk["message"]}
+            return
 
-            return {
-                "success": True,
-                "message": llm_response.strip(),
-                "intent": intent.value,
-                "entities": entities
-            }
+        if intent == QueryIntent.UNKNOWN:
+            async for event in self._astream_llm(self._fallback_prompt(query), query):
+                yield event
+            return
+
+        # Deterministic template answers go out as a single message event
+        data = await self._aretrieve_data(intent, entities, db, cursor)
+        result = self._structured_result(intent, entities, data)
+        if data:
+            yield "data", data
+        yield "message", {"success": result["success"], "message": result["message"]}
+
+    @staticmethod
+    def _understand(query: str) -> Tuple[QueryIntent, Dict[str, Any]]:
+        """Run NLU, time it, and label the rest of this request's stages with the intent."""
+        start = time.perf_counter()
+        nlu_result = nlu_service.process_query(query)
+        intent = nlu_result["intent"]
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="nlu", intent=intent.value)
+        current_intent.set(intent.value)
+        return intent, nlu_result["entities"]
 
-        # Structured queries
-        data = self._retrieve_data(intent, entities, db)
+    @staticmethod
+    def _retrieval_key(intent: QueryIntent, entities: Dict[str, Any], cursor: Optional[str] = None) -> tuple:
+        status = entities.get("status")
+        return (intent, entities.get("batch_code"), status.lower() if status else None, entities.get("period"),
+                entities.get("days"), entities.get("location"), entities.get("expired"), cursor)
+
+    async def _aretrieve_data(self, intent: QueryIntent, entities: Dict[str, Any], db: AsyncSession,
+                              cursor: Optional[str] = None) -> Dict[str, Any] | None:
+        # The coalesced lookup serves every waiting request and may outlive the
+        # one that started it, so it runs on a session of its own (same engine)
+        # rather than on the caller's, which closes when that request ends.
+        return await self.retrieval_flight.ado(
+            self._retrieval_key(intent, entities, cursor),
+            lambda: self._aretrieve_in_own_session(intent, entities, db.bind, cursor)
+        )
+
+    async def _aretrieve_in_own_session(self, intent: QueryIntent, entities: Dict[str, Any], bind: Any,
+                                        cursor: Optional[str] = None) -> Dict[str, Any] | None:
+        # The CRUD layer is sync ORM code; run_sync drives it over the async
+        # connection (lazy loads included) without blocking the loop.
+        async with AsyncSessionLocal(bind=bind) as session:
+            return await session.run_sync(
+                lambda sync_session: self._retrieve_data(intent, entities, sync_session, cursor)
+            )
+
+    def _small_talk_response(self, intent: QueryIntent, entities: Dict[str, Any]) -> Dict[str, Any] | None:
+        message = self.small_talk.get(intent)
+        if message is None:
+            return None
+        return {
+            "success": True,
+            "message": message,
+            "intent": intent.value,
+            "entities": entities
+        }
+
+    def set_retrieval_index(self, index: Optional[RetrievalIndex]) -> None:
+        self.retrieval = index
+
+    def _fallback_prompt(self, query: str) -> str:
+        prompt = "You are an ERP assistant. Try to respond clearly or casually."
+        context = []
+        if self.retrieval is not None:
+            with track("retrieval"):
+                context = self.retrieval.context(query)
+        if context:
+            records = "\n".join(f"- {snippet}" for snippet in context)
+            prompt += (
+                "\n\nRelevant ERP records (answer from these when they apply, never invent data):\n"
+                f"{records}"
+            )
+        return f"{prompt}\n\nUser Query: {query}"
+
+    @staticmethod
+    def _prompt_context(prompt: str, query: str) -> str:
+        """The prompt without the user's words: instructions and retrieved records a cached answer was grounded in."""
+        return prompt[:-len(query)] if query and prompt.endswith(query) else prompt
+
+    @staticmethod
+    def _llm_result(intent: QueryIntent, entities: Dict[str, Any], llm_response: str) -> Dict[str, Any]:
+        return {
+            "success": True,
+            "message": llm_response,
+            "intent": intent.value,
+            "entities": entities
+        }
+
+    def _structured_result(self, intent: QueryIntent, entities: Dict[str, Any], data: Dict[str, Any] | None) -> Dict[str, Any]:
         if not data:
             return {
                 "success": False,
@@ -117,7 +302,8 @@ Batch {batch_code} Info:
                 "entities": entities
             }
 
-        response = self._generate_response(intent, data)
+        with track("template"):
+            response = self._generate_response(intent, data)
         return {
             "success": True,
             "message": response,
@@ -126,7 +312,82 @@ Batch {batch_code} Info:
             "data": data
         }
 
-    def _retrieve_data(self, intent: QueryIntent, entities: Dict[str, Any], db: Session) -> Dict[str, Any] | None:
+    @staticmethod
+    def _llm_error_message(error: Exception) -> str:
+        # Refused or timed out by the gateway: answer at once with the busy message
+        if isinstance(error, LLMUnavailable) and error.reason != "error":
+            return LLM_UNAVAILABLE_MESSAGE
+        return "Sorry, I couldn't understand your question. Please try again."
+
+    def _ask_llm(self, prompt: str, query: str) -> str:
+        text = normalize_query(query)
+        context = self._prompt_context(prompt, query)
+        cached = self.response_cache.get(prompt, text, context)
+        if cached is not None:
+            return cached
+        try:
+            response = self.llm_flight.do(prompt, lambda: self._invoke_llm(prompt, text, context))
+        except Exception as e:
+            logger.warning("LLM call failed: %s", e)
+            return self._llm_error_message(e)
+        return response
+
+    def _invoke_llm(self, prompt: str, text: str, context: str) -> str:
+        with track("llm"):
+            response = self.gateway.invoke(self.llm, [HumanMessage(content=prompt)]).content.strip()
+        self.response_cache.set(prompt, response, text, context)
+        return response
+
+    async def _aask_llm(self, prompt: str, query: str) -> str:
+        text = normalize_query(query)
+        context = self._prompt_context(prompt, query)
+        cached = self.response_cache.get(prompt, text, context)
+        if cached is not None:
+            return cached
+        try:
+            response = await self.llm_flight.ado(prompt, lambda: self._ainvoke_llm(prompt, text, context))
+        except Exception as e:
+            logger.warning("LLM call failed: %s", e)
+            return self._llm_error_message(e)
+        return response
+
+    async def _ainvoke_llm(self, prompt: str, text: str, context: str) -> str:
+        with track("llm"):
+            response = (await self.gateway.ainvoke(self.llm, [HumanMessage(content=prompt)])).content.strip()
+        self.response_cache.set(prompt, response, text, context)
+        return response
+
+    async def _astream_llm(self, prompt: str, query: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        text = normalize_query(query)
+        context = self._prompt_context(prompt, query)
+        cached = self.response_cache.get(prompt, text, context)
+        if cached is not None:
+            yield "message", {"success": True, "message": cached}
+            return
+
+        chunks = []
+        intent = current_intent.get()
+        start = time.perf_counter()
+        try:
+            async for chunk in self.gateway.astream(self.llm, [HumanMessage(content=prompt)]):
+                if chunk.content:
+                    if not chunks:
+                        STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm_first_token", intent=intent)
+                    chunks.append(chunk.content)
+                    yield "token", {"text": chunk.content}
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm", intent=intent)
+        except Exception as e:
+            ERRORS_TOTAL.inc(stage="llm", intent=intent)
+            logger.warning("LLM call failed: %s", e)
+            yield "message", {"success": True, "message": self._llm_error_message(e)}
+            return
+
+        response = "".join(chunks).strip()
+        self.response_cache.set(prompt, response, text, context)
+        yield "message", {"success": True, "message": response}
+
+    def _retrieve_data(self, intent: QueryIntent, entities: Dict[str, Any], db: Session,
+                       cursor: Optional[str] = None) -> Dict[str, Any] | None:
         batch_code = entities.get("batch_code")
         status = entities.get("status")
 
@@ -142,60 +403,203 @@ Batch {batch_code} Info:
                     return batch_crud.get_current_batch_location(db, batch_code)
 
                 if intent == QueryIntent.BATCH_INFO:
-                    batch = batch_crud.get_batch_by_code(db, batch_code)
-                    if batch:
-                        current = batch_crud.get_current_batch_location(db, batch_code)
-                        return {
-                            "batch_code": batch.batch_code,
-                            "product_name": batch.product.name,
-                            "quantity": batch.quantity,
-                            "manufactured_date": batch.manufactured_date,
-                            "status": current["status"] if current else "Unknown",
-                            "location": current["location"] if current else "Unknown"
-                        }
+                    overview = batch_crud.get_batch_overview(db, batch_code)
+                    if overview:
+                        return self._info_data(*overview)
 
             elif intent == QueryIntent.BATCH_HISTORY and batch_code:
                 batch = batch_crud.get_batch_by_code(db, batch_code)
                 if batch:
-                    history = batch_crud.get_batch_tracking(db, batch.id)
-                    return {
-                        "batch_code": batch_code,
-                        "history": [
-                            {
-                                "location": record.location,
-                                "status": record.status.value,
-                                "timestamp": record.timestamp,
-                                "handler": record.handler.name if record.handler else "Unknown"
-                            }
-                            for record in history
-                        ]
-                    }
+                    history, next_cursor = batch_crud.get_batch_tracking_page(db, batch.id, settings.CHAT_PAGE_SIZE, cursor)
+                    return self._history_data(batch_code, history, next_cursor)
 
             elif intent == QueryIntent.BATCH_CHART and batch_code:
                 batch = batch_crud.get_batch_by_code(db, batch_code)
                 if batch:
-                    history = batch_crud.get_batch_tracking(db, batch.id)
-                    return {
-                        "batch_code": batch_code,
-                        "chart_data": [
-                            {
-                                "x": record.timestamp.strftime("%Y-%m-%d %H:%M"),
-                                "y": record.status.value
-                            }
-                            for record in history
-                        ]
-                    }
+                    start = period_start(entities.get("period"), datetime.utcnow())
+                    return self._chart_data(batch_code, batch_crud.get_batch_tracking(db, batch.id, start=start))
+
+            elif intent == QueryIntent.BATCH_CHART:
+                return self._rollup_chart_data(db, status, entities.get("period"))
 
             elif intent == QueryIntent.BATCHES_BY_STATUS and status:
+                batches, next_cursor = batch_crud.get_batches_by_status_page(db, status, settings.CHAT_PAGE_SIZE, cursor)
                 return {
                     "status": status,
-                    "batches": batch_crud.get_batches_by_status(db, status)
+                    "batches": batches,
+                    "next_cursor": next_cursor
                 }
 
-        except Exception as e:
-            print(f"[ERROR] Data fetch failed: {e}")
+            elif intent == QueryIntent.BATCH_STATS:
+                return batch_statistics.get(db)
+
+            elif intent == QueryIntent.EXPIRING_SOON:
+                return self._expiring_data(db, entities)
+
+        except InvalidCursor:
+            raise
+        except Exception:
+            logger.exception("Data fetch failed")
         return None
 
+    def _retrieve_data_bulk(self, items: List[Tuple[QueryIntent, Dict[str, Any]]], db: Session) -> List[Dict[str, Any] | None]:
+        """
+        ``_retrieve_data`` for many structured queries at once: batch codes are
+        looked up with one ``IN (...)`` query per kind of data and each status
+        is listed once, however many queries ask for it.
+        """
+        location_codes, batch_codes, statuses = set(), set(), set()
+        for intent, entities in items:
+            code = entities.get("batch_code")
+            if code and intent in self.LOCATION_INTENTS:
+                location_codes.add(code)
+            if code and intent in self.BATCH_INTENTS:
+                batch_codes.add(code)
+            if intent == QueryIntent.BATCHES_BY_STATUS and entities.get("status"):
+                statuses.add(entities["status"].lower())
+
+        try:
+            locations = batch_crud.get_current_locations(db, location_codes)
+            batches = batch_crud.get_batches_by_codes(db, batch_codes)
+            history_ids = {
+                batches[entities["batch_code"]].id
+                for intent, entities in items
+                if intent in (QueryIntent.BATCH_HISTORY, QueryIntent.BATCH_CHART) and entities.get("batch_code") in batches
+            }
+            histories = batch_crud.get_tracking_histories(db, history_ids)
+            listings = {
+                status: batch_crud.get_batches_by_status_page(db, status, settings.CHAT_PAGE_SIZE)
+                for status in sorted(statuses)
+            }
+            statistics = batch_statistics.get(db) if any(intent == QueryIntent.BATCH_STATS for intent, _ in items) else None
+            expiring = {
+                self._retrieval_key(intent, entities): self._expiring_data(db, entities)
+                for intent, entities in items
+                if intent == QueryIntent.EXPIRING_SOON
+            }
+            charts = {
+                key: self._rollup_chart_data(db, *key)
+                for key in {
+                    (entities["status"].lower() if entities.get("status") else None, entities.get("period"))
+                    for intent, entities in items
+                    if intent == QueryIntent.BATCH_CHART and not entities.get("batch_code")
+                }
+            }
+        except Exception:
+            logger.exception("Bulk data fetch failed")
+            return [None] * len(items)
+
+        results: List[Dict[str, Any] | None] = []
+        for intent, entities in items:
+            code = entities.get("batch_code")
+            batch = batches.get(code)
+            data = None
+            if intent in (QueryIntent.BATCH_LOCATION, QueryIntent.BATCH_HANDLER):
+                data = locations.get(code)
+            elif intent == QueryIntent.BATCH_INFO and batch:
+                data = self._info_data(batch, locations.get(code))
+            elif intent == QueryIntent.BATCH_HISTORY and batch:
+                history = histories[batch.id]
+                page_size = settings.CHAT_PAGE_SIZE
+                next_cursor = batch_crud.history_cursor(history[page_size - 1]) if len(history) > page_size else None
+                data = self._history_data(code, history[:page_size], next_cursor)
+            elif intent == QueryIntent.BATCH_CHART and batch:
+                start = period_start(entities.get("period"), datetime.utcnow())
+                data = self._chart_data(code, [
+                    record for record in histories[batch.id]
+                    if start is None or (record.timestamp is not None and record.timestamp >= start)
+                ])
+            elif intent == QueryIntent.BATCH_CHART and not code:
+                status = entities.get("status")
+                data = charts[(status.lower() if status else None, entities.get("period"))]
+            elif intent == QueryIntent.BATCHES_BY_STATUS and entities.get("status"):
+                status = entities["status"].lower()
+                listed, next_cursor = listings[status]
+                data = {"status": status, "batches": listed, "next_cursor": next_cursor}
+            elif intent == QueryIntent.BATCH_STATS:
+                data = statistics
+            elif intent == QueryIntent.EXPIRING_SOON:
+                data = expiring[self._retrieval_key(intent, entities)]
+            results.append(data)
+        return results
+
+    @staticmethod
+    def _info_data(batch, current: Dict[str, Any] | None) -> Dict[str, Any]:
+        return {
+            "batch_code": batch.batch_code,
+            "product_name": batch.product.name,
+            "quantity": batch.quantity,
+            "manufactured_date": batch.manufactured_date,
+            "expiry_date": batch.expiry_date,
+            "status": current["status"] if current else "Unknown",
+            "location": current["location"] if current else "Unknown"
+        }
+
+    @staticmethod
+    def _history_data(batch_code: str, history: List[Any], next_cursor: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "batch_code": batch_code,
+            "history": [
+                {
+                    "location": record.location,
+                    "status": record.status.value,
+                    "timestamp": record.timestamp,
+                    "handler": record.handler.name if record.handler else "Unknown"
+                }
+                for record in history
+            ],
+            "next_cursor": next_cursor
+        }
+
+    @staticmethod
+    def _chart_data(batch_code: str, history: List[Any]) -> Dict[str, Any]:
+        return {
+            "batch_code": batch_code,
+            "chart_data": [
+                {
+                    "x": batch_crud.event_time(record.timestamp),
+                    "y": record.status.value
+                }
+                for record in history
+            ]
+        }
+
+    @staticmethod
+    def _rollup_chart_data(db: Session, status: Optional[str], period: Optional[str]) -> Dict[str, Any]:
+        # States (in transit) chart as batches held per location; arrivals
+        # (manufactured, delivered) and unfiltered questions as events per bucket.
+        metric = "level" if status == "in transit" else "events"
+        now = datetime.utcnow()
+        chart = rollup_chart(db, metric, status, start=period_start(period, now), end=now,
+                             granularity="hour" if period == "today" else "day",
+                             by_location=metric == "level")
+        chart["period"] = period
+        return chart
+
+    @staticmethod
+    def _expiring_data(db: Session, entities: Dict[str, Any]) -> Dict[str, Any]:
+        # "next 30 days", else to the end of "this month", else the statistics window;
+        # "already expired" looks back over the same span
+        today = date.today()
+        days = entities.get("days")
+        if entities.get("expired"):
+            start, end = today - timedelta(days=days or settings.STATS_EXPIRING_WITHIN_DAYS), today - timedelta(days=1)
+        elif days is not None:
+            start, end = today, today + timedelta(days=days)
+        else:
+            start = today
+            end = period_end(entities.get("period"), today) or today + timedelta(days=settings.STATS_EXPIRING_WITHIN_DAYS)
+        data = expiry_calendar.expiring(db, start, end, entities.get("location"), entities.get("status"),
+                                        settings.CHAT_PAGE_SIZE)
+        data["expired"] = bool(entities.get("expired"))
+        return data
+
+    @staticmethod
+    def _more_note(data: Dict[str, Any]) -> str:
+        if not data.get("next_cursor"):
+            return ""
+        return "\n(More results available — send the next_cursor from this answer to continue.)"
+
     def _generate_response(self, intent: QueryIntent, data: Dict[str, Any]) -> str:
         template = self.response_templates.get(intent)
 
@@ -205,7 +609,7 @@ Batch {batch_code} Info:
                     batch_code=data["batch_code"],
                     location=data["location"],
                     status=data["status"],
-                    timestamp=data["timestamp"].strftime("%Y-%m-%d %H:%M"),
+                    timestamp=batch_crud.event_time(data["timestamp"]),
                     handler=data.get("handler", "Unknown")
                 ).strip()
 
@@ -219,24 +623,57 @@ Batch {batch_code} Info:
 
             elif intent == QueryIntent.BATCH_HISTORY:
                 history_text = "\n".join([
-                    f"• {record['timestamp'].strftime('%Y-%m-%d %H:%M')} - {record['status']} at {record['location']} (Handler: {record['handler']})"
+                    f"• {batch_crud.event_time(record['timestamp'])} - {record['status']} at {record['location']} (Handler: {record['handler']})"
                     for record in data["history"]
                 ])
-                return template.format(batch_code=data["batch_code"], history=history_text).strip()
+                return (template.format(batch_code=data["batch_code"], history=history_text).strip()
+                        + self._more_note(data))
 
             elif intent == QueryIntent.BATCHES_BY_STATUS:
                 batch_list = "\n".join([
                     f"• {b['batch_code']} - {b['product_name']} @ {b['location']} (Handler: {b['handler']})"
                     for b in data["batches"]
                 ]) or "No batches found."
-                return template.format(status=data["status"], batch_list=batch_list).strip()
+                return template.format(status=data["status"], batch_list=batch_list).strip() + self._more_note(data)
 
             elif intent == QueryIntent.BATCH_INFO:
                 return template.format(**data).strip()
 
-            elif intent == QueryIntent.BATCH_CHART:
+            elif intent == QueryIntent.BATCH_CHART and "batch_code" in data:
                 return f"Here is the trend chart for batch {data['batch_code']}."
 
+            elif intent == QueryIntent.BATCH_CHART:
+                period = data["period"]
+                span = {None: f"over the last {settings.CHART_DEFAULT_DAYS} days", "today": "today"}.get(period, f"this {period}")
+                if data["metric"] == "level":
+                    return f"Here is how many batches were {data['status']} at each location, per {data['granularity']}, {span}."
+                return f"Here are {data['status'] or 'all'} tracking events per {data['granularity']}, {span}."
+
+            elif intent == QueryIntent.BATCH_STATS:
+                status_counts = ", ".join(f"{status} {count}" for status, count in data["status_counts"].items() if count)
+                products = "\n".join([
+                    f"  - {p['product_name']}: {p['quantity']} units in {p['batches']} batches"
+                    for p in data["products"]
+                ]) or "  - No batches yet."
+                return template.format(
+                    **{**data, "status_counts": status_counts or "none", "products": products}
+                ).strip()
+
+            elif intent == QueryIntent.EXPIRING_SOON:
+                batch_list = "\n".join([
+                    f"• {b['expiry_date']} - {b['batch_code']} - {b['product_name'] or 'Unassigned'} "
+                    f"({b['quantity']} units) @ {b['location'] or 'untracked'}" + (f" [{b['status']}]" if b['status'] else "")
+                    for b in data["batches"]
+                ]) or "No batches found."
+                if data["more"]:
+                    batch_list += f"\n(and {data['more']} more)"
+                filters = (f" at {data['location']}" if data["location"] else "") \
+                    + (f" ({data['status']})" if data["status"] else "")
+                return template.format(
+                    **{**data, "verb": "that expired" if data["expired"] else "expiring",
+                       "filters": filters, "batch_list": batch_list}
+                ).strip()
+
         except KeyError as e:
             return f"Missing data field in template: {e}"
 
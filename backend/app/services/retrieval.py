@@ -0,0 +1,362 @@
+import bisect
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import settings
+from app.services.vectorizer import HashingVectorizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parent.parent / "data" / "retrieval_index"
+
+# Tracking events folded into each batch document (most recent last)
+TRAIL_LENGTH = 5
+
+
+class VectorIndex:
+    """
+    Dense NumPy matrix of L2-normalized hashed n-gram vectors, one column per
+    document, with incremental ``add``/``delete`` and cosine top-k ``search``.
+
+    The matrix is stored feature-major, so a search only reads the rows of
+    the n-grams present in the query. Document frequencies are maintained
+    alongside the rows and applied to the query only, so IDF weighting stays
+    correct without re-vectorizing stored documents.
+
+    Columns live in two segments: a read-only base, memory-mapped from
+    ``vectors.npy`` once loaded or saved, and an in-memory delta that new
+    and changed documents go to (freed delta columns are reused). Replaced
+    or deleted base columns are only masked. ``save`` writes the delta
+    (``delta.npy``) and ``docs.json`` from a snapshot taken under the lock;
+    the base is rewritten only when ``compact`` folds the delta and masked
+    columns into a new one, which ``save`` does once either outgrows
+    ``COMPACT_RATIO`` of the base.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    DELTA_FILE = "delta.npy"
+    DOCS_FILE = "docs.json"
+    # Delta columns always tolerated before ``save`` compacts
+    COMPACT_MIN_COLUMNS = 1024
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, n_features: int = 2 ** 11, capacity: int = 1024):
+        self.vectorizer = HashingVectorizer(n_features=n_features)
+        self._base = np.zeros((n_features, 0), dtype=np.float32)
+        self._base_file: Optional[Path] = None  # where the base is saved, if anywhere
+        self._masked = np.zeros(0, dtype=bool)  # base columns replaced or deleted
+        self._delta = np.zeros((n_features, capacity), dtype=np.float32)
+        self._df = np.zeros(n_features, dtype=np.float32)
+        self._ids: List[Optional[str]] = []
+        self._texts: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []  # unused delta rows
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # one save (or compaction) at a time
+        # Count of real inserts/updates/deletes, so callers know when to save
+        self.writes = 0
+        # Incremental refresh cursors (see ``RetrievalIndex.refresh``)
+        self.cursors: Dict[str, int] = {"batch": 0, "tracking": 0}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def text(self, doc_id: str) -> Optional[str]:
+        row = self._rows.get(doc_id)
+        return self._texts[row] if row is not None else None
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Insert ``doc_id``, or replace it if its text changed."""
+        indices, values = self.vectorizer.transform_sparse(text)
+        with self._lock:
+            row = self._rows.get(doc_id)
+            if row is not None:
+                if self._texts[row] == text:
+                    return
+                row = self._clear(row)
+            if row is None:
+                row = self._free.pop() if self._free else self._append()
+            self._delta[indices, row - self._base.shape[1]] = values
+            self._df[indices[values != 0]] += 1.0
+            self._ids[row] = doc_id
+            self._texts[row] = text
+            self._rows[doc_id] = row
+            self.writes += 1
+
+    def delete(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self._rows.pop(doc_id, None)
+            if row is None:
+                return False
+            row = self._clear(row)
+            if row is not None:
+                self._free.append(row)
+            self.writes += 1
+            return True
+
+    def search(self, query: str, k: int = 5, min_score: float = 0.0) -> List[Tuple[str, float, str]]:
+        """Best ``k`` documents for ``query`` as ``(doc_id, score, text)``, best first."""
+        indices, values = self.vectorizer.transform_sparse(query)
+        with self._lock:
+            used = len(self._ids)
+            if not self._rows or not len(indices):
+                return []
+            documents = len(self._rows)
+            values = values * (np.log((1.0 + documents) / (1.0 + self._df[indices])) + 1.0)
+            norm = float(np.sqrt(values @ values))
+            if not norm:
+                return []
+            # Only the features present in the query contribute to the dot product
+            values = (values / norm).astype(np.float32)
+            columns = self._base.shape[1]
+            scores = np.empty(used, dtype=np.float32)
+            scores[:columns] = values @ self._base[indices]
+            scores[columns:] = values @ self._delta[indices, :used - columns]
+            scores[:columns][self._masked] = -np.inf
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (self._ids[row], float(scores[row]), self._texts[row])
+                for row in top
+                if self._ids[row] is not None and scores[row] >= min_score
+            ]
+
+    def _clear(self, row: int) -> Optional[int]:
+        """Drop the document in ``row``; returns the row if it is a delta row free for reuse."""
+        columns = self._base.shape[1]
+        column = self._base[:, row] if row < columns else self._delta[:, row - columns]
+        self._df[np.flatnonzero(column)] -= 1.0
+        self._ids[row] = None
+        self._texts[row] = None
+        if row < columns:
+            # The base is never written: mask the column until the next compaction
+            self._masked[row] = True
+            return None
+        self._delta[:, row - columns] = 0.0
+        return row
+
+    def _append(self) -> int:
+        row = len(self._ids)
+        self._ids.append(None)
+        self._texts.append(None)
+        self._reserve(row - self._base.shape[1] + 1)
+        return row
+
+    def _reserve(self, columns: int) -> None:
+        capacity = self._delta.shape[1]
+        if columns <= capacity:
+            return
+        grown = np.zeros((self._delta.shape[0], max(columns, 2 * capacity, 1024)), dtype=np.float32)
+        grown[:, :capacity] = self._delta
+        self._delta = grown
+
+    def _needs_compaction(self) -> bool:
+        columns = self._base.shape[1]
+        delta = len(self._ids) - columns
+        return (delta > max(self.COMPACT_MIN_COLUMNS, self.COMPACT_RATIO * columns)
+                or int(self._masked.sum()) > self.COMPACT_RATIO * columns)
+
+    def compact(self) -> None:
+        """Fold the delta into a new base without masked or freed columns (renumbers rows)."""
+        with self._lock:
+            columns = self._base.shape[1]
+            live = [row for row, doc_id in enumerate(self._ids) if doc_id is not None]
+            in_base = bisect.bisect_left(live, columns)
+            base = np.empty((self._base.shape[0], len(live)), dtype=np.float32)
+            base[:, :in_base] = self._base[:, live[:in_base]]
+            base[:, in_base:] = self._delta[:, [row - columns for row in live[in_base:]]]
+            self._base = base
+            self._base_file = None
+            self._masked = np.zeros(len(live), dtype=bool)
+            self._delta = np.zeros((base.shape[0], self.COMPACT_MIN_COLUMNS), dtype=np.float32)
+            self._ids = [self._ids[row] for row in live]
+            self._texts = [self._texts[row] for row in live]
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._free = []
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / self.VECTORS_FILE
+        with self._save_lock:
+            if self._needs_compaction():
+                self.compact()
+            with self._lock:
+                base = self._base
+                write_base = self._base_file != target
+                delta = self._delta[:, :len(self._ids) - base.shape[1]].copy()
+                docs = {
+                    "n_features": self.vectorizer.n_features,
+                    "ngram_range": list(self.vectorizer.ngram_range),
+                    "base_columns": base.shape[1],
+                    "ids": list(self._ids),
+                    "texts": list(self._texts),
+                    "df": self._df.tolist(),
+                    "cursors": dict(self.cursors),
+                }
+            # Written outside the lock; write-then-rename so a concurrent load never sees a torn file
+            if write_base:
+                self._write_array(target, base)
+                with self._lock:
+                    if self._base is base:
+                        # Same columns, now paged in from disk instead of held in memory
+                        self._base = np.load(target, mmap_mode="r")
+                        self._base_file = target
+            self._write_array(directory / self.DELTA_FILE, delta)
+            (directory / f"{self.DOCS_FILE}.tmp").write_text(json.dumps(docs), encoding="utf-8")
+            os.replace(directory / f"{self.DOCS_FILE}.tmp", directory / self.DOCS_FILE)
+
+    @staticmethod
+    def _write_array(path: Path, array: np.ndarray) -> None:
+        temporary = path.with_name(f"{path.name}.tmp")
+        with open(temporary, "wb") as handle:
+            np.save(handle, np.ascontiguousarray(array))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, directory: Path) -> "VectorIndex":
+        directory = Path(directory)
+        docs = json.loads((directory / cls.DOCS_FILE).read_text(encoding="utf-8"))
+        index = cls(n_features=docs["n_features"], capacity=0)
+        index.vectorizer = HashingVectorizer(n_features=docs["n_features"], ngram_range=tuple(docs["ngram_range"]))
+        # Read-only mapping: pages are read lazily and never written
+        index._base = np.load(directory / cls.VECTORS_FILE, mmap_mode="r")
+        index._base_file = directory / cls.VECTORS_FILE
+        columns = docs.get("base_columns", index._base.shape[1])
+        index._ids = docs["ids"]
+        index._texts = docs["texts"]
+        if columns < len(index._ids):
+            index._delta = np.load(directory / cls.DELTA_FILE)
+        index._df = np.asarray(docs["df"], dtype=np.float32)
+        index._rows = {doc_id: row for row, doc_id in enumerate(index._ids) if doc_id is not None}
+        index._masked = np.array([doc_id is None for doc_id in index._ids[:columns]], dtype=bool)
+        index._free = [row for row in range(columns, len(index._ids)) if index._ids[row] is None]
+        index.cursors = docs["cursors"]
+        return index
+
+
+# ✅ Document builders: one textual snippet per ERP record
+
+def batch_document(batch) -> str:
+    product = batch.product
+    lines = [
+        f"Batch {batch.batch_code}: {batch.quantity} units of "
+        f"{product.name if product else 'unknown product'}"
+        f"{f' ({product.category})' if product and product.category else ''}, "
+        f"manufactured {batch.manufactured_date}, expires {batch.expiry_date}"
+        f"{f', created by {batch.creator.name}' if batch.creator else ''}."
+    ]
+    events = sorted((e for e in batch.tracking_records if e.timestamp), key=lambda e: e.timestamp)
+    for event in events[-TRAIL_LENGTH:]:
+        lines.append(
+            f"{event.timestamp:%Y-%m-%d %H:%M} {event.status.value if event.status else 'Unknown'} "
+            f"at {event.location}{f', handled by {event.handler.name}' if event.handler else ''}."
+        )
+    return " ".join(lines)
+
+
+def product_document(product) -> str:
+    return (f"Product {product.name}: category {product.category or 'n/a'}, "
+            f"unit price {product.unit_price}.")
+
+
+def employee_document(employee) -> str:
+    department = employee.department.name if employee.department else "no department"
+    return f"Employee {employee.name} ({employee.email}): {employee.designation or 'staff'} in {department}."
+
+
+def _batch_documents(db: Session, batch_ids: Optional[Iterable[int]] = None) -> Iterator[Tuple[str, str]]:
+    from app.models.batch_control import Batch, BatchTracking
+
+    options = (
+        selectinload(Batch.product),
+        selectinload(Batch.creator),
+        selectinload(Batch.tracking_records).selectinload(BatchTracking.handler),
+    )
+    if batch_ids is None:
+        for batch in db.query(Batch).options(*options).order_by(Batch.id).yield_per(1000):
+            yield f"batch:{batch.id}", batch_document(batch)
+        return
+    batch_ids = sorted(set(batch_ids))
+    for start in range(0, len(batch_ids), 1000):
+        chunk = batch_ids[start:start + 1000]
+        for batch in db.query(Batch).options(*options).filter(Batch.id.in_(chunk)):
+            yield f"batch:{batch.id}", batch_document(batch)
+
+
+class RetrievalIndex(VectorIndex):
+    """``VectorIndex`` over batches (with their tracking trail), products and employees."""
+
+    def refresh(self, db: Session) -> int:
+        """
+        Index batches created, and batches with tracking events recorded, since
+        the last refresh; re-check the (small) product and employee tables.
+        Returns the number of documents added or updated.
+        """
+        from app.models.batch_control import Batch, BatchTracking, Product
+        from app.models.common import Employee
+
+        before = self.writes
+        new_batches = [row[0] for row in db.query(Batch.id).filter(Batch.id > self.cursors["batch"])]
+        new_events = db.query(BatchTracking.id, BatchTracking.batch_id) \
+            .filter(BatchTracking.id > self.cursors["tracking"]).all()
+        changed = set(new_batches) | {batch_id for _, batch_id in new_events if batch_id is not None}
+
+        for doc_id, text in _batch_documents(db, changed):
+            self.add(doc_id, text)
+        for product in db.query(Product):
+            self.add(f"product:{product.id}", product_document(product))
+        for employee in db.query(Employee).options(selectinload(Employee.department)):
+            self.add(f"employee:{employee.id}", employee_document(employee))
+
+        if new_batches:
+            self.cursors["batch"] = max(self.cursors["batch"], max(new_batches))
+        if new_events:
+            self.cursors["tracking"] = max(self.cursors["tracking"], max(event_id for event_id, _ in new_events))
+        return self.writes - before
+
+    def rebuild(self, db: Session) -> int:
+        """Re-index every row and drop documents whose rows are gone."""
+        from app.models.batch_control import Batch, Product
+        from app.models.common import Employee
+
+        before = self.writes
+        self.cursors = {"batch": 0, "tracking": 0}
+        self.refresh(db)
+        live = {f"batch:{row[0]}" for row in db.query(Batch.id)} \
+            | {f"product:{row[0]}" for row in db.query(Product.id)} \
+            | {f"employee:{row[0]}" for row in db.query(Employee.id)}
+        for doc_id in set(self._rows) - live:
+            self.delete(doc_id)
+        return self.writes - before
+
+    def context(self, query: str, k: Optional[int] = None) -> List[str]:
+        """Snippets worth handing to the LLM for ``query``."""
+        hits = self.search(query, k or settings.RETRIEVAL_TOP_K, settings.RETRIEVAL_MIN_SCORE)
+        return [text for _, _, text in hits]
+
+
+def load_or_build(db: Session, directory: Optional[Path] = None) -> RetrievalIndex:
+    """Memory-map the saved index in ``directory`` (building it if absent), then catch up with the DB."""
+    directory = Path(directory or DEFAULT_INDEX_DIR)
+    if (directory / RetrievalIndex.DOCS_FILE).exists():
+        index = RetrievalIndex.load(directory)
+    else:
+        index = RetrievalIndex(n_features=settings.RETRIEVAL_N_FEATURES)
+    if index.refresh(db):
+        try:
+            index.save(directory)
+        except OSError as e:
+            logger.warning("Could not save retrieval index to %s: %s", directory, e)
+    return index
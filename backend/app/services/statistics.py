@@ -0,0 +1,93 @@
+import threading
+from datetime import date
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud.batch_control import batch_crud
+from app.models.batch_control import Batch, BatchTracking, Product
+from app.services.cache import LRUCache
+
+# Rows whose writes change the statistics
+_STATS_MODELS = (Batch, BatchTracking, Product)
+_STALE_FLAG = "batch_statistics_stale"
+
+
+class BatchStatistics:
+    """
+    Cached batch statistics (see ``BatchCRUD.get_batch_statistics``).
+
+    Results are cached per expiry window and day, and dropped whenever a
+    session commits new or changed batches, tracking events or products.
+    A computation that overlaps such a commit is returned but not cached.
+    The TTL bounds staleness from writers outside this process.
+    """
+
+    def __init__(self, ttl: Optional[float] = 300, expiring_within_days: int = 30):
+        self.cache = LRUCache(maxsize=16, ttl=ttl)
+        self.expiring_within_days = expiring_within_days
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.computations = 0
+        self.invalidations = 0
+
+    def get(self, db: Session, expiring_within_days: Optional[int] = None) -> Dict[str, Any]:
+        days = expiring_within_days or self.expiring_within_days
+        key = (days, date.today())
+        stats = self.cache.get(key)
+        if stats is not None:
+            return stats
+
+        generation = self._generation
+        stats = batch_crud.get_batch_statistics(db, days)
+        with self._lock:
+            self.computations += 1
+            if generation == self._generation:
+                self.cache.set(key, stats)
+        return stats
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self.cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.cache.stats(), "computations": self.computations, "invalidations": self.invalidations}
+
+
+# ✅ Export singleton
+batch_statistics = BatchStatistics(
+    ttl=settings.STATS_CACHE_TTL_SECONDS,
+    expiring_within_days=settings.STATS_EXPIRING_WITHIN_DAYS
+)
+
+
+# ✅ Session hooks: note writes that affect the statistics, invalidate once they commit
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_writes(session: Session, flush_context) -> None:
+    if any(isinstance(obj, _STATS_MODELS) for changed in (session.new, session.dirty, session.deleted) for obj in changed):
+        session.info[_STALE_FLAG] = True
+
+
+# insert=True: runs ahead of hooks that execute the statement themselves
+@event.listens_for(Session, "do_orm_execute", insert=True)
+def _note_bulk_writes(state) -> None:
+    if state.is_select or state.bind_mapper is None:
+        return
+    if issubclass(state.bind_mapper.class_, _STATS_MODELS):
+        state.session.info[_STALE_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop(_STALE_FLAG, False):
+        batch_statistics.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_STALE_FLAG, None)
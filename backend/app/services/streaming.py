@@ -0,0 +1,41 @@
+import json
+import logging
+from typing import Any, AsyncIterator, Iterable, Iterator, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+logger = logging.getLogger(__name__)
+
+# ✅ Stop proxies (nginx) from buffering the stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+async def event_stream(events: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[str]:
+    """
+    Turn ``(event, payload)`` pairs into SSE frames. Always terminates with a
+    ``done`` event; failures mid-stream are reported as an ``error`` event
+    since the 200 status line has already been sent.
+    """
+    try:
+        async for event, payload in events:
+            yield format_sse(event, payload)
+    except Exception as e:
+        logger.exception("Stream failed")
+        yield format_sse("error", {"detail": f"Error: {str(e)}"})
+    yield format_sse("done", {})
+
+
+def ndjson_lines(items: Iterable[Any]) -> Iterator[str]:
+    """One JSON document per line, encoded lazily as rows come off the cursor."""
+    for item in items:
+        yield json.dumps(jsonable_encoder(item), ensure_ascii=False) + "\n"
@@ -0,0 +1,82 @@
+import math
+import zlib
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class HashingVectorizer:
+    """
+    Character n-gram features hashed into a fixed number of buckets.
+
+    Hashing uses CRC32 so feature indexes are stable across processes (the
+    built-in ``hash`` is salted per run), which lets vectors be persisted.
+    The high bit of the hash picks the sign to keep collisions unbiased.
+    """
+
+    MEMO_SIZE = 1 << 18
+
+    def __init__(self, n_features: int = 2 ** 13, ngram_range: Tuple[int, int] = (2, 4)):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of two")
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self._mask = n_features - 1
+        self._features: Dict[str, Tuple[int, float]] = {}
+
+    def counts(self, text: str) -> Dict[int, float]:
+        """Signed hashed n-gram counts for one text, as ``{index: count}``."""
+        padded = f" {' '.join(text.lower().split())} "
+        low, high = self.ngram_range
+        counts: Dict[int, float] = {}
+        features = self._features
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                gram = padded[i:i + n]
+                feature = features.get(gram)
+                if feature is None:
+                    feature = self._hash(gram)
+                index, sign = feature
+                counts[index] = counts.get(index, 0.0) + sign
+        return counts
+
+    def _hash(self, gram: str) -> Tuple[int, float]:
+        digest = zlib.crc32(gram.encode())
+        feature = (digest & self._mask, 1.0 if digest >> 31 else -1.0)
+        # n-grams repeat heavily across texts; memoize up to a fixed size
+        if len(self._features) < self.MEMO_SIZE:
+            self._features[gram] = feature
+        return feature
+
+    def transform_sparse(self, text: str, idf: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sublinear TF(-IDF) weights for one text as ``(indices, values)``,
+        L2-normalized.
+        """
+        counts = self.counts(text)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        raw = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        magnitude = np.abs(raw)
+        values = np.where(magnitude > 0, np.copysign(1.0 + np.log(np.maximum(magnitude, 1.0)), raw), 0.0) \
+            .astype(np.float32)
+        if idf is not None:
+            values *= idf[indices]
+        norm = math.sqrt(float(values @ values)) if len(values) else 0.0
+        if norm:
+            values /= norm
+        return indices, values
+
+    def transform(self, texts: Sequence[str], idf: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dense ``(len(texts), n_features)`` matrix."""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, values = self.transform_sparse(text, idf)
+            matrix[row, indices] = values
+        return matrix
+
+    def fit_idf(self, texts: Sequence[str]) -> np.ndarray:
+        """Smoothed inverse document frequency per hashed feature."""
+        document_frequency = np.zeros(self.n_features, dtype=np.float32)
+        for text in texts:
+            document_frequency[list(self.counts(text).keys())] += 1.0
+        return (np.log((1.0 + len(texts)) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
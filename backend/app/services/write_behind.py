@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.schemas.batch_control import TrackingEventIn
+from app.services.cache import LRUCache
+from app.services.ingest import ingest_tracking_events
+from app.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_EVENTS = registry.counter(
+    "chatbot_write_behind_events_total", "Single tracking events by write-behind outcome.", ("outcome",)
+)
+WRITE_BEHIND_COMMIT_SECONDS = registry.histogram(
+    "chatbot_write_behind_commit_seconds", "Time to insert and commit one group of queued events."
+)
+WRITE_BEHIND_GROUP_SIZE = registry.histogram(
+    "chatbot_write_behind_group_size", "Events written per group commit.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+
+
+class IngestUnavailable(Exception):
+    """Raised instead of queueing an event: queue full or shutting down."""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"Ingestion unavailable ({reason}){': ' + detail if detail else ''}")
+        self.reason = reason
+
+
+class TrackingWriteBehind:
+    """
+    Acknowledge single tracking events into a bounded queue and write them
+    in group commits, so a burst of scanner posts shares one transaction.
+
+    * A group is flushed once ``group_size`` events are waiting or
+      ``flush_interval`` seconds after its first event arrived.
+    * Events carrying an idempotency key already seen within
+      ``idempotency_ttl`` are acknowledged as duplicates and dropped. Keys
+      of events that fail to insert are forgotten, so the retry goes in.
+    * More than ``max_queue`` waiting events raises ``IngestUnavailable``;
+      callers answer 503 and the scanner retries.
+    * If the database is unreachable the group goes back to the head of the
+      queue and is retried every ``retry_interval`` seconds.
+    * ``drain`` stops accepting events and flushes what is queued, giving
+      up after one failed attempt.
+
+    Acknowledged events live only in this process until written: a crash
+    loses at most one queue. Scanners that need more use /tracking/bulk.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, max_queue: int = 10_000,
+                 group_size: int = 500, flush_interval: float = 0.05, retry_interval: float = 1.0,
+                 idempotency_ttl: Optional[float] = 600, idempotency_max_keys: int = 100_000):
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.group_size = group_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.seen_keys = LRUCache(maxsize=idempotency_max_keys, ttl=idempotency_ttl)
+        # (arrival time, event, idempotency key)
+        self._queue: Deque[Tuple[float, TrackingEventIn, Optional[str]]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self.counts = dict.fromkeys(("accepted", "duplicate", "rejected", "written", "failed", "groups"), 0)
+
+    # ---- producers ---------------------------------------------------------
+
+    def submit(self, event: Union[Dict[str, Any], TrackingEventIn], idempotency_key: Optional[str] = None) -> str:
+        """
+        Queue one event; returns "accepted" or "duplicate". Raises
+        ``ValidationError`` for a malformed event and ``IngestUnavailable``
+        when the queue is full or closed.
+        """
+        if not isinstance(event, TrackingEventIn):
+            event = TrackingEventIn.model_validate(event)
+        with self._cond:
+            if self._closing:
+                self._count("rejected")
+                raise IngestUnavailable("shutting_down")
+            if idempotency_key and self.seen_keys.get(idempotency_key) is not None:
+                self._count("duplicate")
+                return "duplicate"
+            if len(self._queue) >= self.max_queue:
+                self._count("rejected")
+                raise IngestUnavailable("queue_full", f"{len(self._queue)} events waiting")
+            if idempotency_key:
+                self.seen_keys.set(idempotency_key, True)
+            self._queue.append((time.monotonic(), event, idempotency_key))
+            self._count("accepted")
+            if len(self._queue) == 1 or len(self._queue) >= self.group_size:
+                self._cond.notify()
+        return "accepted"
+
+    # ---- writer ------------------------------------------------------------
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name="tracking-write-behind", daemon=True)
+            self._thread.start()
+
+    def _next_group(self) -> List[Tuple[float, TrackingEventIn, Optional[str]]]:
+        """Block until a group is due (full, window elapsed, or draining); [] once closed and empty."""
+        with self._cond:
+            while True:
+                if self._queue:
+                    due = self._queue[0][0] + self.flush_interval
+                    if self._closing or len(self._queue) >= self.group_size or time.monotonic() >= due:
+                        return [self._queue.popleft() for _ in range(min(self.group_size, len(self._queue)))]
+                    self._cond.wait(due - time.monotonic())
+                elif self._closing:
+                    return []
+                else:
+                    self._cond.wait()
+
+    def _run(self) -> None:
+        while True:
+            group = self._next_group()
+            if not group:
+                return
+            if not self._write(group):
+                with self._cond:
+                    self._queue.extendleft(reversed(group))
+                    if self._closing:
+                        return
+                    self._cond.wait(self.retry_interval)
+
+    def _write(self, group: List[Tuple[float, TrackingEventIn, Optional[str]]]) -> bool:
+        """Insert and commit one group; False if it should be retried."""
+        start = time.perf_counter()
+        try:
+            with self.session_factory() as db:
+                result = ingest_tracking_events(db, [event for _, event, _ in group], len(group))
+        except Exception as e:
+            logger.warning("Group of %d events not written, retrying: %s", len(group), e)
+            return False
+        WRITE_BEHIND_COMMIT_SECONDS.observe(time.perf_counter() - start)
+        WRITE_BEHIND_GROUP_SIZE.observe(len(group))
+
+        for error in result["errors"]:
+            key = group[error["index"]][2]
+            if key:
+                self.seen_keys.delete(key)
+            logger.warning("Dropped event for %s: %s", error["batch_code"], error["error"])
+        self._count("groups")
+        self._count("written", result["inserted"])
+        self._count("failed", result["failed"])
+        return True
+
+    def drain(self, timeout: Optional[float] = None) -> int:
+        """Stop accepting events and flush the queue; returns events left unwritten."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        elif self._queue:
+            # Never started (e.g. scripts): write on the caller's thread
+            self._run()
+        with self._cond:
+            left = len(self._queue)
+        if left:
+            logger.error("%d queued events not written at shutdown", left)
+        return left
+
+    # ---- monitoring --------------------------------------------------------
+
+    def _count(self, outcome: str, amount: int = 1) -> None:
+        with self._cond:
+            self.counts[outcome] += amount
+        if amount and outcome != "groups":
+            WRITE_BEHIND_EVENTS.inc(amount, outcome=outcome)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            **self.counts,
+            "idempotency_keys": len(self.seen_keys),
+        }
+
+
+# ✅ Export singleton
+tracking_write_behind = TrackingWriteBehind(
+    max_queue=settings.WRITE_BEHIND_MAX_QUEUE,
+    group_size=settings.WRITE_BEHIND_GROUP_SIZE,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_SECONDS,
+    idempotency_ttl=settings.WRITE_BEHIND_IDEMPOTENCY_TTL_SECONDS
+)
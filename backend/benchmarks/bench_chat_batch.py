@@ -0,0 +1,74 @@
+"""
+Shift-change report: N structured questions posted one /chat request at a
+time vs. a single /chat/batch request, counting SQL statements and wall time.
+
+Run from backend/:  python -m benchmarks.bench_chat_batch
+"""
+import sys
+import os
+import asyncio
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import async_database_url, get_async_db
+from app.main import app
+from benchmarks.common import report, temporary_database
+
+QUERIES = 300
+TEMPLATES = [
+    "Where is batch {code}?",
+    "Who handled batch {code}?",
+    "info about batch {code}",
+    "show delivered batches",
+    "list batches in transit",
+]
+
+
+async def compare(url: str, codes):
+    async_engine = create_async_engine(async_database_url(url))
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+    statements = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    async def override_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_db
+    queries = [TEMPLATES[i % len(TEMPLATES)].format(code=codes[i % len(codes)]) for i in range(QUERIES)]
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            statements.clear()
+            start = time.perf_counter()
+            singles = [(await client.post("/chat", json={"query": q})).json() for q in queries]
+            results["one by one"] = (time.perf_counter() - start, len(statements))
+
+            statements.clear()
+            start = time.perf_counter()
+            batch = (await client.post("/chat/batch", json={"queries": queries})).json()["results"]
+            results["/chat/batch"] = (time.perf_counter() - start, len(statements))
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        await async_engine.dispose()
+
+    assert [r["message"] for r in batch] == [r["message"] for r in singles]
+    return results
+
+
+def run():
+    with temporary_database(n_batches=2000) as (url, codes):
+        results = asyncio.run(compare(url, codes[:QUERIES]))
+
+    for name, (elapsed, statements) in results.items():
+        report(f"chat batch ({QUERIES} queries): {name}", elapsed * 1000, "ms")
+        report(f"chat batch ({QUERIES} queries): {name} SQL", statements, "stmts")
+    report("chat batch: speedup", results["one by one"][0] / results["/chat/batch"][0], "x")
+
+
+if __name__ == "__main__":
+    run()
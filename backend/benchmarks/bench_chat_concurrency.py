@@ -0,0 +1,93 @@
+"""
+Load test: concurrent /chat throughput with the blocking pipeline (sync DB +
+llm.invoke on the event loop) vs. the async pipeline (async session +
+llm.ainvoke), against a fake LLM with fixed latency.
+
+Run from backend/:  python -m benchmarks.bench_chat_concurrency
+"""
+import sys
+import os
+import asyncio
+import contextlib
+import io
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import async_database_url, get_async_db
+from app.main import app, ChatRequest
+from app.services.cache import SemanticResponseCache
+from app.services.fake_llm import FakeLLM
+from app.services.rag_pipeline import rag_pipeline
+from benchmarks.common import report, temporary_database
+
+CONCURRENCY = 50
+LLM_LATENCY = 0.2
+
+
+async def fire(client: httpx.AsyncClient, queries) -> float:
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(client.post("/chat", json={"query": q}) for q in queries))
+    elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200][:1]
+    return elapsed
+
+
+async def load_test(url: str, codes):
+    engine = create_engine(url)
+    SyncSession = sessionmaker(bind=engine)
+    async_engine = create_async_engine(async_database_url(url))
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    # Baseline: the pre-async endpoint, an async route running the sync pipeline.
+    legacy = FastAPI()
+
+    @legacy.post("/chat")
+    async def legacy_chat(request: ChatRequest):
+        with SyncSession() as db:
+            return rag_pipeline.process_query(request.query, db)
+
+    async def override_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_db
+    queries = [
+        f"what does word number {i} mean" if i % 2 else f"Where is batch {codes[i % len(codes)]}?"
+        for i in range(CONCURRENCY)
+    ]
+    try:
+        results = {}
+        for name, target in (("blocking", legacy), ("async", app)):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=target), base_url="http://bench") as client:
+                rag_pipeline.response_cache = SemanticResponseCache(max_entries=0)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[name] = await fire(client, queries)
+        return results
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        await async_engine.dispose()
+        engine.dispose()
+
+
+def run():
+    original_llm, original_cache = rag_pipeline.llm, rag_pipeline.response_cache
+    rag_pipeline.llm = FakeLLM(latency=LLM_LATENCY)
+    try:
+        with temporary_database(n_batches=200) as (url, codes):
+            results = asyncio.run(load_test(url, codes))
+    finally:
+        rag_pipeline.llm, rag_pipeline.response_cache = original_llm, original_cache
+
+    for name, elapsed in results.items():
+        report(f"chat ({CONCURRENCY} concurrent, LLM {LLM_LATENCY}s): {name}", CONCURRENCY / elapsed, "req/s")
+    report("chat: async speedup", results["blocking"] / results["async"], "x")
+
+
+if __name__ == "__main__":
+    run()
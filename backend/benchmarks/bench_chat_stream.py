@@ -0,0 +1,73 @@
+"""
+Time-to-first-byte: buffered /chat vs. Server-Sent Events /chat/stream for an
+LLM-answered query and a template-answered (database) query.
+
+Run from backend/:  python -m benchmarks.bench_chat_stream
+"""
+import sys
+import os
+import asyncio
+import contextlib
+import io
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import async_database_url, get_async_db
+from app.main import app
+from app.services.cache import SemanticResponseCache
+from app.services.fake_llm import FakeLLM
+from app.services.rag_pipeline import rag_pipeline
+from benchmarks.common import asgi_post, report, temporary_database
+
+LLM_LATENCY = 1.0
+ROUNDS = 5
+
+
+async def measure_paths(url: str, code: str):
+    async_engine = create_async_engine(async_database_url(url))
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_db
+    queries = {"llm": "write a short poem for the night shift", "template": f"Where is batch {code}?"}
+    results = {}
+    try:
+        for kind, query in queries.items():
+            for path in ("/chat", "/chat/stream"):
+                ttfb, first_token, total = [], [], []
+                for _ in range(ROUNDS):
+                    rag_pipeline.response_cache = SemanticResponseCache(max_entries=0)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        chunks = await asgi_post(app, path, {"query": query})
+                    ttfb.append(chunks[0][0])
+                    total.append(chunks[-1][0])
+                    token = next((t for t, body in chunks if b"event: token" in body or b"event: message" in body), None)
+                    first_token.append(token if token is not None else chunks[-1][0])
+                results[(kind, path)] = (min(ttfb), min(first_token), min(total))
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        await async_engine.dispose()
+    return results
+
+
+def run():
+    original_llm, original_cache = rag_pipeline.llm, rag_pipeline.response_cache
+    rag_pipeline.llm = FakeLLM(latency=LLM_LATENCY, response=" ".join(["token"] * 40))
+    try:
+        with temporary_database(n_batches=50) as (url, codes):
+            results = asyncio.run(measure_paths(url, codes[0]))
+    finally:
+        rag_pipeline.llm, rag_pipeline.response_cache = original_llm, original_cache
+
+    for (kind, path), (ttfb, first_token, total) in results.items():
+        report(f"{path} {kind}: first byte", ttfb * 1000, "ms")
+        report(f"{path} {kind}: first answer text", first_token * 1000, "ms")
+        report(f"{path} {kind}: complete", total * 1000, "ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,85 @@
+"""
+"Expiring soon" questions over a seeded database: the expiry query without
+and with ix_batches_expiry_date (migration 0005), and the in-memory expiry
+calendar, plus what it costs to build and to pick up new tracking events.
+
+Run from backend/:  python -m benchmarks.bench_expiry
+"""
+import sys
+import os
+import time
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.crud.batch_control import batch_crud
+from app.models.batch_control import BatchStatus, BatchTracking
+from app.services.expiry_calendar import ExpiryCalendar
+from benchmarks.common import measure, report, temporary_database
+
+N_BATCHES = 200_000
+NEW_EVENTS = 1000
+
+# (name, location, days ahead)
+QUESTIONS = [
+    ("next 30 days", None, 30),
+    ("next 30 days at Warehouse B", "Warehouse B", 30),
+    ("next 90 days at Warehouse B", "Warehouse B", 90),
+]
+
+
+def run():
+    today = date.today()
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=2) as (url, _):
+        engine = create_engine(url)
+        Session = sessionmaker(bind=engine)
+        results = {}
+        with Session() as db:
+            for name, location, days in QUESTIONS:
+                end = today + timedelta(days=days)
+                matched = len(batch_crud.get_expiring_batches(db, today, end, location))
+                indexed = measure(lambda: batch_crud.get_expiring_batches(db, today, end, location),
+                                  repeat=3, number=5)
+                results[name] = [matched, indexed]
+
+            db.execute(text("DROP INDEX ix_batches_expiry_date"))
+            db.commit()
+        engine.dispose()
+        with Session() as db:
+            for name, location, days in QUESTIONS:
+                end = today + timedelta(days=days)
+                results[name].append(measure(lambda: batch_crud.get_expiring_batches(db, today, end, location),
+                                             repeat=3, number=5))
+
+            calendar = ExpiryCalendar(refresh_interval=3600)
+            start = time.perf_counter()
+            loaded = calendar.refresh(db)
+            build = time.perf_counter() - start
+            for name, location, days in QUESTIONS:
+                end = today + timedelta(days=days)
+                results[name].append(measure(lambda: calendar.expiring(db, today, end, location, limit=100),
+                                             number=200))
+
+            db.execute(insert(BatchTracking), [
+                {"batch_id": batch_id, "location": "Warehouse B", "status": BatchStatus.DELIVERED,
+                 "timestamp": datetime(2026, 1, 1)}
+                for batch_id in range(1, NEW_EVENTS + 1)
+            ])
+            db.commit()
+            start = time.perf_counter()
+            reloaded = calendar.refresh(db)
+            update = time.perf_counter() - start
+        engine.dispose()
+
+    for name, (matched, indexed, unindexed, cached) in results.items():
+        report(f"{name} ({matched:,} batches): no index", unindexed / 1000, "ms")
+        report(f"{name}: ix_batches_expiry_date", indexed / 1000, "ms")
+        report(f"{name}: expiry calendar", cached)
+    report(f"calendar build ({loaded:,} batches in horizon)", build * 1000, "ms")
+    report(f"calendar refresh after {NEW_EVENTS} events ({reloaded} batches)", update * 1000, "ms")
+
+
+if __name__ == "__main__":
+    run()
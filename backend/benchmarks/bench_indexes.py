@@ -0,0 +1,98 @@
+"""
+Hot tracking queries on a multi-million-row SQLite dataset, with the indexes
+from migrations 0002 and 0004 and after dropping them: query plans and latency.
+
+Run from backend/:  python -m benchmarks.bench_indexes
+Size:               BENCH_INDEX_BATCHES=500000 (x4 events -> 2M tracking rows)
+"""
+import sys
+import os
+import random
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.common import report, temporary_database
+
+N_BATCHES = int(os.getenv("BENCH_INDEX_BATCHES", "500000"))
+EVENTS_PER_BATCH = 4
+LOOKUPS = 200
+
+INDEXES = {
+    "ix_batch_tracking_batch_id_timestamp": "CREATE INDEX ix_batch_tracking_batch_id_timestamp "
+                                            "ON batch_tracking (batch_id, timestamp DESC)",
+    "ix_batch_tracking_status": "CREATE INDEX ix_batch_tracking_status ON batch_tracking (status)",
+    "ix_batch_tracking_timestamp": "CREATE INDEX ix_batch_tracking_timestamp ON batch_tracking (timestamp)",
+}
+
+# (name, SQL, takes a batch id)
+QUERIES = [
+    ("latest event per batch",
+     "SELECT location, status, timestamp FROM batch_tracking WHERE batch_id = :batch_id "
+     "ORDER BY timestamp DESC LIMIT 1", True),
+    ("history",
+     "SELECT status, location, timestamp FROM batch_tracking WHERE batch_id = :batch_id "
+     "ORDER BY timestamp, id", True),
+    # A later page of BatchCRUD.get_batch_tracking_page (dated part, keyset on (timestamp, id))
+    ("history page",
+     "SELECT status, location, timestamp FROM batch_tracking WHERE batch_id = :batch_id "
+     "AND timestamp IS NOT NULL AND (timestamp, id) > ('2025-01-01 00:00:00.000000', 0) "
+     "ORDER BY timestamp, id LIMIT 51", True),
+    # What a monthly partition gives PostgreSQL: read one month, not the table
+    ("events in one hour",
+     "SELECT count(*) FROM batch_tracking "
+     "WHERE timestamp >= '2025-03-01 00:00:00.000000' AND timestamp < '2025-03-01 01:00:00.000000'", False),
+    ("count by status",
+     "SELECT count(*) FROM batch_tracking WHERE status = 'DELIVERED'", False),
+]
+
+
+def measure_queries(connection, batch_ids):
+    results = {}
+    for name, sql, per_batch in QUERIES:
+        plan = " / ".join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), {"batch_id": 1}))
+        params = [{"batch_id": batch_id} for batch_id in batch_ids] if per_batch else [{}] * 5
+        start = time.perf_counter()
+        for values in params:
+            connection.execute(text(sql), values).all()
+        results[name] = ((time.perf_counter() - start) / len(params), plan)
+    return results
+
+
+def run():
+    random.seed(7)
+    start = time.perf_counter()
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=EVENTS_PER_BATCH) as (url, _):
+        engine = create_engine(url)
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        report(f"seed ({N_BATCHES * EVENTS_PER_BATCH:,} tracking rows)", time.perf_counter() - start, "s")
+
+        batch_ids = random.sample(range(1, N_BATCHES + 1), LOOKUPS)
+        with engine.connect() as connection:
+            indexed = measure_queries(connection, batch_ids)
+            for name in INDEXES:
+                connection.execute(text(f"DROP INDEX {name}"))
+            connection.commit()
+        engine.dispose()
+        # Fresh connection: sqlite3's statement cache would replay the old plans
+        with engine.connect() as connection:
+            unindexed = measure_queries(connection, batch_ids)
+            # Put them back the way migrations 0002 / 0004 do, and time the build
+            for name, ddl in INDEXES.items():
+                build = time.perf_counter()
+                connection.execute(text(ddl))
+                report(f"build {name}", time.perf_counter() - build, "s")
+            connection.commit()
+        engine.dispose()
+
+    for name, _, _ in QUERIES:
+        report(f"{name}: no index", unindexed[name][0] * 1000, "ms")
+        report(f"{name}: indexed", indexed[name][0] * 1000, "ms")
+        print(f"    plan without: {unindexed[name][1]}")
+        print(f"    plan with:    {indexed[name][1]}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,81 @@
+"""
+Tracking-event ingestion throughput (rows/sec) on a seeded database:
+ORM add + commit per event (scripts/init_db.py style), ORM add_all with one
+commit, and ingest_tracking_events (validation, one code lookup, chunked
+multi-row INSERTs) at a few chunk sizes. Every path maintains
+batch_current_state and tracking_rollups through the session hooks.
+
+Run from backend/:  python -m benchmarks.bench_ingest
+"""
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.batch_control import BatchStatus, BatchTracking
+from app.services.ingest import ingest_tracking_events
+from benchmarks.common import report, temporary_database
+
+N_BATCHES = 10_000
+PER_COMMIT_EVENTS = 1000
+EVENTS = 20_000
+CHUNK_SIZES = (100, 1000, 5000)
+
+
+def scanner_burst(codes, count, start):
+    return [
+        {"batch_code": codes[i % len(codes)], "location": f"Warehouse {'ABC'[i % 3]}",
+         "status": "In Transit", "timestamp": (start + timedelta(seconds=i)).isoformat()}
+        for i in range(count)
+    ]
+
+
+def rate(count, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+
+def run():
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=1) as (url, codes):
+        engine = create_engine(url)
+        Session = sessionmaker(bind=engine)
+        ids = {code: i + 1 for i, code in enumerate(codes)}
+        start = datetime(2026, 1, 1)
+        rates = {}
+
+        def per_event_commit():
+            with Session() as db:
+                for event in scanner_burst(codes, PER_COMMIT_EVENTS, start):
+                    db.add(BatchTracking(batch_id=ids[event["batch_code"]], location=event["location"],
+                                         status=BatchStatus.IN_TRANSIT, timestamp=datetime.fromisoformat(event["timestamp"])))
+                    db.commit()
+        rates["ORM add + commit per event"] = rate(PER_COMMIT_EVENTS, per_event_commit)
+
+        def add_all():
+            with Session() as db:
+                db.add_all(
+                    BatchTracking(batch_id=ids[event["batch_code"]], location=event["location"],
+                                  status=BatchStatus.IN_TRANSIT, timestamp=datetime.fromisoformat(event["timestamp"]))
+                    for event in scanner_burst(codes, EVENTS, start + timedelta(days=1))
+                )
+                db.commit()
+        rates["ORM add_all + one commit"] = rate(EVENTS, add_all)
+
+        for offset, chunk_size in enumerate(CHUNK_SIZES, start=2):
+            events = scanner_burst(codes, EVENTS, start + timedelta(days=offset))
+            with Session() as db:
+                rates[f"ingest_tracking_events, chunks of {chunk_size}"] = rate(
+                    EVENTS, lambda: ingest_tracking_events(db, events, chunk_size))
+        engine.dispose()
+
+    for name, rows_per_second in rates.items():
+        report(name, rows_per_second, "rows/s")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,55 @@
+"""
+Local intent model: how many rule misses it takes off the LLM path, and at
+what cost per query.
+
+Run from backend/:  python -m benchmarks.bench_intent_model
+"""
+import sys
+import os
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.services.intent_model import IntentModel, load_corpus
+from app.services.nlu import NLUService, QueryIntent, normalize_query
+from benchmarks.common import measure, report
+
+FOLDS = 5
+
+
+def run():
+    texts, labels = load_corpus()
+    rules = NLUService()
+    threshold = settings.INTENT_MODEL_THRESHOLD
+
+    order = list(range(len(texts)))
+    random.Random(0).shuffle(order)
+
+    rule_misses = answered = correct = 0
+    model = None
+    for fold in range(FOLDS):
+        held_out = set(order[fold::FOLDS])
+        model = IntentModel.train(
+            [texts[i] for i in order if i not in held_out],
+            [labels[i] for i in order if i not in held_out]
+        )
+        for i in held_out:
+            if labels[i] == QueryIntent.UNKNOWN.value:
+                continue
+            query = normalize_query(texts[i])
+            if rules.engine.analyze(query)[0] != QueryIntent.UNKNOWN:
+                continue
+            rule_misses += 1
+            label, confidence = model.predict(query)
+            if confidence >= threshold:
+                answered += 1
+                correct += label == labels[i]
+
+    report("intent model: held-out batch queries rules miss", rule_misses, "queries")
+    report(f"intent model: answered locally (p >= {threshold})", 100.0 * answered / rule_misses, "%")
+    report("intent model: precision of local answers", 100.0 * correct / max(answered, 1), "%")
+    report("intent model: predict latency", measure(lambda: model.predict("whereabouts of batch vdt-052025-a"), number=200))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,91 @@
+"""
+Gemini slowdown drill: a burst of distinct unknown-intent queries against a
+fake LLM that has become very slow, with and without the LLM gateway.
+Reports caller latency and how many model calls were in flight at once.
+
+Run from backend/:  python -m benchmarks.bench_llm_gateway
+"""
+import sys
+import os
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+from unittest.mock import MagicMock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.cache import SemanticResponseCache
+from app.services.fake_llm import FakeLLM
+from app.services.llm_gateway import CircuitBreaker, LLMGateway, LLM_UNAVAILABLE_MESSAGE
+from app.services.rag_pipeline import rag_pipeline
+from benchmarks.common import report
+
+BURST = 300
+SLOW_LATENCY = 3.0
+
+
+class CountingLLM(FakeLLM):
+    """FakeLLM that records peak concurrency."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().ainvoke(messages, **kwargs)
+        finally:
+            self.active -= 1
+
+
+class NoGateway:
+    """Baseline: call the model directly, no limits."""
+
+    async def ainvoke(self, llm, messages):
+        return await llm.ainvoke(messages)
+
+    def stats(self):
+        return {}
+
+
+async def burst():
+    latencies = []
+
+    async def one(i):
+        start = time.perf_counter()
+        result = await rag_pipeline.aprocess_query(f"what does word number {i} mean", MagicMock())
+        latencies.append(time.perf_counter() - start)
+        return result["message"]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        messages = await asyncio.gather(*(one(i) for i in range(BURST)))
+    return sorted(latencies), messages
+
+
+def run():
+    original = (rag_pipeline.llm, rag_pipeline.response_cache, rag_pipeline.gateway)
+    rag_pipeline.response_cache = SemanticResponseCache(max_entries=0)
+    try:
+        for name, gateway in (
+            ("direct", NoGateway()),
+            ("gateway", LLMGateway(max_concurrency=8, max_queue=32, timeout=1.0,
+                                   breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30))),
+        ):
+            rag_pipeline.llm = CountingLLM(latency=SLOW_LATENCY)
+            rag_pipeline.gateway = gateway
+            latencies, messages = asyncio.run(burst())
+            p99 = latencies[int(0.99 * (len(latencies) - 1))]
+            report(f"slow LLM x{BURST}, {name}: p50 latency", statistics.median(latencies) * 1000, "ms")
+            report(f"slow LLM x{BURST}, {name}: p99 latency", p99 * 1000, "ms")
+            report(f"slow LLM x{BURST}, {name}: peak model calls", rag_pipeline.llm.peak, "concurrent")
+            report(f"slow LLM x{BURST}, {name}: fallback answers", messages.count(LLM_UNAVAILABLE_MESSAGE), "requests")
+    finally:
+        rag_pipeline.llm, rag_pipeline.response_cache, rag_pipeline.gateway = original
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,68 @@
+"""
+Instrumentation overhead (per observation / per tracked block / per scrape)
+and the per-stage latency breakdown of a mixed /chat load.
+
+Run from backend/:  python -m benchmarks.bench_metrics
+"""
+import sys
+import os
+import asyncio
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import async_database_url
+from app.services.cache import SemanticResponseCache
+from app.services.fake_llm import FakeLLM
+from app.services.metrics import MetricsRegistry, STAGE_SECONDS, registry, track
+from app.services.rag_pipeline import rag_pipeline
+from benchmarks.common import measure, report, temporary_database
+
+QUERIES = 300
+
+
+async def mixed_load(url: str, codes):
+    engine = create_async_engine(async_database_url(url))
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    rng = random.Random(3)
+    templates = [
+        "Where is batch {code}?", "Who handled {code}?", "Show the full history of {code}",
+        "Tell me about batch {code}", "List all batches that are delivered", "what does word {n} mean",
+    ]
+    for i in range(QUERIES):
+        query = rng.choice(templates).format(code=rng.choice(codes), n=i)
+        async with Session() as db:
+            await rag_pipeline.aprocess_query(query, db)
+    await engine.dispose()
+
+
+def run():
+    scratch = MetricsRegistry().histogram("bench_seconds", "Bench.", ("stage", "intent"))
+    report("metrics: histogram observe", measure(lambda: scratch.observe(0.003, stage="nlu", intent="x"), number=20000))
+
+    def tracked():
+        with track("bench"):
+            pass
+    report("metrics: track() block", measure(tracked, number=20000))
+
+    original_llm, original_cache = rag_pipeline.llm, rag_pipeline.response_cache
+    rag_pipeline.llm = FakeLLM(latency=0.05)
+    rag_pipeline.response_cache = SemanticResponseCache(max_entries=0)
+    try:
+        with temporary_database(n_batches=500) as (url, codes):
+            asyncio.run(mixed_load(url, codes))
+    finally:
+        rag_pipeline.llm, rag_pipeline.response_cache = original_llm, original_cache
+
+    report("metrics: /metrics render", measure(registry.render, number=50))
+    for (stage, intent) in sorted(STAGE_SECONDS._series):
+        if intent == "none":
+            continue
+        p50 = STAGE_SECONDS.quantile(0.5, stage=stage, intent=intent)
+        p99 = STAGE_SECONDS.quantile(0.99, stage=stage, intent=intent)
+        report(f"stage {stage} [{intent}] p50 / p99 <=", p50 * 1000, f"ms / {p99 * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    run()
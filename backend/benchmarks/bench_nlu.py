@@ -0,0 +1,60 @@
+"""
+Micro-benchmark: compiled single-pass NLU engine vs. the per-pattern classifier.
+
+Run from backend/:  python -m benchmarks.bench_nlu
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.nlu import NLUService
+from benchmarks.common import measure, report
+
+QUERIES = [
+    "Where is batch VDT-052025-A?",
+    "Who handled VDT-052025-A?",
+    "Show the full history of ABC-123456-B",
+    "List all batches that are delivered",
+    "Give me details about batch 1234",
+    "Draw a chart for VDT-052025-A",
+    "What's the weather in Chennai?",
+    "hello there",
+]
+
+
+def run():
+    service = NLUService()
+    classifier = service.intent_classifier
+    extractor = service.entity_extractor
+
+    def legacy():
+        for query in QUERIES:
+            classifier.classify_intent(query)
+            extractor.extract_batch_code(query)
+            extractor.extract_status(query)
+
+    def compiled():
+        for query in QUERIES:
+            service.engine.analyze(query)
+
+    def bulk():
+        service.process_queries(QUERIES)
+
+    cached_service = NLUService(cache_size=len(QUERIES))
+
+    def cached():
+        for query in QUERIES:
+            cached_service.process_query(query)
+
+    per_query = len(QUERIES)
+    legacy_us = measure(legacy) / per_query
+    compiled_us = measure(compiled) / per_query
+    report("nlu: per-pattern classifier + extractor", legacy_us)
+    report("nlu: compiled single-pass engine", compiled_us)
+    report("nlu: process_queries (bulk)", measure(bulk) / per_query)
+    report("nlu: process_query (memoized, warm)", measure(cached) / per_query)
+    report("nlu: speedup", legacy_us / compiled_us, "x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,77 @@
+"""
+Large status listing served three ways: the whole list built and encoded in
+one response, NDJSON streamed off a yield_per cursor, and keyset pages.
+Reports peak Python memory (tracemalloc) and deep-page latency vs. OFFSET.
+
+Run from backend/:  python -m benchmarks.bench_pagination
+"""
+import sys
+import os
+import json
+import time
+import tracemalloc
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.crud.batch_control import batch_crud
+from app.services.streaming import ndjson_lines
+from benchmarks.common import report, temporary_database
+
+N_BATCHES = 200_000
+PAGE = 100
+
+
+def peak_memory(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def run():
+    # Two events per batch: every batch is "In Transit"
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=2) as (url, _):
+        engine = create_engine(url)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            def whole_list():
+                json.dumps(jsonable_encoder(batch_crud.get_batches_by_status(db, "in transit")))
+
+            def ndjson():
+                for _ in ndjson_lines(batch_crud.iter_batches_by_status(db, "in transit")):
+                    pass
+
+            memory = {"one JSON list": peak_memory(whole_list), "NDJSON stream": peak_memory(ndjson)}
+
+            # Walk to the last page: keyset cursors vs. OFFSET
+            start = time.perf_counter()
+            cursor, pages = None, 0
+            while True:
+                page_start = time.perf_counter()
+                _, cursor = batch_crud.get_batches_by_status_page(db, "in transit", PAGE, cursor)
+                last_keyset = time.perf_counter() - page_start
+                pages += 1
+                if cursor is None:
+                    break
+            keyset_walk = time.perf_counter() - start
+
+            query = batch_crud._status_rows(db, "in transit")
+            start = time.perf_counter()
+            query.offset((pages - 1) * PAGE).limit(PAGE + 1).all()
+            last_offset = time.perf_counter() - start
+        engine.dispose()
+
+    for name, peak in memory.items():
+        report(f"listing {N_BATCHES:,} batches: {name} peak", peak, "MiB")
+    report(f"keyset: walk all {pages} pages of {PAGE}", keyset_walk * 1000, "ms")
+    report("last page: keyset cursor", last_keyset * 1000, "ms")
+    report("last page: OFFSET", last_offset * 1000, "ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,90 @@
+"""
+Point reads while a writer keeps committing tracking events: read-only CRUD
+on the primary vs routed to a read replica (a copy of the SQLite file
+stands in for one). SQLite readers wait for a writer's commit lock, the way
+primary reads compete with warehouse writes.
+
+Run from backend/:  python -m benchmarks.bench_replicas
+"""
+import sys
+import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.crud.batch_control import batch_crud
+from app.database import ReplicaRouter, RoutingSession
+from app.services.ingest import ingest_tracking_events
+from benchmarks.common import report, temporary_database
+
+N_BATCHES = 20_000
+READERS = 4
+READS_PER_READER = 500
+
+
+def run():
+    random.seed(3)
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=2) as (url, codes):
+        replica_url = url.replace("bench.db", "replica.db")
+        shutil.copy(url.replace("sqlite:///", ""), replica_url.replace("sqlite:///", ""))
+        primary = create_engine(url, pool_size=READERS + 1, connect_args={"timeout": 60})
+        router = ReplicaRouter([create_engine(replica_url, pool_size=READERS)], check_interval=3600)
+        router.refresh()
+
+        stop = threading.Event()
+
+        def writer():
+            Writer = sessionmaker(bind=primary)
+            at = datetime(2026, 1, 1)
+            while not stop.is_set():
+                with Writer() as db:
+                    ingest_tracking_events(db, [
+                        {"batch_code": random.choice(codes), "location": "Dock", "status": "In Transit",
+                         "timestamp": at + timedelta(seconds=i)} for i in range(200)
+                    ])
+                at += timedelta(minutes=10)
+
+        results = {}
+        for name, session_router in (("primary only", None), ("replica routing", router)):
+            Session = sessionmaker(bind=primary, class_=RoutingSession, router=session_router)
+            latencies = []
+
+            def reader(seed):
+                rng = random.Random(seed)
+                for _ in range(READS_PER_READER):
+                    start = time.perf_counter()
+                    with Session() as db:
+                        batch_crud.get_current_batch_location(db, rng.choice(codes))
+                    latencies.append(time.perf_counter() - start)
+
+            stop.clear()
+            background = threading.Thread(target=writer)
+            background.start()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(READERS) as pool:
+                list(pool.map(reader, range(READERS)))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            background.join()
+            latencies.sort()
+            results[name] = (READERS * READS_PER_READER / elapsed, latencies[len(latencies) // 2],
+                             latencies[int(len(latencies) * 0.99)])
+        primary.dispose()
+        for replica in router.replicas:
+            replica.dispose()
+
+    for name, (throughput, p50, p99) in results.items():
+        report(f"{name}: reads", throughput, "reads/s")
+        report(f"{name}: p50", p50 * 1000, "ms")
+        report(f"{name}: p99", p99 * 1000, "ms")
+
+
+if __name__ == "__main__":
+    run()
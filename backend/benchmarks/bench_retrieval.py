@@ -0,0 +1,55 @@
+"""
+Retrieval index: build throughput, memory-mapped load vs. rebuild, search
+latency and recall@k for questions naming a batch, over a synthetic DB.
+
+Run from backend/:  python -m benchmarks.bench_retrieval
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.services.retrieval import RetrievalIndex
+from benchmarks.common import measure, report, temporary_database
+
+N_BATCHES = 20_000
+TOP_K = 5
+
+
+def run():
+    with temporary_database(n_batches=N_BATCHES) as (url, codes), tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(url)
+        with sessionmaker(bind=engine)() as db:
+            index = RetrievalIndex()
+            start = time.perf_counter()
+            index.refresh(db)
+            build = time.perf_counter() - start
+        engine.dispose()
+        index.save(tmp)
+
+        start = time.perf_counter()
+        loaded = RetrievalIndex.load(tmp)
+        load = time.perf_counter() - start
+
+        rng = random.Random(7)
+        sample = rng.sample(range(len(codes)), 200)
+        questions = [f"anything unusual about {codes[i]} lately?" for i in sample]
+        found = sum(
+            any(doc_id == f"batch:{i + 1}" for doc_id, _, _ in loaded.search(q, TOP_K))
+            for i, q in zip(sample, questions)
+        )
+
+        report(f"retrieval: build ({len(index)} docs)", len(index) / build, "docs/s")
+        report("retrieval: rebuild from DB", build * 1000, "ms")
+        report("retrieval: mmap load", load * 1000, "ms")
+        report(f"retrieval: search top-{TOP_K}", measure(lambda: loaded.search(questions[0], TOP_K), number=20))
+        report(f"retrieval: recall@{TOP_K} (batch-code questions)", 100 * found / len(sample), "%")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,110 @@
+"""
+Charts across all batches: computed from raw batch_tracking on every request
+vs. read from the hourly/daily tracking_rollups, plus what keeping the
+rollups in step costs a write.
+
+* events: DELIVERED events per day over the whole seeded span (300k events)
+* level:  IN_TRANSIT batches per location at the end of each day (30 days);
+  from raw events that is one latest-event-per-batch query per day
+
+Run from backend/:  python -m benchmarks.bench_rollups
+"""
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import rollups
+from app.models.batch_control import BatchStatus, BatchTracking
+from app.services.charts import rollup_chart
+from benchmarks.common import report, temporary_database
+
+N_BATCHES = 100_000
+EVENTS_PER_BATCH = 3
+LEVEL_DAYS = 30
+WRITES = 5000
+
+
+def raw_events_per_day(db, start, end):
+    day = func.strftime("%Y-%m-%d", BatchTracking.timestamp)
+    return db.query(day, func.count()).filter(
+        BatchTracking.status == BatchStatus.DELIVERED,
+        BatchTracking.timestamp >= start, BatchTracking.timestamp < end
+    ).group_by(day).all()
+
+
+def raw_levels_per_day(db, start, days):
+    series = []
+    for offset in range(days):
+        at = start + timedelta(days=offset + 1)
+        rank = func.row_number().over(
+            partition_by=BatchTracking.batch_id, order_by=(BatchTracking.timestamp.desc(), BatchTracking.id.desc())
+        ).label("rank")
+        latest = db.query(BatchTracking.location, BatchTracking.status, rank) \
+            .filter(BatchTracking.timestamp < at).subquery()
+        series.append(db.query(latest.c.location, func.count())
+                      .filter(latest.c.rank == 1, latest.c.status == BatchStatus.IN_TRANSIT.name)
+                      .group_by(latest.c.location).all())
+    return series
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def write_events(Session_, hooks: bool) -> float:
+    if not hooks:
+        event.remove(Session, "after_flush", rollups._roll_up_flushed_events)
+    try:
+        with Session_() as db:
+            start = time.perf_counter()
+            db.add_all([
+                BatchTracking(batch_id=1 + i % N_BATCHES, location="Warehouse Z", status=BatchStatus.DELIVERED,
+                              timestamp=datetime(2026, 1, 1) + timedelta(seconds=i))
+                for i in range(WRITES)
+            ])
+            db.commit()
+            return (time.perf_counter() - start) * 1000
+    finally:
+        if not hooks:
+            event.listen(Session, "after_flush", rollups._roll_up_flushed_events, insert=True)
+
+
+def run():
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=EVENTS_PER_BATCH) as (url, _):
+        engine = create_engine(url)
+        Session_ = sessionmaker(bind=engine)
+        with Session_() as db:
+            start = db.query(func.min(BatchTracking.timestamp)).scalar().replace(hour=0, minute=0, second=0)
+            end = db.query(func.max(BatchTracking.timestamp)).scalar() + timedelta(days=1)
+            level_start = end - timedelta(days=LEVEL_DAYS)
+            days = (end - start).days
+            timings = {
+                f"events/day, {days} days: raw": timed(lambda: raw_events_per_day(db, start, end)),
+                f"events/day, {days} days: rollups": timed(lambda: rollup_chart(
+                    db, "events", "delivered", start, end, "day")),
+                f"in transit/location, {LEVEL_DAYS} days: raw": timed(
+                    lambda: raw_levels_per_day(db, level_start, LEVEL_DAYS)),
+                f"in transit/location, {LEVEL_DAYS} days: rollups": timed(lambda: rollup_chart(
+                    db, "level", "in transit", level_start, end, "day", by_location=True)),
+                f"events/hour, {days} days -> 500 points: rollups": timed(lambda: rollup_chart(
+                    db, "events", None, start, end, "hour", max_points=500)),
+            }
+        without = write_events(Session_, hooks=False)
+        with_hooks = write_events(Session_, hooks=True)
+        engine.dispose()
+
+    for name, ms in timings.items():
+        report(name, ms, "ms")
+    report(f"write {WRITES} events: without rollup hook", without, "ms")
+    report(f"write {WRITES} events: with rollup hook", with_hooks, "ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,89 @@
+"""
+Status-board burst: many concurrent identical /chat queries, with and without
+single-flight coalescing. Reports throughput, SQL statements and LLM calls.
+
+Run from backend/:  python -m benchmarks.bench_singleflight
+"""
+import sys
+import os
+import asyncio
+import contextlib
+import io
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import async_database_url, get_async_db
+from app.main import app
+from app.services.cache import SemanticResponseCache
+from app.services.fake_llm import FakeLLM
+from app.services.rag_pipeline import rag_pipeline
+from app.services.singleflight import SingleFlight
+from benchmarks.common import report, temporary_database
+
+CONCURRENCY = 100
+LLM_LATENCY = 0.2
+
+
+class NoFlight(SingleFlight):
+    """Baseline: every caller executes."""
+
+    def do(self, key, fn):
+        return fn()
+
+    async def ado(self, key, fn):
+        return await fn()
+
+
+async def burst(url: str, query: str):
+    async_engine = create_async_engine(async_database_url(url))
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+    statements = 0
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    async def override_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_db
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                responses = await asyncio.gather(*(client.post("/chat", json={"query": query}) for _ in range(CONCURRENCY)))
+            elapsed = time.perf_counter() - start
+        assert len({r.text for r in responses}) == 1
+        return elapsed, statements
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        await async_engine.dispose()
+
+
+def run():
+    original = (rag_pipeline.llm, rag_pipeline.response_cache, rag_pipeline.retrieval_flight, rag_pipeline.llm_flight)
+    try:
+        with temporary_database(n_batches=200) as (url, codes):
+            for kind, query in (("location", f"Where is batch {codes[7]}?"),
+                                ("by status", "list batches in transit"),
+                                ("llm", "write a short poem for the night shift")):
+                for name, flight in (("no coalescing", NoFlight), ("single-flight", SingleFlight)):
+                    rag_pipeline.llm = FakeLLM(latency=LLM_LATENCY)
+                    rag_pipeline.response_cache = SemanticResponseCache(max_entries=0)
+                    rag_pipeline.retrieval_flight, rag_pipeline.llm_flight = flight(), flight()
+                    elapsed, statements = asyncio.run(burst(url, query))
+                    merged = rag_pipeline.retrieval_flight.merged + rag_pipeline.llm_flight.merged
+                    report(f"{kind} x{CONCURRENCY}, {name}: throughput", CONCURRENCY / elapsed, "req/s")
+                    report(f"{kind} x{CONCURRENCY}, {name}: SQL / LLM calls", statements, f"stmts, {rag_pipeline.llm.calls} llm, {merged} merged")
+    finally:
+        rag_pipeline.llm, rag_pipeline.response_cache, rag_pipeline.retrieval_flight, rag_pipeline.llm_flight = original
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,59 @@
+"""
+Batch statistics over a seeded database: the single aggregated statement
+against one query per figure (total, each status, per product, expiry),
+and a cache hit once computed.
+
+Run from backend/:  python -m benchmarks.bench_statistics
+"""
+import sys
+import os
+import time
+from datetime import date, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.crud.batch_control import batch_crud
+from app.models.batch_control import Batch, BatchCurrentState, BatchStatus, Product
+from app.services.statistics import BatchStatistics
+from benchmarks.common import measure, report, temporary_database
+
+N_BATCHES = 200_000
+
+
+def per_figure_queries(db, days: int = 30) -> dict:
+    today = date.today()
+    return {
+        "total_batches": db.query(func.count(Batch.id)).scalar(),
+        "status_counts": {
+            status.value: db.query(func.count(BatchCurrentState.batch_id))
+            .filter(BatchCurrentState.status == status).scalar()
+            for status in BatchStatus
+        },
+        "products": db.query(Product.name, func.count(Batch.id), func.sum(Batch.quantity))
+        .join(Batch, Batch.product_id == Product.id).group_by(Product.name).all(),
+        "expiring_soon": db.query(func.count(Batch.id))
+        .filter(Batch.expiry_date.between(today, today + timedelta(days=days))).scalar(),
+        "expired": db.query(func.count(Batch.id)).filter(Batch.expiry_date < today).scalar(),
+    }
+
+
+def run():
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=2) as (url, _):
+        engine = create_engine(url)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            statistics = BatchStatistics()
+            aggregated = measure(lambda: batch_crud.get_batch_statistics(db), repeat=3, number=1)
+            per_figure = measure(lambda: per_figure_queries(db), repeat=3, number=1)
+            statistics.get(db)
+            cached = measure(lambda: statistics.get(db), number=10_000)
+        engine.dispose()
+
+    report(f"statistics over {N_BATCHES:,} batches: one statement", aggregated / 1000, "ms")
+    report(f"statistics over {N_BATCHES:,} batches: query per figure", per_figure / 1000, "ms")
+    report("statistics: cache hit", cached)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,131 @@
+"""
+Status listing over a large synthetic dataset: the old ORM-entity query
+(full Batch/BatchTracking objects, product and handler lazy-loaded per row),
+the same columns projected over a latest-event GROUP BY subquery, and
+BatchCRUD.get_batches_by_status reading the batch_current_state table.
+
+Run from backend/:  python -m benchmarks.bench_status_listing
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import and_, create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+
+from app.crud.batch_control import batch_crud
+from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+from app.models.common import Employee
+from benchmarks.common import report, temporary_database
+
+N_BATCHES = 20_000
+LOOKUPS = 1000
+
+
+def legacy_batches_by_status(db, status):
+    subquery = db.query(BatchTracking.batch_id, func.max(BatchTracking.timestamp).label('max_time')) \
+        .group_by(BatchTracking.batch_id).subquery()
+    results = db.query(Batch, BatchTracking) \
+        .join(BatchTracking, Batch.id == BatchTracking.batch_id) \
+        .join(subquery, and_(
+            BatchTracking.batch_id == subquery.c.batch_id,
+            BatchTracking.timestamp == subquery.c.max_time
+        )) \
+        .filter(BatchTracking.status == status) \
+        .all()
+    return [
+        {
+            "batch_code": batch.batch_code,
+            "product_name": batch.product.name,
+            "location": tracking.location,
+            "status": tracking.status.value,
+            "handler": tracking.handler.name if tracking.handler else None
+        }
+        for batch, tracking in results
+    ]
+
+
+def groupby_batches_by_status(db, status):
+    subquery = db.query(BatchTracking.batch_id, func.max(BatchTracking.timestamp).label('max_time')) \
+        .group_by(BatchTracking.batch_id).subquery()
+    rows = db.query(Batch.batch_code, Product.name, BatchTracking.location, BatchTracking.status, Employee.name) \
+        .join(BatchTracking, Batch.id == BatchTracking.batch_id) \
+        .join(subquery, and_(
+            BatchTracking.batch_id == subquery.c.batch_id,
+            BatchTracking.timestamp == subquery.c.max_time
+        )) \
+        .outerjoin(Product, Product.id == Batch.product_id) \
+        .outerjoin(Employee, Employee.id == BatchTracking.handled_by) \
+        .filter(BatchTracking.status == status) \
+        .yield_per(1000)
+    return [
+        {"batch_code": code, "product_name": product, "location": location,
+         "status": tracking_status.value, "handler": handler}
+        for code, product, location, tracking_status, handler in rows
+    ]
+
+
+def legacy_current_location(db, code):
+    batch = db.query(Batch).filter(Batch.batch_code == code).first()
+    latest = db.query(BatchTracking).filter(BatchTracking.batch_id == batch.id) \
+        .order_by(BatchTracking.timestamp.desc()).first()
+    return latest.location, latest.handler.name if latest.handler else None
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run():
+    # Two events per batch: every batch's latest status is "In Transit"
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=2) as (url, codes):
+        engine = create_engine(url)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        Session = sessionmaker(bind=engine)
+        results = {}
+        for name, listing in (("ORM entities", lambda db: legacy_batches_by_status(db, BatchStatus.IN_TRANSIT)),
+                              ("GROUP BY projection", lambda db: groupby_batches_by_status(db, BatchStatus.IN_TRANSIT)),
+                              ("current-state table", lambda db: batch_crud.get_batches_by_status(db, "in transit"))):
+            best = float("inf")
+            for _ in range(3):
+                with Session() as db:
+                    statements.clear()
+                    start = time.perf_counter()
+                    rows = listing(db)
+                    best = min(best, time.perf_counter() - start)
+            results[name] = (best, len(statements), rows)
+
+        # Point lookups, and a listing that matches nothing (pure lookup cost)
+        sample = codes[::N_BATCHES // LOOKUPS]
+        with Session() as db:
+            lookups = {
+                "two queries + lazy handler": best_of(lambda: [legacy_current_location(db, c) for c in sample]),
+                "current-state join": best_of(lambda: [batch_crud.get_current_batch_location(db, c) for c in sample]),
+            }
+            empty = {
+                "GROUP BY projection": best_of(lambda: groupby_batches_by_status(db, BatchStatus.DELIVERED)),
+                "current-state table": best_of(lambda: batch_crud.get_batches_by_status(db, "delivered")),
+            }
+        engine.dispose()
+
+    listings = [sorted(r["batch_code"] for r in rows) for _, _, rows in results.values()]
+    assert all(listing == listings[0] for listing in listings)
+    for name, (elapsed, count, rows) in results.items():
+        report(f"status listing ({len(rows)} rows): {name}", elapsed * 1000, "ms")
+        report(f"status listing: {name} SQL", count, "stmts")
+    for name, elapsed in lookups.items():
+        report(f"current location x{LOOKUPS}: {name}", elapsed * 1000, "ms")
+    for name, elapsed in empty.items():
+        report(f"empty status listing: {name}", elapsed * 1000, "ms")
+    report("status listing: speedup", results["ORM entities"][0] / results["current-state table"][0], "x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,88 @@
+"""
+Single tracking-event writes from many concurrent scanners: a session and
+commit per event (get_db + ORM commit) vs the write-behind queue behind
+/tracking/events, which acknowledges each event and writes them in group
+commits. Throughput counts until every event is committed.
+
+Run from backend/:  python -m benchmarks.bench_write_behind
+"""
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.batch_control import BatchStatus, BatchTracking
+from app.services.write_behind import TrackingWriteBehind, WRITE_BEHIND_COMMIT_SECONDS, WRITE_BEHIND_GROUP_SIZE
+from benchmarks.common import report, temporary_database
+
+N_BATCHES = 1000
+SCANNERS = 16
+EVENTS_PER_SCANNER = 250
+
+
+def scanner_events(codes, scanner, start):
+    return [
+        {"batch_code": codes[(scanner * EVENTS_PER_SCANNER + i) % len(codes)], "location": "Dock",
+         "status": "In Transit", "timestamp": start + timedelta(seconds=scanner * EVENTS_PER_SCANNER + i)}
+        for i in range(EVENTS_PER_SCANNER)
+    ]
+
+
+def run():
+    total = SCANNERS * EVENTS_PER_SCANNER
+    with temporary_database(n_batches=N_BATCHES, events_per_batch=1) as (url, codes):
+        # SQLite serialises writers; wait for the lock instead of failing
+        engine = create_engine(url, pool_size=SCANNERS, connect_args={"timeout": 60})
+        Session = sessionmaker(bind=engine)
+        ids = {code: i + 1 for i, code in enumerate(codes)}
+        commit_latencies = []
+
+        def commit_each(scanner):
+            for event in scanner_events(codes, scanner, datetime(2026, 1, 1)):
+                start = time.perf_counter()
+                with Session() as db:
+                    db.add(BatchTracking(batch_id=ids[event["batch_code"]], location=event["location"],
+                                         status=BatchStatus.IN_TRANSIT, timestamp=event["timestamp"]))
+                    db.commit()
+                commit_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(SCANNERS) as pool:
+            list(pool.map(commit_each, range(SCANNERS)))
+        per_event = total / (time.perf_counter() - start)
+
+        writer = TrackingWriteBehind(Session, max_queue=total)
+        writer.start()
+        acks = []
+
+        def submit_each(scanner):
+            for event in scanner_events(codes, scanner, datetime(2026, 2, 1)):
+                start = time.perf_counter()
+                writer.submit(event, f"{scanner}-{event['timestamp']}")
+                acks.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(SCANNERS) as pool:
+            list(pool.map(submit_each, range(SCANNERS)))
+        writer.drain()
+        write_behind = total / (time.perf_counter() - start)
+        assert writer.stats()["written"] == total
+        engine.dispose()
+
+    commit_latencies.sort()
+    acks.sort()
+    report("Commit per event: throughput", per_event, "events/s")
+    report("Commit per event: p50 request latency", commit_latencies[len(commit_latencies) // 2] * 1000, "ms")
+    report("Write-behind: throughput (until committed)", write_behind, "events/s")
+    report("Write-behind: p50 acknowledgement", acks[len(acks) // 2] * 1000, "ms")
+    report("Write-behind: p50 group commit", WRITE_BEHIND_COMMIT_SECONDS.quantile(0.5) * 1000, "ms")
+    report("Write-behind: group commits", WRITE_BEHIND_GROUP_SIZE.count(), "groups")
+
+
+if __name__ == "__main__":
+    run()
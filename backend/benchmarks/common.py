@@ -0,0 +1,132 @@
+import contextlib
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, List, Optional, Tuple
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, number: int = 1000) -> float:
+    """Return the best per-call time in microseconds over ``repeat`` rounds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1_000_000
+
+
+def report(name: str, value: float, unit: str = "us") -> None:
+    print(f"{name:<48} {value:>12.2f} {unit}")
+
+
+def seed_database(db, n_batches: int = 100, events_per_batch: int = 3,
+                  start: Optional[datetime] = None) -> List[str]:
+    """
+    Fill an empty database with synthetic departments, employees, products,
+    batches and tracking events (Core bulk inserts, so millions of rows are
+    feasible). Returns the generated batch codes.
+    """
+    from sqlalchemy import insert
+    from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+    from app.models.common import Department, Employee
+
+    start = start or datetime(2025, 1, 1)
+    department_id = uuid.uuid4()
+    db.execute(insert(Department), [{"id": department_id, "name": "Warehouse Operations"}])
+    employee_ids = [uuid.uuid4() for _ in range(10)]
+    db.execute(insert(Employee), [
+        {"id": employee_id, "name": f"Employee {i}", "email": f"employee{i}@example.com",
+         "department_id": department_id, "designation": "Operator"}
+        for i, employee_id in enumerate(employee_ids)
+    ])
+    prefixes = ["VDT", "PCM", "AMX", "IBU", "ZNC"]
+    db.execute(insert(Product), [
+        {"id": i + 1, "name": f"Product {prefix}", "category": "Pharma", "unit_price": 1}
+        for i, prefix in enumerate(prefixes)
+    ])
+
+    statuses = [BatchStatus.MANUFACTURED, BatchStatus.IN_TRANSIT, BatchStatus.DELIVERED]
+    locations = ["Production Floor A", "Quality Control Lab", "Warehouse A", "Warehouse B", "Warehouse C"]
+    codes = []
+    chunk = 10_000
+    for offset in range(0, n_batches, chunk):
+        batches, events = [], []
+        for batch_id in range(offset + 1, min(offset + chunk, n_batches) + 1):
+            code = f"{prefixes[batch_id % len(prefixes)]}-{batch_id:06d}-A"
+            codes.append(code)
+            made = start + timedelta(hours=batch_id % 5000)
+            batches.append({
+                "id": batch_id, "product_id": batch_id % len(prefixes) + 1, "batch_code": code,
+                "quantity": 1000 + batch_id % 9000, "manufactured_date": made.date(),
+                "expiry_date": (made + timedelta(days=365 + batch_id % 700)).date(),
+                "created_by": employee_ids[batch_id % len(employee_ids)],
+            })
+            for step in range(events_per_batch):
+                events.append({
+                    "batch_id": batch_id,
+                    "location": locations[(batch_id + step) % len(locations)],
+                    "status": statuses[min(step, len(statuses) - 1)],
+                    "timestamp": made + timedelta(hours=12 * step),
+                    "handled_by": employee_ids[(batch_id + step) % len(employee_ids)],
+                })
+        db.execute(insert(Batch), batches)
+        if events:
+            db.execute(insert(BatchTracking), events)
+    db.commit()
+    return codes
+
+
+@contextlib.contextmanager
+def temporary_database(n_batches: int = 100, events_per_batch: int = 3) -> Iterator[Tuple[str, List[str]]]:
+    """Seeded throwaway SQLite database; yields ``(url, batch_codes)``."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from app.models import batch_control, common  # noqa: F401  (register tables)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench.db"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            codes = seed_database(db, n_batches=n_batches, events_per_batch=events_per_batch)
+        engine.dispose()
+        yield url, codes
+
+
+async def asgi_post(app, path: str, payload: dict) -> List[Tuple[float, bytes]]:
+    """
+    POST straight into an ASGI app and return ``(seconds since start, chunk)``
+    for every body chunk, so time-to-first-byte is measured without a server
+    (httpx's ASGI transport buffers the whole body).
+    """
+    import asyncio
+    import json
+    body = json.dumps(payload).encode()
+    chunks: List[Tuple[float, bytes]] = []
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("bench", 80), "client": ("bench", 1),
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Stay connected until the app finishes (StreamingResponse listens for disconnects)
+        await asyncio.Event().wait()
+
+    start = time.perf_counter()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append((time.perf_counter() - start, message["body"]))
+
+    await app(scope, receive, send)
+    return chunks
@@ -0,0 +1,41 @@
+"""
+Run every benchmark in the suite.
+
+Run from backend/:  python -m benchmarks.run_all
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks import bench_nlu, bench_intent_model, bench_chat_concurrency, bench_chat_stream, bench_singleflight, bench_retrieval, bench_metrics, bench_llm_gateway, bench_chat_batch, bench_status_listing, bench_indexes, bench_pagination, bench_statistics, bench_rollups, bench_ingest, bench_write_behind, bench_replicas, bench_expiry
+
+SUITE = [
+    ("NLU", bench_nlu.run),
+    ("Intent model", bench_intent_model.run),
+    ("Chat concurrency", bench_chat_concurrency.run),
+    ("Chat streaming", bench_chat_stream.run),
+    ("Single-flight", bench_singleflight.run),
+    ("Retrieval", bench_retrieval.run),
+    ("Metrics", bench_metrics.run),
+    ("LLM gateway", bench_llm_gateway.run),
+    ("Chat batch", bench_chat_batch.run),
+    ("Status listing", bench_status_listing.run),
+    ("Indexes", bench_indexes.run),
+    ("Pagination", bench_pagination.run),
+    ("Statistics", bench_statistics.run),
+    ("Rollups", bench_rollups.run),
+    ("Bulk ingest", bench_ingest.run),
+    ("Write-behind", bench_write_behind.run),
+    ("Read replicas", bench_replicas.run),
+    ("Expiry", bench_expiry.run),
+]
+
+
+def main():
+    for name, run in SUITE:
+        print(f"\n=== {name} ===")
+        run()
+
+
+if __name__ == "__main__":
+    main()
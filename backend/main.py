@@ -1,7 +1,15 @@
+import logging
+import time
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from explore.sql_agent import agent_executor  # Correct import
+from explore.sql_agent import agent_executor, agent_metrics  # Correct import
+from app.services.streaming import event_stream, SSE_HEADERS
+from app.services.llm_gateway import llm_gateway, LLMUnavailable, LLM_UNAVAILABLE_MESSAGE
+from app.services.metrics import registry, record_request, PROMETHEUS_CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -18,6 +26,42 @@ class ChatRequest(BaseModel):
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
-    result = agent_executor.invoke({"input": request.message})
+    # Don't start a multi-call agent run while Gemini is known to be failing
+    if llm_gateway.breaker.is_open():
+        return {"response": LLM_UNAVAILABLE_MESSAGE}
+    start = time.perf_counter()
+    try:
+        result = await agent_executor.ainvoke({"input": request.message}, config={"callbacks": [agent_metrics]})
+    except LLMUnavailable as e:
+        # A reasoning step was refused or timed out by the gateway mid-run
+        logger.warning("LLM call failed: %s", e)
+        record_request("/chat", "agent", False, time.perf_counter() - start)
+        return {"response": LLM_UNAVAILABLE_MESSAGE}
     response = result["output"].replace("```", "").strip()
+    record_request("/chat", "agent", True, time.perf_counter() - start)
     return {"response": response}
+
+
+async def agent_events(message: str):
+    # Tool calls are reported as they happen; the final answer follows.
+    try:
+        async for chunk in agent_executor.astream({"input": message}, config={"callbacks": [agent_metrics]}):
+            for action in chunk.get("actions", []):
+                yield "step", {"tool": action.tool, "input": action.tool_input}
+            if "output" in chunk:
+                yield "message", {"response": chunk["output"].replace("```", "").strip()}
+    except LLMUnavailable as e:
+        logger.warning("LLM call failed: %s", e)
+        yield "message", {"response": LLM_UNAVAILABLE_MESSAGE}
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    return StreamingResponse(
+        event_stream(agent_events(request.message)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,114 @@
+"""Baseline: the schema previously created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-06-20
+
+Databases created before migrations existed already have some or all of
+these tables; only the missing ones are created, so ``alembic upgrade head``
+adopts them in place.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+STATUSES = ("MANUFACTURED", "IN_TRANSIT", "DELIVERED")
+
+
+def batch_status():
+    return sa.Enum(*STATUSES, name="batchstatus").with_variant(
+        postgresql.ENUM(*STATUSES, name="batchstatus", create_type=False), "postgresql"
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+    if bind.dialect.name == "postgresql":
+        postgresql.ENUM(*STATUSES, name="batchstatus").create(bind, checkfirst=True)
+
+    if "departments" not in existing:
+        # head_id -> employees is added below, once employees exists
+        op.create_table(
+            "departments",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("head_id", sa.Uuid()),
+        )
+    if "employees" not in existing:
+        op.create_table(
+            "employees",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False, unique=True),
+            sa.Column("department_id", sa.Uuid(), sa.ForeignKey("departments.id")),
+            sa.Column("designation", sa.String()),
+            sa.Column("date_joined", sa.Date()),
+        )
+        if "departments" not in existing and bind.dialect.name != "sqlite":
+            op.create_foreign_key("departments_head_id_fkey", "departments", "employees", ["head_id"], ["id"])
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("category", sa.String()),
+            sa.Column("unit_price", sa.Numeric(10, 2)),
+        )
+    if "batches" not in existing:
+        op.create_table(
+            "batches",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id")),
+            sa.Column("batch_code", sa.String(), nullable=False, unique=True),
+            sa.Column("quantity", sa.Integer()),
+            sa.Column("manufactured_date", sa.Date()),
+            sa.Column("expiry_date", sa.Date()),
+            sa.Column("created_by", sa.Uuid(), sa.ForeignKey("employees.id")),
+        )
+    if "batch_tracking" not in existing:
+        op.create_table(
+            "batch_tracking",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("batch_id", sa.Integer(), sa.ForeignKey("batches.id")),
+            sa.Column("location", sa.String()),
+            sa.Column("status", batch_status()),
+            sa.Column("timestamp", sa.DateTime()),
+            sa.Column("handled_by", sa.Uuid(), sa.ForeignKey("employees.id")),
+        )
+    if "tracking_info" not in existing:
+        op.create_table(
+            "tracking_info",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("batch_id", sa.Integer(), sa.ForeignKey("batches.id")),
+            sa.Column("status", batch_status(), nullable=False),
+            sa.Column("location", sa.String(), nullable=False),
+            sa.Column("timestamp", sa.DateTime()),
+        )
+    if "batch_current_state" not in existing:
+        op.create_table(
+            "batch_current_state",
+            sa.Column("batch_id", sa.Integer(), sa.ForeignKey("batches.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("tracking_id", sa.Integer(), nullable=False),
+            sa.Column("location", sa.String()),
+            sa.Column("status", batch_status()),
+            sa.Column("timestamp", sa.DateTime()),
+            sa.Column("handled_by", sa.Uuid(), sa.ForeignKey("employees.id")),
+        )
+        op.create_index("ix_batch_current_state_status", "batch_current_state", ["status"])
+
+
+def downgrade():
+    for table in ("batch_current_state", "tracking_info", "batch_tracking", "batches", "products"):
+        op.drop_table(table)
+    if op.get_bind().dialect.name != "sqlite":
+        op.drop_constraint("departments_head_id_fkey", "departments", type_="foreignkey")
+    op.drop_table("employees")
+    op.drop_table("departments")
+    if op.get_bind().dialect.name == "postgresql":
+        postgresql.ENUM(name="batchstatus").drop(op.get_bind(), checkfirst=True)
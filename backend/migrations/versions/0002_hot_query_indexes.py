@@ -0,0 +1,48 @@
+"""Indexes for the hot batch_tracking / tracking_info queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-06-20
+
+* batch_tracking(batch_id, timestamp DESC): latest event / trail per batch
+* batch_tracking(status): status filters and counts
+* tracking_info(batch_id, timestamp): per-batch history ordered by time
+
+On PostgreSQL the indexes are built CONCURRENTLY, so writers are not
+blocked while a large batch_tracking table is indexed.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_batch_tracking_batch_id_timestamp", "batch_tracking", ["batch_id", sa.text("timestamp DESC")]),
+    ("ix_batch_tracking_status", "batch_tracking", ["status"]),
+    ("ix_tracking_info_batch_id_timestamp", "tracking_info", ["batch_id", "timestamp"]),
+)
+
+
+def _existing(table):
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    concurrently = op.get_bind().dialect.name == "postgresql"
+    for name, table, columns in INDEXES:
+        if name in _existing(table):
+            continue
+        if concurrently:
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+        else:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in INDEXES:
+        if name in _existing(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,40 @@
+"""Hourly / daily tracking rollups behind the chart API
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-07-02
+
+The table starts empty; the API backfills it on startup (or run
+``python -m app.scripts.rebuild_rollups``) and session hooks keep it in
+step with batch_tracking from then on.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+STATUSES = ("MANUFACTURED", "IN_TRANSIT", "DELIVERED")
+
+
+def upgrade():
+    if "tracking_rollups" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "tracking_rollups",
+        sa.Column("granularity", sa.String(8), primary_key=True),
+        sa.Column("bucket", sa.DateTime(), primary_key=True),
+        sa.Column("status", sa.Enum(*STATUSES, name="batchstatus").with_variant(
+            postgresql.ENUM(*STATUSES, name="batchstatus", create_type=False), "postgresql"
+        ), primary_key=True),
+        sa.Column("location", sa.String(), primary_key=True),
+        sa.Column("events", sa.Integer(), nullable=False),
+        sa.Column("net", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("tracking_rollups")
@@ -0,0 +1,146 @@
+"""batch_tracking becomes the single tracking event store, partitioned by month
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-07-10
+
+* PostgreSQL: batch_tracking is rebuilt as a table range-partitioned on
+  ``timestamp``, with one partition per month of existing data plus the
+  next few months and a default partition for anything else (including
+  rows without a timestamp). The API creates upcoming months on startup.
+  Ids keep their sequence; indexes are created on the parent and
+  inherited by every partition.
+* Everywhere: batch_tracking(timestamp), for time-bounded history and
+  rollup refreshes (on SQLite it stands in for partition pruning).
+
+tracking_info is left in place: ``python -m app.scripts.merge_tracking_events``
+copies its rows into batch_tracking, rebuilds the current state and
+rollups, and drops it.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Frozen copies of app.models.event_store as of this revision
+TABLE = "batch_tracking"
+DEFAULT_PARTITION = f"{TABLE}_default"
+COLUMNS = "id, batch_id, location, status, timestamp, handled_by"
+MONTHS_AHEAD = 3
+
+INDEXES = (
+    ("ix_batch_tracking_batch_id_timestamp", "(batch_id, timestamp DESC)"),
+    ("ix_batch_tracking_status", "(status)"),
+    ("ix_batch_tracking_timestamp", "(timestamp)"),
+    # Row lookups by id (ORM updates / deletes) without a primary key on the parent
+    ("ix_batch_tracking_id", "(id)"),
+)
+
+
+def _is_partitioned(bind):
+    return bool(bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table)"
+    ), {"table": TABLE}).scalar())
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _months(start, end):
+    month, months = datetime(start.year, start.month, 1), []
+    while month <= end:
+        months.append(month)
+        month = _add_months(month, 1)
+    return months
+
+
+def _create_partitions(months):
+    """One partition per month start in ``months``; the new table is still empty, so nothing moves."""
+    for month in sorted(set(months)):
+        op.execute(
+            f"CREATE TABLE {TABLE}_y{month.year:04d}m{month.month:02d} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat(' ')}') TO ('{_add_months(month, 1).isoformat(' ')}')"
+        )
+
+
+def _swap_table(bind, create_sql, index_names):
+    """Rebuild batch_tracking from ``create_sql``, keeping rows and the id sequence."""
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": TABLE}).scalar()
+    for name in index_names:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    if sequence:
+        # Keep the sequence alive when the old table (its owner) is dropped
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_old")
+    op.execute(create_sql.format(default=f"nextval('{sequence}')" if sequence else "NULL"))
+    return sequence
+
+
+def _finish_swap(sequence):
+    op.execute(f"INSERT INTO {TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM {TABLE}_old")
+    op.execute(f"DROP TABLE {TABLE}_old")
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        existing = {index["name"] for index in sa.inspect(bind).get_indexes(TABLE)}
+        if "ix_batch_tracking_timestamp" not in existing:
+            op.create_index("ix_batch_tracking_timestamp", TABLE, ["timestamp"])
+        return
+    if _is_partitioned(bind):
+        return
+
+    sequence = _swap_table(bind, f"""
+        CREATE TABLE {TABLE} (
+            id INTEGER NOT NULL DEFAULT {{default}},
+            batch_id INTEGER REFERENCES batches (id),
+            location VARCHAR,
+            status batchstatus,
+            timestamp TIMESTAMP WITHOUT TIME ZONE,
+            handled_by UUID REFERENCES employees (id)
+        ) PARTITION BY RANGE (timestamp)
+    """, [name for name, _ in INDEXES])
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+    low, high = bind.execute(sa.text(f"SELECT min(timestamp), max(timestamp) FROM {TABLE}_old")).one()
+    now = datetime.utcnow()
+    months = _months(now, _add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD))
+    if low is not None:
+        months += _months(low, high)
+    _create_partitions(months)
+    _finish_swap(sequence)
+    for name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON {TABLE} {columns}")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.drop_index("ix_batch_tracking_timestamp", table_name=TABLE)
+        return
+    if not _is_partitioned(bind):
+        return
+
+    sequence = _swap_table(bind, f"""
+        CREATE TABLE {TABLE} (
+            id INTEGER NOT NULL DEFAULT {{default}} PRIMARY KEY,
+            batch_id INTEGER REFERENCES batches (id),
+            location VARCHAR,
+            status batchstatus,
+            timestamp TIMESTAMP WITHOUT TIME ZONE,
+            handled_by UUID REFERENCES employees (id)
+        )
+    """, [name for name, _ in INDEXES])
+    _finish_swap(sequence)
+    for name, columns in INDEXES[:2]:
+        op.execute(f"CREATE INDEX {name} ON {TABLE} {columns}")
@@ -0,0 +1,38 @@
+"""Index on batches(expiry_date) for expiry range queries
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-07-24
+
+Backs the expiry calendar's horizon load and "expiring soon" queries past
+it. On PostgreSQL the index is built CONCURRENTLY, so batch writes are not
+blocked.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_batches_expiry_date"
+
+
+def _exists():
+    return INDEX in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("batches")}
+
+
+def upgrade():
+    if _exists():
+        return
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(INDEX, "batches", ["expiry_date"], postgresql_concurrently=True)
+    else:
+        op.create_index(INDEX, "batches", ["expiry_date"])
+
+
+def downgrade():
+    if _exists():
+        op.drop_index(INDEX, table_name="batches")
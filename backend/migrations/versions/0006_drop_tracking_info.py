@@ -0,0 +1,60 @@
+"""Drop the legacy tracking_info table
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-07-28
+
+batch_tracking is the only tracking event store since 0004. tracking_info
+(and ix_tracking_info_batch_id_timestamp) is dropped here once every row
+of it is also in batch_tracking. If some are not, the upgrade stops:
+run ``python -m app.scripts.merge_tracking_events`` (which migrates up to
+0005, copies them over and rebuilds the derived tables), then upgrade
+again.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+TABLE = "tracking_info"
+INDEX = "ix_tracking_info_batch_id_timestamp"
+STATUSES = ("MANUFACTURED", "IN_TRANSIT", "DELIVERED")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if TABLE not in sa.inspect(bind).get_table_names():
+        return
+    unmerged = bind.execute(sa.text(
+        f"SELECT count(*) FROM {TABLE} t WHERE NOT EXISTS ("
+        "SELECT 1 FROM batch_tracking b WHERE b.status = t.status AND b.location = t.location "
+        "AND (b.batch_id = t.batch_id OR (b.batch_id IS NULL AND t.batch_id IS NULL)) "
+        "AND (b.timestamp = t.timestamp OR (b.timestamp IS NULL AND t.timestamp IS NULL)))"
+    )).scalar()
+    if unmerged:
+        raise RuntimeError(
+            f"{TABLE} still has {unmerged} rows that are not in batch_tracking; "
+            "run `python -m app.scripts.merge_tracking_events` first"
+        )
+    op.drop_table(TABLE)
+
+
+def downgrade():
+    if TABLE in sa.inspect(op.get_bind()).get_table_names():
+        return
+    status = sa.Enum(*STATUSES, name="batchstatus").with_variant(
+        postgresql.ENUM(*STATUSES, name="batchstatus", create_type=False), "postgresql"
+    )
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("batch_id", sa.Integer(), sa.ForeignKey("batches.id")),
+        sa.Column("status", status, nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column("timestamp", sa.DateTime()),
+    )
+    op.create_index(INDEX, TABLE, ["batch_id", "timestamp"])
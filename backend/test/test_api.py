@@ -0,0 +1,139 @@
+
+def test_metrics_endpoint_reports_chat_stages():
+    import asyncio
+    import httpx
+    from app.main import app
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            chat = await client.post("/chat", json={"query": "hello"})
+            return chat, await client.get("/metrics")
+
+    chat, metrics = asyncio.run(scenario())
+    assert chat.json()["intent"] == "greeting"
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'chatbot_stage_seconds_count{stage="nlu",intent="greeting"}' in metrics.text
+    assert 'chatbot_requests_total{endpoint="/chat",intent="greeting",success="true"}' in metrics.text
+    assert 'chatbot_component_stat{component="nlu_cache",stat="hits"}' in metrics.text
+
+
+def test_status_listing_pages_and_streams_ndjson():
+    import asyncio
+    import json
+    from datetime import date, datetime
+    import httpx
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base, get_db
+    from app.main import app
+    from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(Product(id=1, name="Paracetamol"))
+        for i in range(1, 6):
+            db.add(Batch(id=i, product_id=1, batch_code=f"PCM-20250{i}-A", manufactured_date=date(2025, 1, 1)))
+            db.add(BatchTracking(batch_id=i, location="Dock", status=BatchStatus.DELIVERED,
+                                 timestamp=datetime(2025, 1, i)))
+        db.commit()
+
+    def override_db():
+        with Session() as db:
+            yield db
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = (await client.get("/batches/status/delivered", params={"limit": 3})).json()
+            second = (await client.get("/batches/status/delivered",
+                                       params={"limit": 3, "cursor": first["next_cursor"]})).json()
+            stream = await client.get("/batches/status/delivered", params={"format": "ndjson"})
+            bad = await client.get("/batches/status/delivered", params={"cursor": "nope"})
+            return first, second, stream, bad
+
+    app.dependency_overrides[get_db] = override_db
+    try:
+        first, second, stream, bad = asyncio.run(scenario())
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+    codes = [f"PCM-20250{i}-A" for i in range(1, 6)]
+    assert [b["batch_code"] for b in first["items"] + second["items"]] == codes
+    assert second["next_cursor"] is None
+    assert stream.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["batch_code"] for line in stream.text.splitlines()] == codes
+    assert bad.status_code == 400
+
+
+def test_bulk_tracking_ingest_endpoint():
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base, get_db
+    from app.main import app
+    from app.models.batch_control import Batch
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(Batch(id=1, batch_code="PCM-202501-A"))
+        db.commit()
+
+    def override_db():
+        with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_db
+    try:
+        response = TestClient(app).post("/tracking/bulk", json={"events": [
+            {"batch_code": "PCM-202501-A", "location": "Dock", "status": "In Transit"},
+            {"batch_code": "PCM-202501-A", "status": "Delivered"},
+        ]})
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["inserted"], body["failed"]) == (1, 1)
+    assert body["errors"][0]["index"] == 1 and "location" in body["errors"][0]["error"]
+
+
+def test_agent_endpoints_run_the_agent_asynchronously(monkeypatch):
+    import asyncio
+    import json
+    import httpx
+    from langchain_community.chat_models.fake import FakeListChatModel
+
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    import main
+    from explore import sql_agent
+
+    # The agent's reasoning steps (through the gateway wrapper), then what the GeneralChat tool answers
+    monkeypatch.setattr(sql_agent.gateway_llm, "model", FakeListChatModel(responses=[
+        "Thought: Do I need to use a tool? Yes\nAction: GeneralChat\nAction Input: hello",
+        "Thought: Do I need to use a tool? No\nAI: Hi there!",
+    ]))
+    monkeypatch.setattr(sql_agent, "llm", FakeListChatModel(responses=["Hello!"]))
+    sql_agent.memory.clear()
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            stream = await client.post("/chat/stream", json={"message": "hello"})
+            return stream, await client.post("/chat", json={"message": "hello again"})
+
+    response, chat = asyncio.run(scenario())
+    sql_agent.memory.clear()
+    frames = [frame.split("\n") for frame in response.text.strip().split("\n\n")]
+    events = [(event[len("event: "):], json.loads(data[len("data: "):])) for event, data in frames]
+    assert events == [
+        ("step", {"tool": "GeneralChat", "input": "hello"}),
+        ("message", {"response": "Hi there!"}),
+        ("done", {}),
+    ]
+    assert chat.json() == {"response": "Hi there!"}
@@ -0,0 +1,441 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import common  # noqa: F401  (registers employees/departments)
+from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+from app.models.common import Employee
+from app.crud.batch_control import batch_crud
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    handler = Employee(name="Asha", email="asha@example.com")
+    session.add_all([handler, Product(id=1, name="Paracetamol", category="Pharma", unit_price=1)])
+    session.flush()
+    start = datetime(2025, 1, 1)
+    for batch_id in (1, 2, 3):
+        session.add(Batch(id=batch_id, product_id=1, batch_code=f"PCM-20250{batch_id}-A", quantity=10 * batch_id,
+                          manufactured_date=date(2025, 1, 1), expiry_date=date(2026, 1, 1)))
+        for step, status in enumerate([BatchStatus.MANUFACTURED, BatchStatus.IN_TRANSIT][:batch_id]):
+            session.add(BatchTracking(batch_id=batch_id, location=f"Site {batch_id}.{step}", status=status,
+                                      timestamp=start + timedelta(days=step), handled_by=handler.id))
+    session.commit()
+    session.expunge_all()
+
+    session.statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: session.statements.append(args[2]))
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_current_location_is_one_round_trip(db):
+    location = batch_crud.get_current_batch_location(db, "PCM-202502-A")
+    assert location == {
+        "batch_code": "PCM-202502-A",
+        "location": "Site 2.1",
+        "status": "In Transit",
+        "timestamp": datetime(2025, 1, 2),
+        "handler": "Asha",
+    }
+    assert batch_crud.get_current_batch_location(db, "PCM-999999-A") is None
+    assert len(db.statements) == 2
+
+
+def test_batch_overview_is_one_round_trip(db):
+    batch, current = batch_crud.get_batch_overview(db, "PCM-202501-A")
+    assert (batch.product.name, batch.quantity) == ("Paracetamol", 10)
+    assert current["location"] == "Site 1.0"
+    assert len(db.statements) == 1
+
+
+def test_current_locations_match_single_lookups_in_one_round_trip(db):
+    codes = ["PCM-202501-A", "PCM-202502-A", "PCM-202503-A", "PCM-999999-A"]
+    locations = batch_crud.get_current_locations(db, codes)
+    assert len(db.statements) == 1
+    assert set(locations) == set(codes[:3])
+    for code in codes[:3]:
+        assert locations[code] == batch_crud.get_current_batch_location(db, code)
+
+
+def test_batches_by_status_projects_columns_without_lazy_loads(db):
+    listed = batch_crud.get_batches_by_status(db, "in transit")
+    assert listed == [{
+        "batch_code": code,
+        "product_name": "Paracetamol",
+        "location": location,
+        "status": "In Transit",
+        "handler": "Asha",
+    } for code, location in [("PCM-202502-A", "Site 2.1"), ("PCM-202503-A", "Site 3.1")]]
+    assert [b["batch_code"] for b in batch_crud.get_batches_by_status(db, "MANUFACTURED")] == ["PCM-202501-A"]
+    assert batch_crud.get_batches_by_status(db, "lost") == []
+    assert len(db.statements) == 2
+
+
+def test_current_state_follows_tracking_writes(db):
+    from sqlalchemy import insert
+    from app.models.batch_control import BatchCurrentState
+    from app.models.current_state import rebuild_current_state
+
+    def state(batch_id=1):
+        row = db.get(BatchCurrentState, batch_id, populate_existing=True)
+        return row.location if row else None
+
+    late = BatchTracking(batch_id=1, location="Dock", status=BatchStatus.IN_TRANSIT, timestamp=datetime(2025, 2, 1))
+    db.add(late)
+    db.commit()
+    assert state() == "Dock"
+
+    # Back-dated events do not move the current state backwards
+    db.add(BatchTracking(batch_id=1, location="Archive", status=BatchStatus.MANUFACTURED,
+                         timestamp=datetime(2024, 12, 1)))
+    db.commit()
+    assert state() == "Dock"
+
+    db.delete(late)
+    db.commit()
+    assert state() == "Site 1.0"
+
+    # Bulk inserts use the forward-only upsert too, never re-ranking the batch's history
+    db.statements.clear()
+    db.execute(insert(BatchTracking), [
+        {"batch_id": 1, "location": "Pharmacy", "status": BatchStatus.DELIVERED, "timestamp": datetime(2025, 3, 1)},
+        {"batch_id": 1, "location": "Cellar", "status": BatchStatus.MANUFACTURED, "timestamp": datetime(2024, 11, 1)},
+    ])
+    db.commit()
+    assert not any("row_number" in statement for statement in db.statements)
+    assert batch_crud.get_current_batch_location(db, "PCM-202501-A")["location"] == "Pharmacy"
+    assert [b["batch_code"] for b in batch_crud.get_batches_by_status(db, "delivered")] == ["PCM-202501-A"]
+
+    db.query(BatchCurrentState).delete()
+    db.commit()
+    assert rebuild_current_state(db) == 3
+    assert state() == "Pharmacy"
+
+
+def test_keyset_pages_cover_listing_and_history_once(db):
+    from app.services.pagination import InvalidCursor
+
+    pages, cursor = [], None
+    while True:
+        items, cursor = batch_crud.get_batches_by_status_page(db, "In Transit", 1, cursor)
+        pages.append([item["batch_code"] for item in items])
+        if cursor is None:
+            break
+    assert pages == [["PCM-202502-A"], ["PCM-202503-A"]]
+
+    # Same-timestamp events are ordered (and split across pages) by id
+    db.add(Batch(id=4, product_id=1, batch_code="PCM-202504-A"))
+    db.add_all([BatchTracking(batch_id=4, status=BatchStatus.IN_TRANSIT, location=f"Stop {i}",
+                              timestamp=datetime(2025, 1, 1 + i // 2)) for i in range(5)])
+    db.commit()
+    first, cursor = batch_crud.get_batch_tracking_page(db, 4, 2)
+    second, cursor = batch_crud.get_batch_tracking_page(db, 4, 2, cursor)
+    third, cursor = batch_crud.get_batch_tracking_page(db, 4, 2, cursor)
+    assert [r.location for r in first + second + third] == [f"Stop {i}" for i in range(5)]
+    assert cursor is None
+    assert [r.location for r in batch_crud.iter_batch_tracking(db, 4, chunk_size=2)] == [f"Stop {i}" for i in range(5)]
+    # Time-bounded reads (partition pruning on PostgreSQL)
+    bounded = batch_crud.get_batch_tracking(db, 4, start=datetime(2025, 1, 2), end=datetime(2025, 1, 3))
+    assert [r.location for r in bounded] == ["Stop 2", "Stop 3"]
+
+    with pytest.raises(InvalidCursor):
+        batch_crud.get_batch_tracking_page(db, 2, 2, batch_crud.history_cursor(first[-1]))
+    with pytest.raises(InvalidCursor):
+        batch_crud.get_batches_by_status_page(db, "delivered", 2, "not-a-cursor")
+
+
+def test_history_pages_keep_undated_events(db):
+    db.add(Batch(id=5, product_id=1, batch_code="PCM-202505-A"))
+    db.add_all([BatchTracking(batch_id=5, status=BatchStatus.IN_TRANSIT, location=f"L{i}",
+                              timestamp=None if i < 3 else datetime(2025, 1, i)) for i in range(6)])
+    db.commit()
+    for limit in (1, 2, 3, 4):
+        locations, cursor = [], None
+        while True:
+            page, cursor = batch_crud.get_batch_tracking_page(db, 5, limit, cursor)
+            locations += [r.location for r in page]
+            if cursor is None:
+                break
+        assert locations == [f"L{i}" for i in range(6)]
+    assert [r.location for r in batch_crud.iter_batch_tracking(db, 5, chunk_size=2)] == locations
+
+
+def test_batch_statistics_in_one_statement(db):
+    db.add(Batch(id=4, product_id=None, batch_code="PCM-202504-A", quantity=5, expiry_date=date(2025, 6, 10)))
+    db.commit()
+    db.statements.clear()
+
+    stats = batch_crud.get_batch_statistics(db, expiring_within_days=30, today=date(2025, 12, 15))
+    assert len(db.statements) == 1
+    assert stats["total_batches"] == 4
+    assert stats["total_quantity"] == 65
+    assert stats["status_counts"] == {"Manufactured": 1, "In Transit": 2, "Delivered": 0, "Untracked": 1}
+    assert stats["active_batches"] == 3
+    assert (stats["expiring_soon"], stats["expired"]) == (3, 1)
+    assert [(p["product_name"], p["batches"], p["quantity"]) for p in stats["products"]] == [
+        ("Paracetamol", 3, 60), ("Unassigned", 1, 5)
+    ]
+
+
+def test_statistics_cache_is_invalidated_by_committed_tracking_events(db):
+    from app.services.statistics import batch_statistics
+
+    batch_statistics.invalidate()
+    computed = batch_statistics.computations
+    assert batch_statistics.get(db)["status_counts"]["Delivered"] == 0
+    batch_statistics.get(db)
+    assert batch_statistics.computations == computed + 1
+
+    db.add(BatchTracking(batch_id=3, location="Pharmacy", status=BatchStatus.DELIVERED,
+                         timestamp=datetime(2025, 1, 5)))
+    db.flush()
+    assert batch_statistics.get(db)["status_counts"]["Delivered"] == 0  # not committed yet
+    db.commit()
+    assert batch_statistics.get(db)["status_counts"]["Delivered"] == 1
+    assert batch_statistics.computations == computed + 2
+
+
+def rollup_rows(db):
+    from app.models.batch_control import TrackingRollup
+    return sorted(
+        (r.granularity, r.bucket, r.status.name, r.location, r.events, r.net)
+        for r in db.query(TrackingRollup) if r.events or r.net
+    )
+
+
+def test_rollups_follow_tracking_writes(db):
+    from sqlalchemy import insert
+    from app.models.rollups import rebuild_rollups
+
+    # In order, back-dated, moved, deleted, then ORM bulk inserts in and out of order
+    db.add(BatchTracking(batch_id=2, location="Pharmacy", status=BatchStatus.DELIVERED, timestamp=datetime(2025, 1, 3, 9)))
+    db.add(BatchTracking(batch_id=1, location="Dock", status=BatchStatus.IN_TRANSIT, timestamp=datetime(2024, 12, 31)))
+    db.commit()
+    moved = db.query(BatchTracking).filter_by(batch_id=3, location="Site 3.1").one()
+    moved.timestamp, moved.status = datetime(2025, 1, 4, 15), BatchStatus.DELIVERED
+    db.delete(db.query(BatchTracking).filter_by(batch_id=2, location="Site 2.0").one())
+    db.commit()
+    db.execute(insert(BatchTracking), [
+        {"batch_id": 1, "location": "Dock", "status": BatchStatus.IN_TRANSIT, "timestamp": datetime(2025, 1, 6)},
+        {"batch_id": 3, "location": "Lab", "status": "MANUFACTURED", "timestamp": datetime(2024, 12, 30)},
+    ])
+    db.commit()
+
+    incremental = rollup_rows(db)
+    rebuild_rollups(db)
+    assert incremental == rollup_rows(db)
+    assert ("day", datetime(2025, 1, 3), "DELIVERED", "Pharmacy", 1, 1) in incremental
+    assert ("day", datetime(2025, 1, 3), "IN_TRANSIT", "Site 2.1", 0, -1) in incremental
+
+
+def test_rollup_chart_counts_levels_and_downsamples(db):
+    from app.services.charts import rollup_chart
+
+    db.add(BatchTracking(batch_id=2, location="Pharmacy", status=BatchStatus.DELIVERED, timestamp=datetime(2025, 1, 3, 9)))
+    db.commit()
+    db.statements.clear()
+    window = {"start": datetime(2025, 1, 1), "end": datetime(2025, 1, 5), "granularity": "day"}
+
+    events = rollup_chart(db, "events", **window)
+    assert [p["y"] for p in events["series"][0]["points"]] == [3, 2, 1, 0]
+    assert len(db.statements) == 1
+
+    levels = rollup_chart(db, "level", "in transit", by_location=True, **window)
+    assert {s["name"]: [p["y"] for p in s["points"]] for s in levels["series"]} == {
+        "Site 2.1": [0, 1, 0, 0], "Site 3.1": [0, 1, 1, 1]
+    }
+    later = rollup_chart(db, "level", "in transit", start=datetime(2025, 1, 3, 12), end=datetime(2025, 1, 4))
+    assert [p["y"] for p in later["series"][0]["points"]] == [1] * 12
+
+    coarse = rollup_chart(db, "events", max_points=2, **window)
+    assert [p["y"] for p in coarse["series"][0]["points"]] == [5, 1]
+    assert (coarse["downsampled"], coarse["bucket_seconds"]) == (True, 2 * 86400)
+
+
+def test_bulk_ingest_reports_bad_rows_and_loads_the_rest(db):
+    import uuid
+    from sqlalchemy import text
+    from app.services.ingest import ingest_tracking_events
+
+    db.execute(text("PRAGMA foreign_keys=ON"))
+    events = [
+        {"batch_code": "PCM-202501-A", "location": "Dock", "status": "in transit", "timestamp": "2025-01-05T10:00:00Z"},
+        {"batch_code": "PCM-999999-A", "location": "Dock", "status": "Delivered"},
+        {"batch_code": "PCM-202502-A", "location": "Pharmacy", "status": "lost"},
+        {"batch_code": "PCM-202502-A", "location": "Pharmacy", "status": "DELIVERED",
+         "timestamp": "2025-01-06T08:00:00", "handled_by": str(uuid.uuid4())},  # unknown employee
+        {"batch_code": "PCM-202503-A", "location": "Pharmacy", "status": "Delivered", "timestamp": "2025-01-06T09:00:00"},
+    ]
+    db.statements.clear()
+    report = ingest_tracking_events(db, events, chunk_size=2)
+
+    assert (report["received"], report["inserted"], report["failed"]) == (5, 2, 3)
+    assert [(e["index"], e["batch_code"]) for e in report["errors"]] == [
+        (1, "PCM-999999-A"), (2, "PCM-202502-A"), (3, "PCM-202502-A")
+    ]
+    assert report["errors"][0]["error"] == "Unknown batch code"
+    assert report["errors"][1]["error"].startswith("status:")
+    assert batch_crud.get_current_batch_location(db, "PCM-202501-A")["location"] == "Dock"
+    assert batch_crud.get_current_batch_location(db, "PCM-202503-A")["status"] == "Delivered"
+    assert batch_crud.get_current_batch_location(db, "PCM-202502-A")["location"] == "Site 2.1"
+
+
+def test_legacy_tracking_info_merges_into_the_event_store(db):
+    from sqlalchemy import inspect, text
+    from app.models.event_store import add_months, merge_legacy_tracking, month_ranges, partition_name
+
+    db.execute(text("CREATE TABLE tracking_info (id INTEGER PRIMARY KEY, batch_id INTEGER, "
+                    "status VARCHAR NOT NULL, location VARCHAR NOT NULL, timestamp DATETIME)"))
+    db.execute(text("INSERT INTO tracking_info (batch_id, status, location, timestamp) VALUES "
+                    "(3, 'MANUFACTURED', 'Site 3.0', '2025-01-01 00:00:00.000000'), "  # already in batch_tracking
+                    "(3, 'DELIVERED', 'Pharmacy', '2025-01-05 00:00:00.000000')"))
+    db.commit()
+
+    assert merge_legacy_tracking(db) == 1
+    assert "tracking_info" not in inspect(db.get_bind()).get_table_names()
+    assert [r.location for r in batch_crud.get_batch_tracking(db, 3)] == ["Site 3.0", "Site 3.1", "Pharmacy"]
+    assert batch_crud.get_current_batch_location(db, "PCM-202503-A")["status"] == "Delivered"
+    assert merge_legacy_tracking(db) == 0
+
+    assert partition_name(datetime(2025, 3, 9)) == "batch_tracking_y2025m03"
+    assert add_months(datetime(2025, 11, 1), 3) == datetime(2026, 2, 1)
+    assert month_ranges(datetime(2025, 12, 20), datetime(2026, 1, 3)) == [
+        (datetime(2025, 12, 1), datetime(2026, 1, 1)), (datetime(2026, 1, 1), datetime(2026, 2, 1))
+    ]
+
+
+def test_read_only_crud_goes_to_a_replica_within_the_lag_bound():
+    from app.database import ReplicaRouter, RoutingSession
+
+    def database(code):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        with sessionmaker(bind=engine)() as session:
+            session.add(Batch(id=1, batch_code=code))
+            session.commit()
+        return engine
+
+    primary, replica = database("PRIMARY-1"), database("REPLICA-1")
+    lag = {"seconds": 0.0}
+    router = ReplicaRouter([replica], max_lag=5, check_interval=3600, lag_probe=lambda engine: lag["seconds"])
+    router.refresh()
+    Session = sessionmaker(bind=primary, class_=RoutingSession, router=router)
+
+    with Session() as db:
+        assert set(batch_crud.get_batches_by_codes(db, ["PRIMARY-1", "REPLICA-1"])) == {"REPLICA-1"}
+        # Not marked read-only: ingestion resolves codes on the primary
+        assert batch_crud.get_batch_ids_by_codes(db, ["PRIMARY-1"]) == {"PRIMARY-1": 1}
+
+    with Session() as db:
+        db.add(Batch(id=2, batch_code="PRIMARY-2"))
+        db.flush()
+        # The transaction has written: read your own writes from the primary
+        assert batch_crud.get_batch_by_code(db, "PRIMARY-2") is not None
+        db.commit()
+        assert batch_crud.get_batch_by_code(db, "PRIMARY-2") is None
+
+    lag["seconds"] = 30
+    router.refresh()
+    with Session() as db:
+        assert batch_crud.get_batch_by_code(db, "PRIMARY-1") is not None
+    assert router.stats()["healthy"] == 0
+    primary.dispose()
+    replica.dispose()
+
+
+def test_engine_factory_applies_pool_settings_and_reports_usage(tmp_path):
+    from sqlalchemy import exc, text
+    from app.database import DB_POOL_TIMEOUTS, TimedQueuePool, engine_options, make_engine, pool_stats
+
+    options = engine_options("postgresql+psycopg2://user@db/chatbot")
+    assert options["poolclass"] is TimedQueuePool and options["pool_pre_ping"]
+    assert "statement_timeout" in options["connect_args"]["options"]
+    assert "statement_timeout" in engine_options("postgresql+asyncpg://user@db/chatbot", True)[
+        "connect_args"]["server_settings"]
+    # In-memory SQLite keeps its own single-connection pool
+    assert "poolclass" not in engine_options("sqlite://")
+
+    engine = make_engine(f"sqlite:///{tmp_path / 'pool.db'}", "test_pool", pool_size=1, max_overflow=1,
+                         pool_timeout=0.05)
+    first, second = engine.connect(), engine.connect()
+    first.execute(text("SELECT 1"))
+    assert pool_stats()["test_pool"] == {"size": 1, "checked_out": 2, "checked_in": 0, "overflow": 1,
+                                         "max_connections": 2}
+    timeouts = DB_POOL_TIMEOUTS.value(pool="test_pool")
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert DB_POOL_TIMEOUTS.value(pool="test_pool") == timeouts + 1
+    first.close()
+    second.close()
+    assert pool_stats()["test_pool"]["checked_out"] == 0
+    engine.dispose()
+
+
+def test_expiry_calendar_filters_by_location_and_follows_writes(db):
+    from app.services.expiry_calendar import ExpiryCalendar, expiry_calendar
+    from app.services.nlu import NLUService
+
+    today = date.today()
+    for batch_id, days in ((1, 3), (2, 10), (3, 40)):
+        db.get(Batch, batch_id).expiry_date = today + timedelta(days=days)
+    db.commit()
+    # Committed changes are queued for the process-wide calendar
+    assert {1, 2, 3} <= expiry_calendar._dirty
+
+    calendar = ExpiryCalendar(horizon_days=90, refresh_interval=3600)
+    month = today + timedelta(days=30)
+    # Loading is the background refresher's job; until then the indexed query answers
+    assert calendar.expiring(db, today, month)["source"] == "database"
+    calendar.refresh(db)
+    soon = calendar.expiring(db, today, month)
+    assert soon["source"] == "calendar"
+    assert [batch["batch_code"] for batch in soon["batches"]] == ["PCM-202501-A", "PCM-202502-A"]
+    assert (soon["total_batches"], soon["total_quantity"], soon["more"]) == (2, 30, 0)
+    assert soon["days"] == [{"date": today + timedelta(days=3), "batches": 1, "quantity": 10},
+                            {"date": today + timedelta(days=10), "batches": 1, "quantity": 20}]
+    at_site = calendar.expiring(db, today, month, location="site 2.1", status="in transit")
+    assert (at_site["location"], at_site["total_batches"]) == ("Site 2.1", 1)
+
+    parsed = NLUService(location_index=calendar).process_query(
+        "Which in-transit batches expire in the next 2 weeks at SITE 2.1?"
+    )["entities"]
+    assert (parsed["days"], parsed["status"], parsed["location"]) == (14, "In Transit", "Site 2.1")
+
+    # New tracking events are found by id at the next check, without a rebuild
+    db.add(BatchTracking(batch_id=1, location="Site 2.1", status=BatchStatus.IN_TRANSIT,
+                         timestamp=datetime(2025, 2, 1)))
+    db.commit()
+    assert calendar.expiring(db, today, month, location="Site 2.1")["total_batches"] == 1
+    calendar.refresh_interval = 0
+    assert calendar.expiring(db, today, month, location="Site 2.1")["total_batches"] == 2
+
+    db.get(Batch, 3).expiry_date = today + timedelta(days=5)
+    db.commit()
+    calendar.mark_dirty([3])
+    # A refresh in progress elsewhere: readers get the current calendar instead of waiting
+    with calendar._refresh_lock:
+        assert calendar.expiring(db, today, month)["total_batches"] == 2
+    assert calendar.expiring(db, today, month)["total_batches"] == 3
+    assert calendar.stats()["rebuilds"] == 1
+    calendar.invalidate()
+    assert calendar.expiring(db, today, month)["source"] == "database"
+    calendar.refresh(db)
+    assert calendar.stats()["rebuilds"] == 2
+
+    calendar.refresh_interval = 3600
+    db.statements.clear()
+    assert calendar.expiring(db, today, month, limit=1)["more"] == 2
+    assert db.statements == []
+
+    # Past the horizon the indexed query answers in the same shape
+    later = calendar.expiring(db, today, today + timedelta(days=400), limit=1)
+    assert (later["source"], later["total_batches"], later["more"]) == ("database", 3, 2)
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+
+pytest.importorskip("alembic")
+
+from app.database import Base, upgrade_schema
+from app.models import batch_control, common  # noqa: F401  (register tables)
+
+
+def schema(url):
+    engine = create_engine(url)
+    inspector = inspect(engine)
+    tables = {
+        table: {index["name"] for index in inspector.get_indexes(table)}
+        for table in inspector.get_table_names() if table != "alembic_version"
+    }
+    engine.dispose()
+    return tables
+
+
+def test_migrations_match_models(tmp_path):
+    migrated = f"sqlite:///{tmp_path}/migrated.db"
+    upgrade_schema(migrated)
+
+    created = f"sqlite:///{tmp_path}/created.db"
+    engine = create_engine(created)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    assert schema(migrated) == schema(created)
+    assert "ix_batch_tracking_batch_id_timestamp" in schema(migrated)["batch_tracking"]
+
+
+def test_migrations_adopt_a_create_all_database(tmp_path):
+    url = f"sqlite:///{tmp_path}/legacy.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine, tables=[
+        table for table in Base.metadata.sorted_tables if table.name != "batch_current_state"
+    ])
+    engine.dispose()
+
+    upgrade_schema(url)
+    assert "batch_current_state" in schema(url)
+
+
+def test_tracking_info_is_dropped_only_once_merged(tmp_path):
+    from sqlalchemy import text
+
+    url = f"sqlite:///{tmp_path}/legacy.db"
+    upgrade_schema(url, "0005")
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO tracking_info (batch_id, status, location, timestamp) "
+                          "VALUES (NULL, 'DELIVERED', 'Pharmacy', '2025-01-01 00:00:00')"))
+    with pytest.raises(RuntimeError, match="merge_tracking_events"):
+        upgrade_schema(url)
+    assert "tracking_info" in schema(url)
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO batch_tracking (batch_id, status, location, timestamp) "
+                          "VALUES (NULL, 'DELIVERED', 'Pharmacy', '2025-01-01 00:00:00')"))
+    engine.dispose()
+    upgrade_schema(url)
+    assert "tracking_info" not in schema(url)
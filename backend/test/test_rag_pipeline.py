@@ -48,13 +48,13 @@ def test_batch_info_intent(mock_db, monkeypatch):
         product = MockProduct()
         quantity = 1000
         manufactured_date = "2024-05-01"
+        expiry_date = "2026-05-01"
 
-    # ✅ Mock database calls
-    monkeypatch.setattr(batch_crud, "get_batch_by_code", lambda db, code: MockBatch())
-    monkeypatch.setattr(batch_crud, "get_current_batch_location", lambda db, code: {
+    # ✅ Mock database calls (batch + current location come back from one lookup)
+    monkeypatch.setattr(batch_crud, "get_batch_overview", lambda db, code: (MockBatch(), {
         "location": "Warehouse A",
         "status": "In Transit"
-    })
+    }))
 
     result = rag_pipeline.process_query(query, mock_db)
 
@@ -163,3 +163,175 @@ def test_batch_info_intent(mock_db, monkeypatch):
 #     assert result["success"] is True
 #     assert result["intent"] == "batch_info"
 #     assert "Paracetamol" in result["message"]
+
+
+def test_llm_fallback_served_from_semantic_cache(mock_db, monkeypatch):
+    from app.services.cache import SemanticResponseCache
+
+    monkeypatch.setattr(
+        "app.services.nlu.nlu_service.process_query",
+        lambda q: {"intent": QueryIntent.UNKNOWN, "entities": {}}
+    )
+    monkeypatch.setattr(rag_pipeline, "response_cache", SemanticResponseCache(max_entries=8))
+    monkeypatch.setattr(rag_pipeline, "llm", MagicMock())
+    rag_pipeline.llm.invoke = MagicMock(return_value=MagicMock(content="Cached answer"))
+
+    first = rag_pipeline.process_query("What can you do?", mock_db)
+    second = rag_pipeline.process_query("what can you do", mock_db)
+
+    assert first["message"] == second["message"] == "Cached answer"
+    assert rag_pipeline.llm.invoke.call_count == 1
+    assert rag_pipeline.response_cache.stats()["semantic_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_pipeline_reads_location_and_awaits_llm(monkeypatch):
+    from datetime import date, datetime
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from app.database import Base
+    from app.models import common  # noqa: F401  (registers employees/departments)
+    from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+    from app.services.cache import SemanticResponseCache
+    from app.services.fake_llm import FakeLLM
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as db:
+        db.add(Product(id=1, name="Paracetamol", category="Pharma", unit_price=1))
+        db.add(Batch(id=1, product_id=1, batch_code="PCM-202501-A", quantity=10,
+                     manufactured_date=date(2025, 1, 1), expiry_date=date(2026, 1, 1)))
+        db.add(BatchTracking(batch_id=1, location="Warehouse B", status=BatchStatus.IN_TRANSIT,
+                             timestamp=datetime(2025, 1, 2)))
+        await db.commit()
+
+        fake = FakeLLM(latency=0, response="Async answer")
+        monkeypatch.setattr(rag_pipeline, "llm", fake)
+        monkeypatch.setattr(rag_pipeline, "response_cache", SemanticResponseCache(max_entries=0))
+
+        sessions = []
+        retrieve = rag_pipeline._retrieve_data
+        def recording_retrieve(intent, entities, session, cursor=None):
+            sessions.append(session)
+            return retrieve(intent, entities, session, cursor)
+        monkeypatch.setattr(rag_pipeline, "_retrieve_data", recording_retrieve)
+
+        located = await rag_pipeline.aprocess_query("Where is batch PCM-202501-A?", db)
+        fallback = await rag_pipeline.aprocess_query("what does word seven mean", db)
+        # The shared lookup runs on its own session, never on the (leader) caller's
+        assert sessions and sessions[0] is not db.sync_session
+
+    await engine.dispose()
+    assert located["intent"] == "batch_location"
+    assert "Warehouse B" in located["message"]
+    assert fallback["message"] == "Async answer"
+    assert fake.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_emits_meta_then_tokens_then_message(monkeypatch):
+    from app.services.cache import SemanticResponseCache
+    from app.services.fake_llm import FakeLLM
+    from app.services.streaming import format_sse
+
+    monkeypatch.setattr(rag_pipeline, "llm", FakeLLM(latency=0, response="Streaming works fine"))
+    monkeypatch.setattr(rag_pipeline, "response_cache", SemanticResponseCache(max_entries=8))
+
+    events = [event async for event in rag_pipeline.astream_query("what does word seven mean", MagicMock())]
+    assert events[0] == ("meta", {"intent": "unknown", "entities": {"batch_code": None, "status": None}})
+    assert "".join(payload["text"] for name, payload in events if name == "token") == "Streaming works fine"
+    assert events[-1] == ("message", {"success": True, "message": "Streaming works fine"})
+
+    # A repeat is answered from the cache as a single message event
+    repeat = [event async for event in rag_pipeline.astream_query("what does word seven mean", MagicMock())]
+    assert [name for name, _ in repeat] == ["meta", "message"]
+    assert format_sse("done", {}) == "event: done\ndata: {}\n\n"
+
+
+@pytest.mark.asyncio
+async def test_bulk_queries_share_grouped_lookups_in_input_order():
+    from datetime import date, datetime
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from app.database import Base
+    from app.models import common  # noqa: F401  (registers employees/departments)
+    from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as db:
+        db.add(Product(id=1, name="Paracetamol", category="Pharma", unit_price=1))
+        for batch_id, code, status in [(1, "PCM-202501-A", BatchStatus.IN_TRANSIT),
+                                       (2, "PCM-202502-A", BatchStatus.DELIVERED)]:
+            db.add(Batch(id=batch_id, product_id=1, batch_code=code, quantity=10,
+                         manufactured_date=date(2025, 1, 1), expiry_date=date(2026, 1, 1)))
+            db.add(BatchTracking(batch_id=batch_id, location="Plant", status=BatchStatus.MANUFACTURED,
+                                 timestamp=datetime(2025, 1, 1)))
+            db.add(BatchTracking(batch_id=batch_id, location=f"Warehouse {batch_id}", status=status,
+                                 timestamp=datetime(2025, 1, 2)))
+        await db.commit()
+
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        queries = [
+            "Where is batch PCM-202501-A?",
+            "hello",
+            "show delivered batches",
+            "Where is batch PCM-202502-A?",
+            "info about batch PCM-202502-A",
+            "Where is batch ZZZ-999999-Z?",
+            "show delivered batches",
+        ]
+        results = await rag_pipeline.aprocess_queries(queries, db)
+
+    await engine.dispose()
+    assert [r["intent"] for r in results] == [
+        "batch_location", "greeting", "batches_by_status", "batch_location",
+        "batch_info", "batch_location", "batches_by_status",
+    ]
+    assert "Warehouse 1" in results[0]["message"]
+    assert "Warehouse 2" in results[3]["message"]
+    assert results[4]["data"]["status"] == "Delivered"
+    assert results[5]["success"] is False
+    assert [b["batch_code"] for b in results[2]["data"]["batches"]] == ["PCM-202502-A"]
+    assert results[6]["message"] == results[2]["message"]
+    # Locations, batch rows with products, and the one status listing
+    assert len(statements) == 3
+
+
+def test_history_chart_and_location_render_undated_events():
+    from datetime import date, datetime
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from app.models import common  # noqa: F401  (registers employees/departments)
+    from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+    from app.crud.batch_control import batch_crud
+    from app.models.current_state import rebuild_current_state
+    from app.services.chat_handler import answer_from_database
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Product(id=1, name="Paracetamol", category="Pharma", unit_price=1))
+    db.add(Batch(id=1, product_id=1, batch_code="PCM-202501-A", quantity=10,
+                 manufactured_date=date(2025, 1, 1), expiry_date=date(2026, 1, 1)))
+    db.add(BatchTracking(batch_id=1, location="Plant", status=BatchStatus.MANUFACTURED, timestamp=None))
+    db.add(BatchTracking(batch_id=1, location="Dock", status=BatchStatus.IN_TRANSIT, timestamp=datetime(2025, 1, 2)))
+    db.commit()
+
+    history = rag_pipeline.process_query("Show the full history of PCM-202501-A", db)
+    assert history["success"] and "undated - Manufactured at Plant" in history["message"]
+    chart = rag_pipeline._chart_data("PCM-202501-A", batch_crud.get_batch_tracking(db, 1))
+    assert [point["x"] for point in chart["chart_data"]] == ["undated", "2025-01-02 00:00"]
+    assert "undated at Plant" in answer_from_database(QueryIntent.BATCH_HISTORY, {"batch_code": "PCM-202501-A"}, db)
+
+    db.query(BatchTracking).filter_by(location="Dock").delete()
+    db.commit()
+    rebuild_current_state(db)
+    location = rag_pipeline.process_query("Where is batch PCM-202501-A?", db)
+    assert location["success"] and "undated" in location["message"]
+    db.close()
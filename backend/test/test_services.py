@@ -1,4 +1,4 @@
-from app.services.nlu import nlu_service, QueryIntent
+from app.services.nlu import nlu_service, NLUService, QueryIntent
 
 def test_intent_detection_location():
     query = "Where is batch VDT-052025-A?"
@@ -27,3 +27,463 @@ def test_unknown_intent():
     query = "What's the weather in Chennai?"
     result = nlu_service.process_query(query)
     assert result["intent"] == QueryIntent.UNKNOWN
+
+def test_engine_matches_per_pattern_classifier():
+    queries = [
+        "Where is batch VDT-052025-A?",
+        "who delivered by 12",
+        "Show me where batch ABC-123456-B is delivered",
+        "WHO-123456-A history",
+        "list the\nstatus of all",
+        "hello, tracking 1234 in transit",
+        "good  morning",
+        "xVDT-052025-Ab moving shipping made",
+    ]
+    classifier = nlu_service.intent_classifier
+    extractor = nlu_service.entity_extractor
+    for query in queries:
+        intent, entities = nlu_service.engine.analyze(query)
+        assert intent == classifier.classify_intent(query), query
+        assert entities["batch_code"] == extractor.extract_batch_code(query), query
+        assert entities["status"] == extractor.extract_status(query), query
+
+def test_process_queries_keeps_input_order():
+    queries = ["hello", "Where is batch VDT-052025-A?", "hello"]
+    results = nlu_service.process_queries(queries)
+    assert [r["intent"] for r in results] == [
+        QueryIntent.GREETING, QueryIntent.BATCH_LOCATION, QueryIntent.GREETING
+    ]
+    assert [r["original_query"] for r in results] == queries
+    assert results[1]["entities"]["batch_code"] == "VDT-052025-A"
+
+def test_lru_cache_evicts_and_expires():
+    from app.services.cache import LRUCache
+
+    now = [0.0]
+    cache = LRUCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "size": 1, "maxsize": 2, "hits": 1, "misses": 2, "evictions": 1, "expirations": 1
+    }
+
+def test_nlu_cache_shares_normalized_queries():
+    from app.services.nlu import NLUService, normalize_query
+
+    assert normalize_query("  Where is   VDT-052025-A?? ") == "where is vdt-052025-a"
+
+    service = NLUService(cache_size=16)
+    first = service.process_query("Where is VDT-052025-A?")
+    second = service.process_query("where is  vdt-052025-a")
+    assert first["intent"] == second["intent"] == QueryIntent.BATCH_LOCATION
+    assert second["entities"]["batch_code"] == "VDT-052025-A"
+    assert second["original_query"] == "where is  vdt-052025-a"
+    assert service.cache.stats()["hits"] == 1
+    assert service.cache.stats()["misses"] == 1
+
+def test_batch_code_index_resolves_near_misses():
+    from app.services.batch_code_index import BatchCodeIndex, edit_distance
+
+    assert edit_distance("VDT052025A", "VDT05225A") == 1
+
+    index = BatchCodeIndex(max_distance=2)
+    for code in ["VDT-052025-A", "VDT-052025-B", "ABC-123456-B"]:
+        index.add(code)
+    index.loaded = True
+
+    assert index.resolve("vdt052025a") == "VDT-052025-A"
+    assert index.resolve("ABC-12345-B") == "ABC-123456-B"
+    assert index.resolve("VDT-052025-C") is None  # equally close to -A and -B
+    assert index.resolve("XYZ-999999-Z") is None
+
+    service = NLUService(code_index=index)
+    result = service.process_query("Where is vdt-05225-a?")
+    assert result["intent"] == QueryIntent.BATCH_LOCATION
+    assert result["entities"]["batch_code"] == "VDT-052025-A"
+    # A well-formed code that does not exist is not swapped for its sibling batch
+    assert index.resolve("ABC-123456-A") == "ABC-123456-B"
+    assert service.process_query("Where is ABC-123456-A?")["entities"]["batch_code"] == "ABC-123456-A"
+    assert service.process_query("Where is abc123456a?")["entities"]["batch_code"] == "ABC-123456-B"
+
+def test_batch_code_index_refresh_is_incremental():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from app.models import common  # noqa: F401  (registers employees table)
+    from app.models.batch_control import Batch
+    from app.services.batch_code_index import BatchCodeIndex
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Batch(batch_code="VDT-052025-A"))
+    db.commit()
+
+    index = BatchCodeIndex()
+    assert index.refresh(db) == 1
+    db.add(Batch(batch_code="ABC-123456-B"))
+    db.commit()
+    assert index.refresh(db) == 1
+    assert index.resolve("abc123456b") == "ABC-123456-B"
+    db.close()
+
+def test_intent_model_covers_rule_misses(tmp_path):
+    from app.services.intent_model import IntentModel, load_or_train
+
+    trained = load_or_train(tmp_path)
+    model = IntentModel.load(tmp_path)  # memory-mapped artifact written above
+    assert model.labels == trained.labels
+    assert model.predict("whereabouts of vdt-052025-a") == trained.predict("whereabouts of vdt-052025-a")
+
+    service = NLUService(intent_model=model, intent_threshold=0.5)
+    paraphrase = "Whereabouts of batch VDT-052025-A?"
+    assert nlu_service.engine.analyze(paraphrase)[0] == QueryIntent.UNKNOWN
+    result = service.process_query(paraphrase)
+    assert result["intent"] == QueryIntent.BATCH_LOCATION
+    assert result["entities"]["batch_code"] == "VDT-052025-A"
+    assert service.process_query("What's the weather in Chennai?")["intent"] == QueryIntent.UNKNOWN
+
+def test_semantic_cache_ttl_and_byte_budget():
+    from app.services.cache import SemanticResponseCache
+
+    now = [0.0]
+    cache = SemanticResponseCache(max_entries=8, ttl=5, clock=lambda: now[0])
+    cache.set("prompt: tell me a joke", "joke", text="tell me a joke")
+    assert cache.get("prompt: tell me a joke") == "joke"
+    assert cache.get("other prompt", text="tell me a joke") == "joke"
+    assert cache.get("prompt: what is two plus three", text="what is two plus three") is None
+    now[0] = 6
+    assert cache.get("prompt: tell me a joke") is None
+    assert cache.stats()["expirations"] == 1
+
+    entry_size = len(b"a") + len(b"x") + cache.signature("a").nbytes
+    small = SemanticResponseCache(max_entries=8, max_bytes=2 * entry_size)
+    for prompt in ["a", "b", "c"]:
+        small.set(prompt, "x")
+    assert len(small) == 2
+    assert small.get("a") is None
+    assert small.stats()["evictions"] == 1
+
+def test_semantic_cache_keeps_identifiers_and_grounding_apart():
+    from app.services.cache import SemanticResponseCache
+
+    cache = SemanticResponseCache(max_entries=8)
+    cache.set("where is vdt-052025-a", "Warehouse A", text="where is vdt-052025-a")
+    assert cache.get("where is vdt-052025-b", text="where is vdt-052025-b") is None
+    assert cache.get("Where is VDT-052025-A?", text="where is vdt-052025-a") == "Warehouse A"
+
+    cache.set("records: v1\nUser Query: Is the insulin cold?", "yes", text="is the insulin cold", context="records: v1")
+    assert cache.get("records: v1\nUser Query: is the insulin cold", text="is the insulin cold", context="records: v1") == "yes"
+    assert cache.get("records: v2\nUser Query: Is the insulin cold?", text="is the insulin cold", context="records: v2") is None
+
+def test_singleflight_merges_concurrent_threads():
+    import threading
+    import time
+    from app.services.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    calls = []
+
+    def slow_lookup():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"location": "Warehouse B"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("VDT-052025-A", slow_lookup))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"location": "Warehouse B"}] * 8
+    assert flight.stats() == {"executions": 1, "merged": 7, "in_flight": 0}
+    flight.do("VDT-052025-A", slow_lookup)  # nothing is cached once the call finished
+    assert len(calls) == 2
+
+def test_singleflight_async_shares_result_and_error():
+    import asyncio
+    from app.services.singleflight import SingleFlight
+
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def ask():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "one answer"
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("gemini down")
+
+        answers = await asyncio.gather(*(flight.ado("prompt", ask) for _ in range(5)))
+        errors = await asyncio.gather(*(flight.ado("bad", fail) for _ in range(3)), return_exceptions=True)
+        return flight, calls, answers, errors
+
+    flight, calls, answers, errors = asyncio.run(scenario())
+    assert calls == [1] and answers == ["one answer"] * 5
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert flight.stats() == {"executions": 2, "merged": 6, "in_flight": 0}
+
+
+def test_singleflight_async_outlives_cancelled_callers():
+    import asyncio
+    import gc
+    from app.services.singleflight import SingleFlight
+
+    async def scenario():
+        flight = SingleFlight()
+        unhandled = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+
+        async def ask():
+            await asyncio.sleep(0.05)
+            return "one answer"
+
+        async def fail():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("gemini down")
+
+        # The leader disconnects; the follower still gets the answer
+        leader = asyncio.ensure_future(flight.ado("prompt", ask))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("prompt", ask))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        answer = await follower
+
+        # Every caller disconnects before the call fails
+        callers = [asyncio.ensure_future(flight.ado("bad", fail)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.1)
+        gc.collect()
+        return flight, leader, answer, unhandled
+
+    flight, leader, answer, unhandled = asyncio.run(scenario())
+    assert leader.cancelled() and answer == "one answer"
+    assert unhandled == []
+    assert flight.stats()["in_flight"] == 0
+
+def test_vector_index_add_delete_search_and_mmap_roundtrip(tmp_path):
+    from app.services.retrieval import VectorIndex
+
+    index = VectorIndex(n_features=2 ** 11, capacity=2)
+    index.add("batch:1", "Batch VDT-052025-A: 500 units of Vitamin D3, at Warehouse B.")
+    index.add("batch:2", "Batch ABC-123456-B: 200 units of Paracetamol, at Cold Storage.")
+    index.add("product:1", "Product Vitamin D3: category Supplements, unit price 12.50.")
+    assert index.search("where did the paracetamol go?", k=1)[0][0] == "batch:2"
+
+    index.delete("batch:2")
+    assert all(doc_id != "batch:2" for doc_id, _, _ in index.search("paracetamol", k=3))
+    index.add("employee:7", "Employee Priya (priya@example.com): Supervisor in Logistics.")
+    assert len(index) == 3 and index.writes == 5
+
+    index.compact()  # everything into the base, which the save maps back in
+    index.save(tmp_path)
+    assert len(index._ids) == 3
+    loaded = VectorIndex.load(tmp_path)
+    assert loaded.search("vitamin d3 warehouse", k=2) == index.search("vitamin d3 warehouse", k=2)
+    loaded.add("batch:3", "Batch XYZ-999999-Z: quarantined at QA Lab.")  # goes to the in-memory delta
+    assert loaded.search("quarantined batch", k=1)[0][0] == "batch:3"
+    assert VectorIndex.load(tmp_path).text("batch:3") is None
+
+    # Saves leave the mapped base alone until enough of it is replaced to compact
+    import numpy as np
+    base = tmp_path / VectorIndex.VECTORS_FILE
+    assert isinstance(index._base, np.memmap) and isinstance(loaded._base, np.memmap)
+    written = base.stat().st_ino
+    loaded.COMPACT_RATIO = 1.0
+    loaded.delete("batch:1")  # masked in the base
+    loaded.save(tmp_path)
+    assert base.stat().st_ino == written and isinstance(loaded._base, np.memmap)
+    reloaded = VectorIndex.load(tmp_path)
+    assert reloaded.text("batch:3") and "batch:1" not in reloaded
+    assert all(doc_id != "batch:1" for doc_id, _, _ in reloaded.search("vitamin d3 warehouse", k=3))
+    loaded.compact()
+    loaded.save(tmp_path)
+    assert base.stat().st_ino != written and len(VectorIndex.load(tmp_path)._ids) == 3
+
+def test_retrieval_grounds_llm_prompt_in_database_rows(monkeypatch):
+    from datetime import date, datetime
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from app.models.common import Employee
+    from app.models.batch_control import Batch, BatchStatus, BatchTracking, Product
+    from app.services.rag_pipeline import rag_pipeline
+    from app.services.retrieval import RetrievalIndex
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Product(id=1, name="Insulin Glargine", category="Biologics", unit_price=30))
+    db.add(Batch(id=1, product_id=1, batch_code="INS-202401-C", quantity=80,
+                 manufactured_date=date(2024, 1, 5), expiry_date=date(2025, 1, 5)))
+    db.commit()
+
+    index = RetrievalIndex()
+    assert index.refresh(db) == 2
+    assert index.refresh(db) == 0  # nothing new
+    handler = Employee(name="Ravi Kumar", email="ravi@example.com")
+    db.add(handler)
+    db.add(BatchTracking(batch_id=1, location="Cold Room 2", status=BatchStatus.IN_TRANSIT,
+                         timestamp=datetime(2024, 1, 6, 9, 30), handler=handler))
+    db.commit()
+    assert index.refresh(db) == 2  # batch re-indexed with its trail, employee added
+    assert "Cold Room 2, handled by Ravi Kumar" in index.text("batch:1")
+
+    monkeypatch.setattr(rag_pipeline, "retrieval", index)
+    prompt = rag_pipeline._fallback_prompt("is the insulin kept in a cold room?")
+    assert "Relevant ERP records" in prompt and "INS-202401-C" in prompt
+    db.close()
+
+def test_histogram_renders_prometheus_text_and_tracks_stages():
+    from app.services.metrics import MetricsRegistry, STAGE_SECONDS, current_intent, track
+
+    registry = MetricsRegistry()
+    latency = registry.histogram("demo_seconds", "Demo latency.", ("stage",), buckets=(0.01, 0.1))
+    requests = registry.counter("demo_total", "Demo requests.", ("intent",))
+    for value in (0.005, 0.05, 0.5):
+        latency.observe(value, stage="llm")
+    requests.inc(intent='say "hi"')
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="llm",le="0.01"} 1' in text
+    assert 'demo_seconds_bucket{stage="llm",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{stage="llm",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="llm"} 3' in text
+    assert 'demo_total{intent="say \\"hi\\""} 1' in text
+    assert latency.quantile(0.5, stage="llm") == 0.1
+
+    before = STAGE_SECONDS.count(stage="template", intent="batch_info")
+    current_intent.set("batch_info")
+    with track("template"):
+        pass
+    assert STAGE_SECONDS.count(stage="template", intent="batch_info") == before + 1
+
+def test_llm_gateway_times_out_sheds_and_breaks_circuit():
+    import asyncio
+    import pytest
+    from app.services.fake_llm import FakeLLM
+    from app.services.llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailable
+
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+    gateway = LLMGateway(max_concurrency=1, max_queue=1, timeout=0.3, breaker=breaker)
+
+    async def scenario():
+        slow = FakeLLM(latency=0.1)
+        # one runs, one queues, the third is shed at once
+        outcomes = await asyncio.gather(*(gateway.ainvoke(slow, "hi") for _ in range(3)), return_exceptions=True)
+        assert [getattr(o, "reason", "ok") for o in outcomes].count("overloaded") == 1
+        assert slow.calls == 2
+
+        hung = FakeLLM(latency=5)
+        for _ in range(2):
+            with pytest.raises(LLMUnavailable) as error:
+                await gateway.ainvoke(hung, "hi")
+            assert error.value.reason == "timeout"
+        assert breaker.is_open()
+
+        healthy = FakeLLM(latency=0)
+        with pytest.raises(LLMUnavailable) as error:
+            await gateway.ainvoke(healthy, "hi")
+        assert error.value.reason == "circuit_open" and healthy.calls == 0
+
+        now[0] = 31  # reset timeout elapsed: one probe goes through and closes the circuit
+        assert (await gateway.ainvoke(healthy, "hi")).content == healthy.response
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+    assert gateway.invoke(FakeLLM(latency=0), "hi").content == "This is a canned answer."
+    assert gateway.stats()["in_flight"] == 0 and gateway.stats()["waiting"] == 0
+
+def test_pipeline_answers_busy_message_while_circuit_is_open(monkeypatch):
+    from unittest.mock import MagicMock
+    from app.services.cache import SemanticResponseCache
+    from app.services.fake_llm import FakeLLM
+    from app.services.llm_gateway import CircuitBreaker, LLMGateway, LLM_UNAVAILABLE_MESSAGE
+    from app.services.rag_pipeline import rag_pipeline
+
+    gateway = LLMGateway(breaker=CircuitBreaker(failure_threshold=1))
+    monkeypatch.setattr(rag_pipeline, "gateway", gateway)
+    monkeypatch.setattr(rag_pipeline, "response_cache", SemanticResponseCache(max_entries=0))
+    monkeypatch.setattr(rag_pipeline, "llm", FakeLLM(latency=0, error_rate=1.0))
+
+    failed = rag_pipeline.process_query("what does word seven mean", MagicMock())
+    assert failed["message"].startswith("Sorry")
+    refused = rag_pipeline.process_query("what does word eight mean", MagicMock())
+    assert refused["message"] == LLM_UNAVAILABLE_MESSAGE
+    assert rag_pipeline.llm.calls == 1
+
+def test_intent_detection_statistics():
+    for query in ["Show batch statistics", "How many batches are in transit?"]:
+        assert nlu_service.process_query(query)["intent"] == QueryIntent.BATCH_STATS, query
+
+def test_expiry_questions_carry_horizon_and_period():
+    result = nlu_service.process_query("How many batches at Warehouse B expire in the next 30 days?")
+    assert result["intent"] == QueryIntent.EXPIRING_SOON
+    assert (result["entities"]["days"], result["entities"]["batch_code"]) == (30, None)
+    assert nlu_service.process_query("Delivered batches expiring this month")["entities"]["period"] == "month"
+    assert nlu_service.process_query("Which batches have already expired?")["entities"]["expired"] is True
+    assert nlu_service.process_query("When does VDT-052025-A expire?")["intent"] == QueryIntent.BATCH_INFO
+
+def test_chart_questions_across_batches_carry_status_and_period():
+    result = nlu_service.process_query("Chart batches delivered per day this quarter")
+    assert result["intent"] == QueryIntent.BATCH_CHART
+    assert result["entities"]["status"] == "Delivered"
+    assert result["entities"]["period"] == "quarter"
+    assert nlu_service.process_query("Plot in-transit count per warehouse")["entities"]["period"] is None
+
+def test_write_behind_groups_commits_drops_duplicates_and_pushes_back():
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base
+    from app.models.batch_control import Batch, BatchTracking
+    from app.services.write_behind import IngestUnavailable, TrackingWriteBehind
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(Batch(id=1, batch_code="PCM-202501-A"))
+        db.commit()
+
+    writer = TrackingWriteBehind(Session, max_queue=3, group_size=2, flush_interval=0.01)
+    event = {"batch_code": "PCM-202501-A", "location": "Dock", "status": "In Transit"}
+    assert writer.submit(event, "scan-1") == "accepted"
+    assert writer.submit(event, "scan-1") == "duplicate"
+    assert writer.submit({**event, "batch_code": "XXX-000000-Z"}, "scan-2") == "accepted"
+    assert writer.submit(event) == "accepted"
+    try:
+        writer.submit(event)
+        assert False, "queue should be full"
+    except IngestUnavailable as e:
+        assert e.reason == "queue_full"
+
+    writer.start()
+    assert writer.drain(timeout=5) == 0
+    stats = writer.stats()
+    assert (stats["written"], stats["failed"], stats["groups"]) == (2, 1, 2)
+    assert (stats["duplicate"], stats["rejected"]) == (1, 1)
+    # The unknown code's key is forgotten, so a corrected retry is not dropped
+    assert writer.seen_keys.get("scan-2") is None and writer.seen_keys.get("scan-1")
+    with Session() as db:
+        assert db.scalar(select(func.count()).select_from(BatchTracking)) == 2
+    try:
+        writer.submit(event)
+        assert False, "drained writer should refuse events"
+    except IngestUnavailable as e:
+        assert e.reason == "shutting_down"
+    engine.dispose()